@@ -0,0 +1,131 @@
+"""
+    Benchmark of binary payment files: size and parse time of the same payments as text and binary files.
+
+    Payments have padded fields and long messages with emoji, as the challenge files do. Both files are converted to
+    binary payment files (with and without messages column). For every form, reports file sizes, time to parse batch
+    file into Payment records, and time of batch stage (row by row, and --columnar if NumPy is installed) and stream
+    stage; outputs of every run are checked to be identical.
+
+    Usage: python insight_testsuite/benchmarks/binary_input.py [batch rows] [stream rows]
+"""
+
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+import payfile
+from antifraud import AntiFraud
+
+MESSAGES = [u"Spam \U0001f355\U0001f37a", u"dinner and drinks at the usual place \U0001f37d", u"rent \U0001f3e0",
+            u"⚽ tickets for saturday", u"Uber \U0001f695 back home after the concert"]
+
+
+def write_payments(path, rows, users, seed):
+    """
+    This function writes a file of random payments, one second apart.
+    """
+    random.seed(seed)
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for row in range(rows):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000 + row))
+            payments.write("%s, %d, %d, %.2f, %s\n" % (stamp, random.randrange(users), random.randrange(users),
+                                                       random.uniform(1, 200), random.choice(MESSAGES)))
+
+
+def parse(batchfile):
+    """
+    This function reads every payment of batch file as stream stage does, without classifying it.
+
+    :return:
+        seconds taken.
+    """
+    anti_fraud = AntiFraud()
+    started = time.time()
+    if payfile.is_payment_file(batchfile):
+        with payfile.PaymentColumns(batchfile) as columns:
+            for payment in columns.payments(anti_fraud.users):
+                anti_fraud.take_payment(payment)
+    else:
+        with open(batchfile, 'r') as batch:
+            batch.readline()
+            for row in csv.reader(batch):
+                anti_fraud.parse_row(row)
+    return time.time() - started
+
+
+def run(batchfile, streamfile, workdir, **options):
+    """
+    This function runs batch and stream stages.
+
+    :return:
+        (seconds of batch stage, seconds of stream stage, contents of outputs)
+    """
+    anti_fraud = AntiFraud(**options)
+    started = time.time()
+    anti_fraud.batch_processing(batchfile)
+    batch = time.time() - started
+    outputs = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+    started = time.time()
+    anti_fraud.stream_processing(streamfile, *outputs)
+    stream = time.time() - started
+    contents = []
+    for path in outputs:
+        with open(path) as output:
+            contents.append(output.read())
+    return batch, stream, contents
+
+
+def main(batch_rows='500000', stream_rows='2000'):
+    batch_rows, stream_rows = int(batch_rows), int(stream_rows)
+    workdir = tempfile.mkdtemp()
+    try:
+        text = (os.path.join(workdir, 'batch_payment.txt'), os.path.join(workdir, 'stream_payment.txt'))
+        write_payments(text[0], batch_rows, batch_rows // 10, 1)
+        write_payments(text[1], stream_rows, batch_rows // 10, 2)
+        print("batch rows %d, stream rows %d" % (batch_rows, stream_rows))
+
+        files = [('text', text)]
+        for name, messages in (('binary', True), ('binary, no messages', False)):
+            paths = tuple(path.replace('.txt', '.%s.pay' % ('full' if messages else 'bare')) for path in text)
+            started = time.time()
+            for source, path in zip(text, paths):
+                payfile.convert(source, path, messages=messages)
+            print("converted to %-20s in %6.2fs" % (name, time.time() - started))
+            files.append((name, paths))
+
+        modes = [('rows', {})]
+        try:
+            import numpy
+            modes.append(('columnar', {'columnar': True}))
+        except ImportError:
+            pass
+
+        print("%-20s %-9s %10s %10s %8s %8s %8s" % ('input', 'stages', 'batch MB', 'stream MB', 'parse', 'batch',
+                                                    'stream'))
+        expected = None
+        failed = False
+        for name, (batchfile, streamfile) in files:
+            parsed = parse(batchfile)
+            for mode, options in modes:
+                batch, stream, contents = run(batchfile, streamfile, workdir, **options)
+                expected = expected or contents
+                failed = failed or contents != expected
+                print("%-20s %-9s %10.1f %10.1f %7.2fs %7.2fs %7.2fs" % (name, mode, os.path.getsize(batchfile) / 1e6,
+                                                                         os.path.getsize(streamfile) / 1e6, parsed,
+                                                                         batch, stream))
+        print("outputs: %s" % ("DIFFER" if failed else "identical"))
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
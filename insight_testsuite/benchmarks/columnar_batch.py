@@ -0,0 +1,80 @@
+"""
+    Benchmark of batch stage: row by row parsing vs NumPy columnar path.
+
+    Builds payment graph from the same batch file both ways, checks that every user has the same connections and
+    reports time taken and rows per second.
+    Without a file, a random batch file of the given number of rows is generated.
+
+    Usage: python insight_testsuite/benchmarks/columnar_batch.py [batch_payment.txt | rows]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from antifraud import AntiFraud
+
+
+def write_batch(path, rows, users):
+    """
+    This function writes a random batch file with rows payments between users.
+    """
+    random.seed(32)
+    start = 1478000000
+    with open(path, 'w') as batch:
+        batch.write("time, id1, id2, amount, message\n")
+        stamp = None
+        for row in range(rows):
+            if row % 1000 == 0:
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start + row // 10))
+            batch.write("%s, %d, %d, %d.%02d, Food for \xf0\x9f\x8c\xbd\n" % (
+                stamp, random.randrange(users), random.randrange(users), random.randrange(200), random.randrange(100)))
+
+
+def build(columnar, batchfile):
+    anti_fraud = AntiFraud(columnar=columnar)
+    started = time.time()
+    anti_fraud.batch_processing(batchfile)
+    return anti_fraud, time.time() - started
+
+
+def main(source='1000000'):
+    workdir = tempfile.mkdtemp()
+    try:
+        if source.isdigit():
+            rows = int(source)
+            batchfile = os.path.join(workdir, 'batch_payment.txt')
+            write_batch(batchfile, rows, max(rows // 4, 10))
+        else:
+            batchfile = source
+            with open(batchfile, 'rb') as batch:
+                rows = sum(1 for _ in batch) - 1
+
+        by_row, row_seconds = build(False, batchfile)
+        by_column, column_seconds = build(True, batchfile)
+        print("rows              : %d" % rows)
+        print("row by row        : %7.2fs  (%d rows/s)" % (row_seconds, rows / row_seconds))
+        print("columnar          : %7.2fs  (%d rows/s)" % (column_seconds, rows / column_seconds))
+
+        graph, csr = by_row._AntiFraud__pay_graph, by_column._AntiFraud__pay_graph
+        same = by_row.max_allowed_payment == by_column.max_allowed_payment and graph.edge_count() == csr.edge_count()
+        for name in by_row.users.names:
+            user, other = by_row.users.ids[name], by_column.users.ids.get(name)
+            if other is None or sorted(by_row.users.name(target) for target in graph.neighbours(user)) != \
+                    sorted(by_column.users.name(target) for target in csr.neighbours(other)):
+                same = False
+                break
+        print("graphs            : %s" % ("identical" if same else "DIFFER"))
+        if not same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,85 @@
+"""
+    Benchmark of lazy graph store: startup time and users held in memory.
+
+    Batch file has clusters of users paying mostly within their cluster; stream payments only touch a few clusters.
+    Runs stream once with payment graph built in memory and once served from a graph store (built on first use,
+    then opened again as a restart would), and reports time to build graph, time of stream and users in memory.
+
+    Usage: python insight_testsuite/benchmarks/graph_store.py [rows] [stream payments] [cached partitions]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from antifraud import AntiFraud
+
+CLUSTER = 50
+
+
+def write_payments(path, rows, clusters, seed):
+    """
+    This function writes payments between users of one cluster, one in a hundred crosses to another cluster.
+    """
+    random.seed(seed)
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000))
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for _ in range(rows):
+            cluster = random.choice(clusters)
+            other = random.choice(clusters) if random.random() < 0.01 else cluster
+            payments.write("%s, %d, %d, 10.00, rent\n" % (stamp, cluster * CLUSTER + random.randrange(CLUSTER),
+                                                         other * CLUSTER + random.randrange(CLUSTER)))
+
+
+def run(batchfile, streamfile, workdir, **options):
+    anti_fraud = AntiFraud(**options)
+    started = time.time()
+    anti_fraud.batch_processing(batchfile)
+    built = time.time() - started
+    outputs = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+    started = time.time()
+    anti_fraud.stream_processing(streamfile, *outputs)
+    streamed = time.time() - started
+    anti_fraud.close()
+    with open(outputs[2]) as output:
+        verdicts = output.read()
+    graph = anti_fraud._AntiFraud__pay_graph
+    return built, streamed, len(graph.adjacency), getattr(graph, 'loads', 0), verdicts
+
+
+def main(rows='1000000', stream_rows='2000', cache_partitions='1024'):
+    rows, stream_rows, cache_partitions = int(rows), int(stream_rows), int(cache_partitions)
+    workdir = tempfile.mkdtemp()
+    try:
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        clusters = max(rows // 200, 2)
+        write_payments(batchfile, rows, list(range(clusters)), 1)
+        write_payments(streamfile, stream_rows, list(range(4)), 2)
+        store = os.path.join(workdir, 'store')
+
+        results = [('in memory', run(batchfile, streamfile, workdir)),
+                   ('store, first run', run(batchfile, streamfile, workdir, graph_store=store,
+                                            cache_partitions=cache_partitions)),
+                   ('store, restart', run(batchfile, streamfile, workdir, graph_store=store,
+                                          cache_partitions=cache_partitions))]
+        print("batch rows %d (%d users), stream payments %d" % (rows, clusters * CLUSTER, stream_rows))
+        print("%-18s %10s %10s %16s %16s" % ('', 'graph', 'stream', 'users in memory', 'partition reads'))
+        for name, (built, streamed, users, loads, _) in results:
+            print("%-18s %9.2fs %9.2fs %16d %16d" % (name, built, streamed, users, loads))
+        same = len(set(result[-1] for _, result in results)) == 1
+        print("verdicts          : %s" % ("identical" if same else "DIFFER"))
+        if not same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
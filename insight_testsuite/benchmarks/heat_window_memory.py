@@ -0,0 +1,67 @@
+"""
+    Memory benchmark: heat graph sliding window holding 1M payments.
+
+    Compares layout used before payments were interned (a [user1, user2] list of user id strings for every payment)
+    with the current layout (flat pairs of interned integer ids for every timestamp) and reports memory taken by the
+    AdditionalFeatures window after feeding it 1M in-window payments.
+
+    Usage: python insight_testsuite/benchmarks/heat_window_memory.py [payments] [users]
+"""
+
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from addedfeatures import AdditionalFeatures
+from payment import Payment, UserTable
+
+
+def measure(build):
+    """
+    This function returns memory allocated by build() and still alive once it returns.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, after - before
+
+
+def main(payments=1000000, users=50000):
+    random.seed(1)
+    # every payment lands in the same 60 seconds window.
+    rows = [(1478000000 + i * 60 // payments, str(random.randrange(users)), str(random.randrange(users)))
+            for i in range(payments)]
+
+    def list_layout():
+        window = {}
+        for ts, user1, user2 in rows:
+            # a new string per field as parsed from csv, and a new list per payment.
+            window.setdefault(ts, []).append([''.join(user1), ''.join(user2)])
+        return window
+
+    table = UserTable()
+
+    def interned_layout():
+        features = AdditionalFeatures()
+        for ts, user1, user2 in rows:
+            features.update_heat_graph(Payment(ts, table.intern(''.join(user1)), table.intern(''.join(user2)), 1.0))
+        return features
+
+    _, list_bytes = measure(list_layout)
+    features, total_bytes = measure(interned_layout)
+    window = features.payments_in_60sec
+    # interned ids are shared with the user table, window itself only owns its dictionary and lists.
+    window_bytes = sys.getsizeof(window) + sum(sys.getsizeof(pairs) for pairs in window.values())
+    print("payments in window            : %d" % sum(len(pairs) // 2 for pairs in window.values()))
+    print("[[user1, user2]] window       : %.1f MB" % (list_bytes / 1e6))
+    print("interned window               : %.1f MB" % (window_bytes / 1e6))
+    print("interned window + heat graph  : %.1f MB (including user table)" % (total_bytes / 1e6))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,72 @@
+"""
+    Benchmark of hub-aware search: latency of degree 4 searches in a payment graph with merchant-like hubs.
+
+    Ordinary users pay a few other users; a few hubs are paid by a large share of all users. Same searches (between
+    random users, half of them customers of a hub) are run with PaymentGraph.degree and HubSearch.degree. Reports
+    time to build hub index, mean, median, 99th percentile and worst latency, and checks degrees are the same.
+
+    Usage: python insight_testsuite/benchmarks/hub_search.py [users] [hubs] [customers per hub] [searches]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from hubs import HubSearch
+from paygraph import PaymentGraph
+
+
+def latencies(search, pairs):
+    """
+    This function runs degree 4 searches and returns their latencies in seconds and degrees found.
+    """
+    times, degrees = [], []
+    for user1, user2 in pairs:
+        started = time.perf_counter()
+        degrees.append(search(user1, user2, None, 4))
+        times.append(time.perf_counter() - started)
+    return sorted(times), degrees
+
+
+def main(users='100000', hubs='10', customers='20000', searches='300'):
+    users, hubs, customers, searches = int(users), int(hubs), int(customers), int(searches)
+    random.seed(42)
+    graph = PaymentGraph()
+    for _ in range(users * 2):
+        graph.add_edge(random.randrange(users), random.randrange(users), 0)
+    merchants = random.sample(range(users), hubs)
+    for merchant in merchants:
+        for customer in random.sample(range(users), customers):
+            graph.add_edge(customer, merchant, 0)
+    pairs = []
+    for _ in range(searches):
+        user1 = random.randrange(users)
+        if random.random() < 0.5:
+            user1 = random.choice(list(graph.neighbours(random.choice(merchants))))
+        pairs.append((user1, random.randrange(users)))
+
+    started = time.time()
+    hub_search = HubSearch(graph, users, hub_degree=1000, max_depth=4)
+    built = time.time() - started
+
+    print("users %d, %d hubs of %d customers, %d searches of degree 4" % (users, hubs, customers, searches))
+    print("hub index: %d hubs, built in %.2fs" % (len(hub_search.hubs), built))
+    print("%-12s %10s %10s %10s %10s" % ('', 'mean', 'median', 'p99', 'worst'))
+    results = []
+    for name, search in (('plain', graph.degree), ('hub-aware', hub_search.degree)):
+        times, degrees = latencies(search, pairs)
+        results.append(degrees)
+        print("%-12s %8.2fms %8.2fms %8.2fms %8.2fms" % (name, sum(times) / len(times) * 1000,
+                                                         times[len(times) // 2] * 1000,
+                                                         times[int(len(times) * 0.99)] * 1000, times[-1] * 1000))
+    same = results[0] == results[1]
+    print("degrees: %s" % ("identical" if same else "DIFFER"))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,84 @@
+"""
+    Benchmark of memory governor: peak memory and run time of a payment graph spilling inactive users.
+
+    Batch file follows a population that drifts over time: every payment is between users of a window of ids that
+    moves from the first to the last user, so early users go inactive, as in a long running deployment. Stream
+    payments are among the most recent users. antifraud.py is run in a child process without governor and with
+    memory ceilings; reports peak resident set size of the process, run time and governor summary, and checks
+    outputs are identical.
+
+    Usage: python insight_testsuite/benchmarks/memory_governor.py [users] [batch rows] [stream rows]
+"""
+
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ANTIFRAUD = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'antifraud.py')
+WINDOW = 5000           # ids of users active at one time.
+LIMITS = ['2', '8', '32']
+
+
+def write_payments(path, rows, users, first, last, seed):
+    """
+    This function writes payments one second apart whose window of active users moves from id first to id last.
+    """
+    random.seed(seed)
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for row in range(rows):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000 + row))
+            base = first + (last - first) * row // rows
+            payments.write("%s, %d, %d, 10.00, rent\n" % (stamp, min(base + random.randrange(WINDOW), users - 1),
+                                                          min(base + random.randrange(WINDOW), users - 1)))
+
+
+def main(users='200000', batch_rows='1000000', stream_rows='2000'):
+    users, batch_rows, stream_rows = int(users), int(batch_rows), int(stream_rows)
+    workdir = tempfile.mkdtemp()
+    try:
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        write_payments(batchfile, batch_rows, users, 0, users - WINDOW, 1)
+        write_payments(streamfile, stream_rows, users, users - WINDOW, users - WINDOW, 2)
+        print("users %d, batch rows %d, stream rows %d" % (users, batch_rows, stream_rows))
+
+        outputs = None
+        failed = False
+        print("%-12s %12s %10s  %s" % ('ceiling', 'peak RSS', 'run time', 'governor'))
+        # peak RSS of children is the largest of any child so far: smallest ceiling first, no ceiling last
+        for limit in LIMITS + [None]:
+            paths = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+            command = [sys.executable, ANTIFRAUD, batchfile, streamfile] + paths
+            if limit is not None:
+                command += ['--memory-limit', limit, '--spill-dir', workdir]
+            started = time.time()
+            result = subprocess.run(command, stderr=subprocess.PIPE, universal_newlines=True)
+            elapsed = time.time() - started
+            if result.returncode:
+                sys.stderr.write(result.stderr)
+                sys.exit(1)
+            peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+            summary = [line for line in result.stderr.splitlines() if line.startswith('memory governor')]
+            print("%-12s %9.1f MB %9.2fs  %s" % ('none' if limit is None else limit + ' MB', peak, elapsed,
+                                                 summary[0][len('memory governor: '):] if summary else ''))
+            contents = []
+            for path in paths:
+                with open(path) as output:
+                    contents.append(output.read())
+            outputs = outputs or contents
+            failed = failed or contents != outputs
+        print("outputs: %s" % ("DIFFER" if failed else "identical"))
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
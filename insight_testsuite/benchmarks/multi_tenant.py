@@ -0,0 +1,122 @@
+"""
+    Benchmark of tenant host: many small wallets served by one process instead of a process each.
+
+    Every tenant gets its own batch file and stream of random payments; tenants are busy in hours of their own, about
+    three at once. Streams are interleaved in order of time into one stream with tenant key as first column. Runs
+    antifraud.py once per tenant (one after the other, as separate deployments on a core would), then tenants.py
+    without limits and with limits on tenants loaded and on host memory. Reports total run time, peak resident set
+    size (of the host, and of the largest and all processes of separate deployments) and loads/unloads, and checks
+    outputs of every tenant are identical to its own antifraud.py run.
+
+    Usage: python insight_testsuite/benchmarks/multi_tenant.py [tenants] [batch rows] [stream rows]
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+OUTPUTS = ('output1.txt', 'output2.txt', 'output3.txt', 'output4.txt')
+# runs a script as __main__ and writes peak resident set size of the process (KB) to stderr at exit.
+PEAK = "import resource, runpy, sys\nsys.argv = sys.argv[1:]\nsys.path.insert(0, __import__('os').path.dirname(" \
+       "sys.argv[0]))\ntry:\n    runpy.run_path(sys.argv[0], run_name='__main__')\nfinally:\n    sys.stderr.write(" \
+       "'peak rss %d\\n' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+
+
+def payment(rng, ts, users):
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+    return "%s, %d, %d, %.2f, coffee\n" % (stamp, rng.randrange(users), rng.randrange(users), rng.uniform(1, 100))
+
+
+def run(script, arguments):
+    """
+    This function runs a script of src in a child process, which reports its own peak resident set size.
+
+    :return:
+        (seconds, peak RSS in MB, stderr)
+    """
+    command = [sys.executable, '-c', PEAK, os.path.join(SRC, script)] + arguments
+    started = time.time()
+    result = subprocess.run(command, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode:
+        sys.stderr.write(result.stderr)
+        sys.exit(1)
+    peak = [line for line in result.stderr.splitlines() if line.startswith('peak rss ')]
+    return time.time() - started, int(peak[-1].split()[-1]) / 1024.0, result.stderr
+
+
+def main(tenants='24', batch_rows='20000', stream_rows='1000'):
+    tenants, batch_rows, stream_rows = int(tenants), int(batch_rows), int(stream_rows)
+    workdir = tempfile.mkdtemp()
+    try:
+        rng = random.Random(1)
+        tenants_dir = os.path.join(workdir, 'tenants')
+        streams = []
+        for index in range(tenants):
+            name = 'wallet%02d' % index
+            os.makedirs(os.path.join(tenants_dir, name))
+            users = batch_rows // 4
+            with open(os.path.join(tenants_dir, name, 'batch_payment.txt'), 'w') as batch:
+                batch.write("time, id1, id2, amount, message\n")
+                batch.writelines(payment(rng, 1478000000 + row, users) for row in range(batch_rows))
+            # tenants are busy in hours of their own (regions): stream of tenant i spans three times as long as the
+            # shift between two tenants, so about three tenants are busy at once
+            start = 1478100000 + index * stream_rows
+            lines = sorted(payment(rng, start + rng.randrange(stream_rows * 3), users) for row in range(stream_rows))
+            with open(os.path.join(tenants_dir, name, 'stream_payment.txt'), 'w') as stream:
+                stream.write("time, id1, id2, amount, message\n")
+                stream.writelines(lines)
+            streams.append((name, lines))
+        # interleave streams of tenants, in order of time
+        merged = sorted(((line[:19], index, name, line) for index, (name, lines) in enumerate(streams)
+                         for line in lines), key=lambda entry: entry[:2])
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        with open(streamfile, 'w') as stream:
+            stream.write("tenant, time, id1, id2, amount, message\n")
+            stream.writelines("%s, %s" % (name, line) for _, _, name, line in merged)
+        print("tenants %d, batch rows %d each, stream rows %d each" % (tenants, batch_rows, stream_rows))
+
+        # separate deployments, one after the other
+        separate = os.path.join(workdir, 'separate')
+        elapsed = 0.0
+        peaks = []
+        for name, _ in streams:
+            outputs = [os.path.join(separate, name, output) for output in OUTPUTS]
+            os.makedirs(os.path.join(separate, name))
+            seconds, peak, _ = run('antifraud.py', [os.path.join(tenants_dir, name, 'batch_payment.txt'),
+                                                    os.path.join(tenants_dir, name, 'stream_payment.txt')] + outputs)
+            elapsed += seconds
+            peaks.append(peak)
+        print("%-28s %9s %12s  %s" % ('mode', 'run time', 'peak RSS', ''))
+        print("%-28s %8.2fs %9.1f MB  largest process, %.1f MB for %d processes at once" % (
+            'process per tenant', elapsed, max(peaks), sum(peaks), tenants))
+
+        failed = False
+        for name, options in (('host, no limit', []), ('host, 8 loaded', ['--max-loaded', '8']),
+                              ('host, 4 loaded', ['--max-loaded', '4']), ('host, 2 loaded', ['--max-loaded', '2']),
+                              ('host, 20 MB', ['--host-memory', '20']),
+                              ('host, 20 MB, budget 1 MB', ['--host-memory', '20', '--tenant-memory', '1'])):
+            output_dir = os.path.join(workdir, 'host')
+            seconds, peak, stderr = run('tenants.py', [tenants_dir, streamfile, output_dir, '--spool-dir', workdir] +
+                                        options)
+            summary = [line for line in stderr.splitlines() if line.startswith('tenant host')]
+            print("%-28s %8.2fs %9.1f MB  %s" % (name, seconds, peak, summary[0].split(', ', 3)[-1] if summary else ''))
+            for tenant, _ in streams:
+                for output in OUTPUTS:
+                    with open(os.path.join(separate, tenant, output)) as expected, \
+                            open(os.path.join(output_dir, tenant, output)) as hosted:
+                        failed = failed or expected.read() != hosted.read()
+            shutil.rmtree(output_dir)
+        print("outputs: %s" % ("DIFFER" if failed else "identical to process per tenant"))
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
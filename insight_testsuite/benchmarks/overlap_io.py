@@ -0,0 +1,125 @@
+"""
+    Benchmark of overlapped I/O in stream stage on a slow file system.
+
+    Files of stream stage are opened through a throttled wrapper: every read or write system call waits a fixed
+    latency plus its size over a bandwidth, as a network file system would. Stream stage is run with and without
+    --overlap-io, throttled and not, and outputs of both are checked to be identical.
+
+    Usage: python insight_testsuite/benchmarks/overlap_io.py [stream rows] [latency ms] [bandwidth MB/s]
+"""
+
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+import antifraud
+from antifraud import AntiFraud
+
+
+class ThrottledRaw(io.RawIOBase):
+    """
+    ThrottledRaw is a raw file whose every read and write waits latency + bytes / bandwidth.
+    """
+    def __init__(self, path, mode, latency, bandwidth):
+        self.file = io.FileIO(path, mode)
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def readable(self):
+        return self.file.readable()
+
+    def writable(self):
+        return self.file.writable()
+
+    def readinto(self, buffer):
+        count = self.file.readinto(buffer)
+        time.sleep(self.latency + count / self.bandwidth)
+        return count
+
+    def write(self, data):
+        time.sleep(self.latency + len(data) / self.bandwidth)
+        return self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def throttled_open(latency, bandwidth):
+    """
+    This function returns a replacement of open for text files of stream stage.
+    """
+    def open_file(path, mode='r', buffering=-1):
+        raw = ThrottledRaw(path, mode[0], latency, bandwidth)
+        size = buffering if buffering > 1 else io.DEFAULT_BUFFER_SIZE
+        buffer = io.BufferedReader(raw, size) if mode[0] == 'r' else io.BufferedWriter(raw, size)
+        return io.TextIOWrapper(buffer)
+    return open_file
+
+
+def write_payments(path, rows, users, seed):
+    """
+    This function writes a file of random payments, one second apart.
+    """
+    random.seed(seed)
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for row in range(rows):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000 + row))
+            payments.write("%s, %d, %d, %.2f, payment for dinner and drinks\n" %
+                           (stamp, random.randrange(users), random.randrange(users), random.uniform(1, 200)))
+
+
+def run(batchfile, streamfile, workdir, opener, **options):
+    anti_fraud = AntiFraud(**options)
+    anti_fraud.batch_processing(batchfile)
+    outputs = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+    antifraud.open = opener
+    try:
+        started = time.time()
+        anti_fraud.stream_processing(streamfile, *outputs)
+        elapsed = time.time() - started
+    finally:
+        del antifraud.open
+    verdicts = []
+    for path in outputs:
+        with open(path) as output:
+            verdicts.append(output.read())
+    return elapsed, verdicts
+
+
+def main(rows='100000', latency='2', bandwidth='20'):
+    rows, latency, bandwidth = int(rows), float(latency) / 1000, float(bandwidth) * 1e6
+    workdir = tempfile.mkdtemp()
+    try:
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        write_payments(batchfile, rows, rows // 2, 1)
+        write_payments(streamfile, rows, rows // 2, 2)
+
+        slow = throttled_open(latency, bandwidth)
+        print("stream rows %d, file system latency %.1f ms, bandwidth %.0f MB/s" % (rows, latency * 1000,
+                                                                                   bandwidth / 1e6))
+        results = []
+        for name, opener in (('local', open), ('throttled', slow)):
+            for overlap_io in (False, True):
+                elapsed, verdicts = run(batchfile, streamfile, workdir, opener, overlap_io=overlap_io)
+                results.append(verdicts)
+                print("%-10s %-14s: %7.2fs  %8.0f payments/s" % (name, "overlapped" if overlap_io else "sequential",
+                                                                 elapsed, rows / elapsed))
+        same = all(verdicts == results[0] for verdicts in results)
+        print("outputs    : %s" % ("identical" if same else "DIFFER"))
+        if not same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
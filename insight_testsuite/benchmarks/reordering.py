@@ -0,0 +1,101 @@
+"""
+    Benchmark of graph reordering: latency of degree 4 searches before and after users are relabelled.
+
+    Batch file has communities of users paying mostly within their community, in random order, so ids interned in
+    order of first appearance scatter every community. Graph is built by the batch stage (dictionary adjacency, and
+    CSR arrays with --columnar if NumPy is installed), the same searches (by user id string) are timed before and
+    after every ordering, and degrees found are checked to be the same.
+
+    Usage: python insight_testsuite/benchmarks/reordering.py [rows] [searches]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from antifraud import AntiFraud
+from reorder import ORDERINGS, bandwidth
+
+COMMUNITY = 500
+
+
+def write_payments(path, rows, users):
+    """
+    This function writes payments within communities of users, one in fifty to another community.
+    """
+    random.seed(41)
+    labels = list(range(users))
+    random.shuffle(labels)
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000))
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for _ in range(rows):
+            user1 = random.randrange(users)
+            base = user1 - user1 % COMMUNITY if random.random() < 0.98 else random.randrange(0, users, COMMUNITY)
+            user2 = min(base + random.randrange(COMMUNITY), users - 1)
+            payments.write("%s, %d, %d, 10.00, rent\n" % (stamp, labels[user1], labels[user2]))
+    return [str(label) for label in labels]
+
+
+def searches(anti_fraud, pairs):
+    """
+    This function runs degree 4 searches between pairs of user id strings.
+
+    :return:
+        (seconds per search, degrees found)
+    """
+    graph = anti_fraud._AntiFraud__pay_graph
+    ids = anti_fraud.users.ids
+    pairs = [(ids[name1], ids[name2]) for name1, name2 in pairs]
+    started = time.perf_counter()
+    degrees = [graph.degree(user1, user2, None, 4) for user1, user2 in pairs]
+    return (time.perf_counter() - started) / len(pairs), degrees
+
+
+def main(rows='500000', count='2000'):
+    rows, count = int(rows), int(count)
+    workdir = tempfile.mkdtemp()
+    try:
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        names = write_payments(batchfile, rows, max(rows // 10, COMMUNITY))
+        random.seed(42)
+        pairs = [(random.choice(names), random.choice(names)) for _ in range(count)]
+        modes = [('dict', {})]
+        try:
+            import numpy
+            modes.append(('csr', {'columnar': True}))
+        except ImportError:
+            pass
+
+        print("batch rows %d, %d users, %d searches of degree 4" % (rows, len(names), count))
+        print("%-6s %-10s %12s %12s %14s" % ('graph', 'ordering', 'relabel', 'per search', 'id bandwidth'))
+        failed = False
+        for mode, options in modes:
+            for method in (None,) + ORDERINGS:
+                anti_fraud = AntiFraud(reorder=method, **options)
+                anti_fraud.batch_processing(batchfile)
+                started = time.time()
+                anti_fraud.reorder_users()
+                relabel = time.time() - started
+                searches(anti_fraud, pairs[:100])       # warm up
+                latency, degrees = searches(anti_fraud, pairs)
+                if method is None:
+                    expected = degrees
+                failed = failed or degrees != expected
+                print("%-6s %-10s %11.2fs %10.1fus %14.0f" % (mode, method or 'appearance', relabel, latency * 1e6,
+                                                             bandwidth(anti_fraud._AntiFraud__pay_graph,
+                                                                       len(anti_fraud.users))))
+        print("degrees: %s" % ("DIFFER" if failed else "identical"))
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,111 @@
+"""
+    Benchmark of replay mode: a sweep of additional features parameters as full runs and as one replay.
+
+    Stream has bursts of payments from a few users, so window and limits of check_if_suspicious change verdicts. Every
+    configuration is run through batch and stream stages as antifraud.py would, then all of them are replayed with
+    replay.py (sequentially and in worker processes). Verdicts of every configuration are checked to agree with
+    output4 of its full run.
+
+    Usage: python insight_testsuite/benchmarks/replay_sweep.py [batch rows] [stream rows] [workers]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+import replay
+from addedfeatures import AdditionalFeatures
+from antifraud import AntiFraud, VERDICTS
+
+CONFIGS = [{}, {'window': 30}, {'window': 120}, {'fan_out_limit': 5}, {'pair_limit': 3},
+           {'window': 120, 'fan_out_limit': 5, 'pair_limit': 3}, {'expiry': 3600}, {'max_payment': 100.0}]
+
+
+def write_payments(path, rows, users, seed, bursts=False):
+    """
+    This function writes a file of random payments a second apart; with bursts, half are sent by four busy
+    users.
+    """
+    random.seed(seed)
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for row in range(rows):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000 + row))
+            user1 = random.randrange(4) if bursts and random.random() < 0.5 else random.randrange(users)
+            payments.write("%s, %d, %d, %.2f, rent\n" % (stamp, user1, random.randrange(users),
+                                                         random.uniform(1, 200)))
+
+
+def classify(line):
+    """
+    This function returns verdict name of a line of output4.
+    """
+    if line in ('trusted', 'unverified'):
+        return line
+    for verdict in VERDICTS[2:]:
+        if verdict in line:
+            return verdict
+    return line
+
+
+def full_run(batchfile, streamfile, workdir, config):
+    """
+    This function runs batch and stream stages with additional features of config.
+
+    :return:
+        verdict names of output4.
+    """
+    anti_fraud = AntiFraud()
+    anti_fraud.batch_processing(batchfile)
+    if config.get('max_payment') is not None:
+        anti_fraud.max_allowed_payment = config['max_payment']
+    anti_fraud.added_features = AdditionalFeatures(**dict((name, value) for name, value in config.items()
+                                                          if name != 'max_payment'))
+    outputs = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+    anti_fraud.stream_processing(streamfile, *outputs)
+    with open(outputs[3]) as output4:
+        return [classify(line) for line in output4.read().splitlines()]
+
+
+def main(batch_rows='30000', stream_rows='10000', workers='4'):
+    batch_rows, stream_rows, workers = int(batch_rows), int(stream_rows), int(workers)
+    workdir = tempfile.mkdtemp()
+    try:
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        write_payments(batchfile, batch_rows, batch_rows // 4, 1)
+        write_payments(streamfile, stream_rows, batch_rows // 4, 2, bursts=True)
+        print("batch rows %d, stream rows %d, %d configurations" % (batch_rows, stream_rows, len(CONFIGS)))
+
+        started = time.time()
+        expected = [full_run(batchfile, streamfile, workdir, config) for config in CONFIGS]
+        print("full runs          : %7.2fs" % (time.time() - started))
+
+        events_file = os.path.join(workdir, 'stream.events')
+        failed = False
+        with open(os.devnull, 'w') as quiet:
+            for name, count in (('replay, parsing', 1), ('replay, parsed', 1), ('replay, %d workers' % workers,
+                                                                                 workers)):
+                started = time.time()
+                results = replay.main(batchfile, streamfile, CONFIGS, events_file=events_file, workers=count,
+                                      report=quiet)
+                print("%-19s: %7.2fs" % (name, time.time() - started))
+                failed = failed or [[VERDICTS[verdict] for verdict in verdicts] for verdicts in results] != expected
+        for config, verdicts in zip(CONFIGS, expected):
+            label = ','.join("%s=%s" % item for item in sorted(config.items())) or 'defaults'
+            print("  %-44s %s" % (label, ' '.join("%s %d" % (verdict, verdicts.count(verdict))
+                                                   for verdict in VERDICTS if verdict in verdicts)))
+        print("verdicts: %s" % ("DIFFER" if failed else "identical to full runs"))
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,108 @@
+"""
+    Benchmark of search budgets: tail latency of degree searches against verdicts given up.
+
+    Batch file has ordinary users paying a few others and a few merchants paid by a large share of all users, so
+    searches reaching a merchant explode. Stream stage is run without budget, then with budgets of users visited and
+    of microseconds. Reports share of searches that exhausted their budget, latency (p50, p99, worst) and share of
+    output3 verdicts changed. Smallest budget is run again with re-checks (apart, as the re-check process competes
+    for the CPU on a single core), and re-checked degrees are checked to correct every changed verdict.
+
+    Usage: python insight_testsuite/benchmarks/search_budget.py [users] [merchants] [stream rows]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from antifraud import AntiFraud
+
+BUDGETS = [('users', 20000), ('users', 5000), ('users', 1000), ('us', 20000), ('us', 5000), ('us', 1000)]
+
+
+def write_payments(path, rows, users, merchants, seed):
+    """
+    This function writes random payments one second apart, one in ten to a merchant.
+    """
+    random.seed(seed)
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for row in range(rows):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000 + row))
+            user2 = random.choice(merchants) if random.random() < 0.1 else random.randrange(users)
+            payments.write("%s, %d, %d, 10.00, coffee\n" % (stamp, random.randrange(users), user2))
+
+
+def run(batchfile, streamfile, workdir, **options):
+    """
+    This function runs batch and stream stages.
+
+    :return:
+        (AntiFraud, lines of output3)
+    """
+    anti_fraud = AntiFraud(**options)
+    anti_fraud.batch_processing(batchfile)
+    outputs = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+    stderr = sys.stderr
+    sys.stderr = open(os.devnull, 'w')
+    try:
+        anti_fraud.stream_processing(streamfile, *outputs)
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+    with open(outputs[2]) as output3:
+        return anti_fraud, output3.read().splitlines()
+
+
+def main(users='50000', merchants='5', stream_rows='2000'):
+    users, merchants, stream_rows = int(users), int(merchants), int(stream_rows)
+    workdir = tempfile.mkdtemp()
+    try:
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        random.seed(0)
+        shops = random.sample(range(users), merchants)
+        write_payments(batchfile, users * 3, users, shops, 1)
+        write_payments(streamfile, stream_rows, users, shops, 2)
+        print("users %d, %d merchants, batch rows %d, stream rows %d" % (users, merchants, users * 3, stream_rows))
+
+        # without budget: latencies measured by a budget no search reaches
+        baseline, expected = run(batchfile, streamfile, workdir, search_budget=users * 10)
+        print("%-16s %10s %9s %9s %9s %10s" % ('budget', 'exhausted', 'p50', 'p99', 'worst', 'changed'))
+
+        def report(name, budget, changed):
+            latencies = sorted(budget.latencies)
+            searches = len(latencies)
+            print("%-16s %9.2f%% %7.0fus %7.0fus %7.0fus %9.2f%%" % (
+                name, 100.0 * budget.exhausted_count / searches, latencies[searches // 2] * 1e6,
+                latencies[int(searches * 0.99)] * 1e6, latencies[-1] * 1e6, 100.0 * changed / searches))
+
+        report('none', baseline.search_budget, 0)
+        for unit, limit in BUDGETS:
+            options = {'search_budget': limit} if unit == 'users' else {'search_budget_us': limit}
+            anti_fraud, lines = run(batchfile, streamfile, workdir, **options)
+            changed = sum(1 for line, original in zip(lines, expected) if line != original)
+            report('%d %s' % (limit, unit), anti_fraud.search_budget, changed)
+
+        # re-checked verdicts of output3 restore the output of the run without budget
+        recheck = os.path.join(workdir, 'recheck.txt')
+        _, lines = run(batchfile, streamfile, workdir, search_budget=min(limit for unit, limit in BUDGETS
+                                                                         if unit == 'users'), recheck=recheck)
+        with open(recheck) as rechecks:
+            for correction in rechecks:
+                fields = correction.rstrip('\n').split(', ')
+                lines[int(fields[0]) - 1] = fields[4] + (' ' if fields[1] != 'none' else '')
+        failed = lines != expected
+        print("re-checked verdicts: %s" % ("DIFFER" if failed else "identical to run without budget"))
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,54 @@
+"""
+    Benchmark of degree search with and without path reconstruction.
+
+    Builds payment graph from a random batch file and runs the same degree 4 searches with degree (degree only)
+    and shortest_path (keeps the user every user was reached from). Reports time of both and checks that degree
+    found is the same for every search.
+
+    Usage: python insight_testsuite/benchmarks/search_paths.py [batch rows] [searches] [repeats]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from paygraph import PaymentGraph
+
+
+def timed(search, pairs):
+    started = time.perf_counter()
+    results = [search(user1, user2, None, 4) for user1, user2 in pairs]
+    return time.perf_counter() - started, results
+
+
+def main(rows='300000', searches='2000', repeats='5'):
+    rows, searches, repeats = int(rows), int(searches), int(repeats)
+    random.seed(39)
+    users = rows // 2
+    graph = PaymentGraph()
+    for _ in range(rows):
+        graph.add_edge(random.randrange(users), random.randrange(users), 0)
+    pairs = [(random.randrange(users), random.randrange(users)) for _ in range(searches)]
+
+    degree_times, path_times = [], []
+    for _ in range(repeats):
+        elapsed, degrees = timed(graph.degree, pairs)
+        degree_times.append(elapsed)
+        elapsed, paths = timed(graph.shortest_path, pairs)
+        path_times.append(elapsed)
+    degree_time, path_time = min(degree_times), min(path_times)
+
+    print("batch rows %d, %d searches of degree 4 (best of %d)" % (rows, searches, repeats))
+    print("degree only   : %7.3fs" % degree_time)
+    print("with paths    : %7.3fs  (%+.1f%%)" % (path_time, (path_time / degree_time - 1) * 100))
+    same = degrees == [None if path is None else len(path) - 1 for path in paths]
+    print("degrees       : %s" % ("identical" if same else "DIFFER"))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
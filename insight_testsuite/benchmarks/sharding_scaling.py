@@ -0,0 +1,79 @@
+"""
+    Scaling benchmark and correctness check of sharded mode.
+
+    Runs the same batch and stream files through the single process AntiFraud and through ShardedAntiFraud with
+    1, 2, 4, 8 and 16 shards, checks that output1-output4 are identical and reports time taken by every run.
+    Without files, a random payment graph is generated.
+
+    Usage: python insight_testsuite/benchmarks/sharding_scaling.py [batch_payment.txt stream_payment.txt]
+"""
+
+import filecmp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from antifraud import AntiFraud
+from sharding import ShardedAntiFraud
+
+
+def write_payments(path, rows, users, start):
+    """
+    This function writes rows random payments between users to path, one payment per second from start.
+    """
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for row in range(rows):
+            payments.write("%s, %d, %d, %.2f, benchmark\n" % (
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start + row)),
+                random.randrange(users), random.randrange(users), random.uniform(1, 100)))
+
+
+def run(anti_fraud, batchfile, streamfile, outputs):
+    """
+    This function classifies stream and returns seconds spent in batch and stream stages.
+    """
+    started = time.time()
+    anti_fraud.batch_processing(batchfile)
+    loaded = time.time()
+    anti_fraud.stream_processing(streamfile, *outputs)
+    return loaded - started, time.time() - loaded
+
+
+def main(batchfile=None, streamfile=None):
+    workdir = tempfile.mkdtemp()
+    try:
+        if batchfile is None:
+            random.seed(29)
+            batchfile = os.path.join(workdir, 'batch_payment.txt')
+            streamfile = os.path.join(workdir, 'stream_payment.txt')
+            write_payments(batchfile, 200000, 100000, 1478000000)
+            write_payments(streamfile, 2000, 110000, 1478300000)
+
+        reference = [os.path.join(workdir, 'single%d.txt' % index) for index in range(1, 5)]
+        batch, stream = run(AntiFraud(), batchfile, streamfile, reference)
+        print("%-10s batch %7.2fs  stream %7.2fs" % ("single", batch, stream))
+
+        for shards in (1, 2, 4, 8, 16):
+            outputs = [os.path.join(workdir, 'shards%d.txt' % index) for index in range(1, 5)]
+            anti_fraud = ShardedAntiFraud(shards)
+            try:
+                batch, stream = run(anti_fraud, batchfile, streamfile, outputs)
+            finally:
+                anti_fraud.close()
+            same = all(filecmp.cmp(expected, actual, shallow=False) for expected, actual in zip(reference, outputs))
+            print("%-10s batch %7.2fs  stream %7.2fs  %s" % ("%d shards" % shards, batch, stream,
+                                                           "outputs match" if same else "OUTPUTS DIFFER"))
+            if not same:
+                sys.exit(1)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,77 @@
+"""
+    Benchmark of startup: time to first verdict of a fresh interpreter.
+
+    Stream file holds a single payment, so wall time of a run is the time until its verdict is written: interpreter
+    start, imports, batch stage (or snapshot loading) and one classification. Every case is run several times and
+    the median is reported. src is byte-compiled first, as it is once at deployment.
+
+    Usage: python insight_testsuite/benchmarks/startup.py [batch rows] [runs]
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+
+
+def write_payments(path, rows, users):
+    """
+    This function writes a file of random payments.
+    """
+    random.seed(37)
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(1478000000))
+    with open(path, 'w') as payments:
+        payments.write("time, id1, id2, amount, message\n")
+        for _ in range(rows):
+            payments.write("%s, %d, %d, 10.00, rent\n" % (stamp, random.randrange(users), random.randrange(users)))
+
+
+def first_verdict(script, batchfile, streamfile, workdir, runs, *options):
+    """
+    This function returns median wall time of runs of script.
+    """
+    outputs = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+    times = []
+    for _ in range(runs):
+        started = time.time()
+        subprocess.check_call([sys.executable, os.path.join(SRC, script), batchfile, streamfile] + outputs +
+                              list(options))
+        times.append(time.time() - started)
+    return sorted(times)[len(times) // 2]
+
+
+def main(rows='100000', runs='5'):
+    rows, runs = int(rows), int(runs)
+    subprocess.check_call([sys.executable, '-m', 'compileall', '-q', SRC])
+    workdir = tempfile.mkdtemp()
+    try:
+        empty = os.path.join(workdir, 'empty_batch.txt')
+        batchfile = os.path.join(workdir, 'batch_payment.txt')
+        streamfile = os.path.join(workdir, 'stream_payment.txt')
+        snapshot = os.path.join(workdir, 'batch.snapshot')
+        write_payments(empty, 0, 1)
+        write_payments(batchfile, rows, max(rows // 4, 10))
+        write_payments(streamfile, 1, max(rows // 4, 10))
+
+        print("time to first verdict (median of %d runs)" % runs)
+        print("empty batch, antifraud.py       : %7.3fs" % first_verdict('antifraud.py', empty, streamfile, workdir,
+                                                                      runs))
+        print("empty batch, classify.py        : %7.3fs" % first_verdict('classify.py', empty, streamfile, workdir,
+                                                                      runs))
+        print("%d rows, batch stage        : %7.3fs" % (rows, first_verdict('classify.py', batchfile, streamfile,
+                                                                        workdir, runs)))
+        # first run writes snapshot, the following ones load it
+        first_verdict('classify.py', batchfile, streamfile, workdir, 1, '--snapshot', snapshot)
+        print("%d rows, snapshot           : %7.3fs" % (rows, first_verdict('classify.py', batchfile, streamfile,
+                                                                        workdir, runs, '--snapshot', snapshot)))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
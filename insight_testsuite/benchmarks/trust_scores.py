@@ -0,0 +1,87 @@
+"""
+    Benchmark of common neighbour counts behind trust scores.
+
+    Builds payment graph from random payments, a share of them to a few merchants so some users have large degrees.
+    Counts common neighbours of random pairs of customers, of customers paying a merchant and of merchants refunding
+    a customer three ways: by a second search of depth 2 (every connection of payer is expanded and checked for
+    payee), by intersecting connections of the two users in PaymentGraph, and by binary search of sorted slices in
+    CSRGraph (columnar.py, if NumPy is installed). Reports mean time of each next to the degree 4 search every payment
+    already makes, and checks counts are identical.
+
+    Usage: python insight_testsuite/benchmarks/trust_scores.py [batch rows] [queries] [merchants]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from paygraph import PaymentGraph
+
+
+def expanded(graph, user1, user2, since=None, max_depth=None):
+    """
+    This function counts paths of degree 2 by expanding every connection of user1: a second search.
+    """
+    if user1 == user2:
+        return 0
+    return sum(1 for connected in graph.neighbours(user1, since) if user2 in graph.neighbours(connected, since))
+
+
+def timed(count, pairs):
+    started = time.perf_counter()
+    results = [count(user1, user2, None, 4) for user1, user2 in pairs]
+    return (time.perf_counter() - started) / len(pairs) * 1e6, results
+
+
+def main(rows='300000', queries='500', merchants='5'):
+    rows, queries, merchants = int(rows), int(queries), int(merchants)
+    random.seed(50)
+    users = rows // 4
+    graph = PaymentGraph()
+    timestamps, user1, user2 = [], [], []
+    for row in range(rows):
+        payer = random.randrange(merchants, users)
+        payee = random.randrange(merchants) if random.random() < 0.2 else random.randrange(merchants, users)
+        graph.add_edge(payer, payee, row)
+        timestamps.append(row)
+        user1.append(payer)
+        user2.append(payee)
+    customers = [(random.randrange(merchants, users), random.randrange(merchants, users)) for _ in range(queries)]
+    to_merchant = [(random.randrange(merchants, users), random.randrange(merchants)) for _ in range(queries)]
+    refunds = [(payee, payer) for payer, payee in to_merchant]
+
+    counts = [('degree 4 search', graph.degree),
+              ('second search', lambda user1, user2, since, depth: expanded(graph, user1, user2, since)),
+              ('intersection', lambda user1, user2, since, depth: graph.common_neighbours(user1, user2, since))]
+    try:
+        import numpy as np
+        import columnar
+        csr = columnar.build_graph(np.array(timestamps, dtype=np.int64), np.array(user1, dtype=np.uint32),
+                                   np.array(user2, dtype=np.uint32), users)
+        counts.append(('sorted slices (CSR)',
+                       lambda user1, user2, since, depth: csr.common_neighbours(user1, user2, since)))
+    except ImportError:
+        pass
+
+    print("batch rows %d, %d users, %d merchants paid by 20%% of payments; %d queries per kind" % (
+        rows, users, merchants, queries))
+    print("%-22s %15s %15s %15s" % ('', 'customers', 'to merchant', 'refund'))
+    same = True
+    expected = None
+    for name, count in counts:
+        results = [timed(count, pairs) for pairs in (customers, to_merchant, refunds)]
+        print("%-22s %s" % (name, ' '.join("%12.1f us" % elapsed for elapsed, _ in results)))
+        if name != 'degree 4 search':
+            found = [found for _, found in results]
+            expected = expected or found
+            same = same and found == expected
+    print("common neighbours: %s" % ("identical" if same else "DIFFER"))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
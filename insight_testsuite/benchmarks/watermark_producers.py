@@ -0,0 +1,148 @@
+"""
+    Benchmark and determinism check of a watermark window fed by several producer threads.
+
+    Generates out-of-order stream payments and deals them to producers, each producer keeping the order it was dealt.
+    The reference run feeds producers one payment at a time in turn from a single thread, releasing after every
+    payment. Then every producer gets a thread of its own while a consumer thread releases and applies released
+    payments to a heat graph, repeated with a switch interval of 1 us so threads interleave differently each time.
+    Late payments, verdicts of released payments (active, suspicious) and pickled heat graph state must be identical
+    to the reference on every repetition.
+
+    Also reports ingest throughput (payments per second) of one producer thread vs one thread per producer, ingesting
+    alone and with a consumer releasing at the same time.
+
+    Usage: python insight_testsuite/benchmarks/watermark_producers.py [payments] [producers] [repetitions]
+"""
+
+import os
+import pickle
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+
+from addedfeatures import AdditionalFeatures
+from payment import Payment
+from watermark import WatermarkWindow
+
+LATENESS = 5
+
+
+def generate(payments, users=2000):
+    random.seed(30)
+    start = 1478000000
+    return [Payment(start + sequence // 20 - random.choice((0, 0, 0, 1, 2, 4, 8)), random.randrange(users),
+                    random.randrange(users), 1.0) for sequence in range(payments)]
+
+
+def deal(stream, producers):
+    """
+    This function deals stream to producers in turn: payment i goes to producer i % producers.
+    """
+    return [[(sequence, stream[sequence]) for sequence in range(producer, len(stream), producers)]
+            for producer in range(producers)]
+
+
+def apply(features, verdicts, released):
+    for sequence, payment in released:
+        verdicts.append((sequence, features.update_heat_graph(payment), features.check_if_suspicious(payment)))
+        features.suspected = False
+
+
+def reference(shares):
+    """
+    This function feeds producers in turn from one thread.
+
+    :return:
+        (late sequences, verdicts, pickled heat graph)
+    """
+    window = WatermarkWindow(LATENESS, len(shares))
+    features = AdditionalFeatures()
+    verdicts, late = [], []
+    for position in range(max(len(share) for share in shares)):
+        for producer, share in enumerate(shares):
+            if position < len(share):
+                sequence, payment = share[position]
+                if not window.ingest(payment, (sequence, payment), producer):
+                    late.append(sequence)
+                apply(features, verdicts, window.release())
+    apply(features, verdicts, window.release(flush=True))
+    return sorted(late), verdicts, pickle.dumps(features)
+
+
+def threaded(shares, consume=True):
+    """
+    This function feeds every producer from a thread of its own, a consumer thread releasing at the same time.
+
+    :return:
+        (late sequences, verdicts, pickled heat graph, seconds producers took)
+    """
+    window = WatermarkWindow(LATENESS, len(shares))
+    features = AdditionalFeatures()
+    verdicts, lates = [], [[] for _ in shares]
+    done = threading.Event()
+
+    def produce(producer):
+        late = lates[producer]
+        for sequence, payment in shares[producer]:
+            if not window.ingest(payment, (sequence, payment), producer):
+                late.append(sequence)
+        window.finish(producer)
+
+    def consumer():
+        while not done.is_set():
+            apply(features, verdicts, window.release())
+        apply(features, verdicts, window.release(flush=True))
+
+    threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(len(shares))]
+    releasing = threading.Thread(target=consumer)
+    if consume:
+        releasing.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    done.set()
+    if consume:
+        releasing.join()
+    return sorted(sum(lates, [])), verdicts, pickle.dumps(features), seconds
+
+
+def main(payments='200000', producers='4', repetitions='5'):
+    payments, producers, repetitions = int(payments), int(producers), int(repetitions)
+    stream = generate(payments)
+    shares = deal(stream, producers)
+    expected = reference(shares)
+    print("%d payments, %d producers, allowed lateness %ds: %d late in reference run" % (
+        payments, producers, LATENESS, len(expected[0])))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    same = True
+    try:
+        for repetition in range(repetitions):
+            result = threaded(shares)
+            identical = result[:3] == expected
+            same = same and identical
+            print("repetition %d: late, verdicts and heat graph %s" % (repetition + 1,
+                                                                       "identical" if identical else "DIFFER"))
+    finally:
+        sys.setswitchinterval(interval)
+
+    print("%-40s %15s" % ('ingest throughput', 'payments/s'))
+    for name, feed, consume in (('1 producer thread', deal(stream, 1), False),
+                                ('%d producer threads' % producers, shares, False),
+                                ('1 producer thread, consumer', deal(stream, 1), True),
+                                ('%d producer threads, consumer' % producers, shares, True)):
+        seconds = min(threaded(feed, consume)[3] for _ in range(3))
+        print("%-40s %15.0f" % (name, payments / seconds))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
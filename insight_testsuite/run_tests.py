@@ -0,0 +1,268 @@
+"""
+    Parallel test runner: runs every case of insight_testsuite/tests at once in a pool of processes.
+
+    A case is a directory of tests/ with paymo_input/batch_payment.txt and paymo_input/stream_payment.txt. Every case
+    runs src/antifraud.py in its own temporary directory, reading its inputs in place, so nothing is copied and
+    nothing is left behind. Outputs are compared to paymo_output/output1-3.txt of the case line by line as they are
+    read, ignoring changes in amount of white space and blank lines as diff -bB does in run_tests.sh. A case without
+    paymo_output is a performance case: it is only timed. Run time of every case is reported, and optionally written
+    to a CSV file, so large cases can sit next to the fixtures and be tracked over time.
+
+    Cases of mode_tests/ check optional modes. Each has a runs.txt: every line holds options of antifraud.py for one
+    run, and runs follow one another in the same temporary directory, so a later run finds the graph store or state
+    directory an earlier one left (relative paths are inside it). Outputs of every run, output4.txt included, must
+    match paymo_output, which holds outputs of the plain run in that mode, or paymo_output/run-N for run N if a run
+    is in another mode.
+
+    Besides the cases, src/differential.py checks the optimised engines against the reference run on --seeds
+    generated inputs, once per set of shared options of DIFFERENTIAL_MODES.
+
+    Usage: python insight_testsuite/run_tests.py [-j JOBS] [-k PATTERN] [--timeout SECONDS] [--output4]
+                                                 [--seeds N] [--timings FILE] [--no-results] [-- ANTIFRAUD OPTIONS]
+"""
+
+import argparse
+import fnmatch
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import zip_longest
+
+GRADER_ROOT = os.path.dirname(os.path.abspath(__file__))
+ANTIFRAUD = os.path.join(GRADER_ROOT, '..', 'src', 'antifraud.py')
+DIFFERENTIAL = os.path.join(GRADER_ROOT, '..', 'src', 'differential.py')
+WHITE_SPACE = re.compile(r'[ \t]+')
+# shared options differential.py checks the engines under: every optional mode of the stream stage.
+DIFFERENTIAL_MODES = [[], ['--learn-stream'], ['--trust-horizon', '0.1'],
+                      ['--trust-horizon', '0.1', '--allowed-lateness', '1000'], ['--adaptive-limits'],
+                      ['--allowed-lateness', '5'], ['--detect-rings'], ['--velocity-limit', '500']]
+
+
+def discover(pattern=None):
+    """
+    This function finds cases of tests/ and then of mode_tests/, in natural order of their names (test-2 before
+    test-10).
+    :param pattern: shell pattern names of cases must match, None for every case.
+    """
+    found = []
+    for tests in (os.path.join(GRADER_ROOT, 'tests'), os.path.join(GRADER_ROOT, 'mode_tests')):
+        if not os.path.isdir(tests):
+            continue
+        cases = [name for name in os.listdir(tests)
+                 if os.path.isfile(os.path.join(tests, name, 'paymo_input', 'batch_payment.txt'))
+                 and os.path.isfile(os.path.join(tests, name, 'paymo_input', 'stream_payment.txt'))
+                 and (pattern is None or fnmatch.fnmatch(name, pattern))]
+        found += [os.path.join(tests, name)
+                  for name in sorted(cases, key=lambda name: [int(part) if part.isdigit() else part
+                                                              for part in re.split(r'(\d+)', name)])]
+    return found
+
+
+def runs(case):
+    """
+    This function reads options of every run of a case from its runs.txt.
+
+    :return:
+        list of option lists, one per run; a case without runs.txt runs once without options.
+    """
+    path = os.path.join(case, 'runs.txt')
+    if not os.path.isfile(path):
+        return [[]]
+    with open(path) as lines:
+        return [shlex.split(line) for line in lines if line.strip() and not line.startswith('#')]
+
+
+def normalised_lines(path):
+    """
+    This function reads lines of a file one at a time as diff -bB compares them: runs of white space are one space,
+    trailing white space is dropped and blank lines are skipped.
+
+    :return:
+        iterator of (line number, normalised line).
+    """
+    with open(path, 'r', errors='replace') as lines:
+        for number, line in enumerate(lines, 1):
+            line = WHITE_SPACE.sub(' ', line.rstrip())
+            if line:
+                yield number, line
+
+
+def compare(actual, expected):
+    """
+    This function compares an output to its expected file without loading either.
+
+    :return:
+        None if they match, else a description of first difference.
+    """
+    if not os.path.isfile(actual):
+        return "no output written"
+    for got, wanted in zip_longest(normalised_lines(actual), normalised_lines(expected)):
+        if got is None:
+            return "output ends before line %d of expected: %s" % wanted
+        if wanted is None:
+            return "line %d is past end of expected: %s" % got
+        if got[1] != wanted[1]:
+            return "line %d: %s\n        expected line %d: %s" % (got[0], got[1], wanted[0], wanted[1])
+    return None
+
+
+def run_case(case, outputs, options, timeout):
+    """
+    This function runs a case in a temporary directory of its own and compares its outputs; it runs in a process of
+    the pool.
+    :param case: directory of case.
+    :param outputs: names of outputs compared; output4.txt is always compared for a case with runs.txt.
+    :param options: further command line options of antifraud.py, added to options of every run of case.
+    :param timeout: seconds a case may run, None for no limit.
+
+    :return:
+        dictionary of name, seconds, error (None if antifraud.py succeeded) and results: list of (output, None or
+        difference) of compared outputs, output prefixed by its run if case has several.
+    """
+    name = os.path.basename(case)
+    workdir = tempfile.mkdtemp(prefix=name + '-')
+    try:
+        paths = [os.path.join(workdir, 'output%d.txt' % index) for index in range(1, 5)]
+        expected = os.path.join(case, 'paymo_output')
+        case_runs = runs(case)
+        if os.path.isfile(os.path.join(case, 'runs.txt')) and 'output4.txt' not in outputs:
+            outputs = list(outputs) + ['output4.txt']
+        error = None
+        results = []
+        started = time.perf_counter()
+        for run, run_options in enumerate(case_runs, 1):
+            command = [sys.executable, ANTIFRAUD, os.path.join(case, 'paymo_input', 'batch_payment.txt'),
+                       os.path.join(case, 'paymo_input', 'stream_payment.txt')] + paths + run_options + list(options)
+            try:
+                process = subprocess.run(command, cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         universal_newlines=True, errors='replace', timeout=timeout)
+                error = "exit status %d\n%s" % (process.returncode, process.stdout[-2000:]) if process.returncode \
+                    else None
+            except subprocess.TimeoutExpired:
+                error = "timed out after %gs" % timeout
+            prefix = '' if len(case_runs) == 1 else 'run %d %s: ' % (run, ' '.join(run_options))
+            run_expected = os.path.join(expected, 'run-%d' % run)
+            if not os.path.isdir(run_expected):
+                run_expected = expected
+            results += [(prefix + output, compare(os.path.join(workdir, output), os.path.join(run_expected, output)))
+                        for output in outputs if os.path.isfile(os.path.join(run_expected, output))]
+            if error is not None:
+                break
+        seconds = time.perf_counter() - started
+        return {'name': name, 'seconds': seconds, 'error': error, 'results': results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_differential(flags, seeds, timeout):
+    """
+    This function runs src/differential.py with shared options in a temporary directory, where a reproducer of a
+    mismatch would be written; it runs in a process of the pool.
+    :param flags: shared options of differential.py.
+    :param seeds: number of inputs generated.
+    :param timeout: seconds it may run, None for no limit.
+
+    :return:
+        dictionary as run_case returns, with one result: engines agreeing on every input or not.
+    """
+    name = ' '.join(['differential'] + flags)
+    workdir = tempfile.mkdtemp(prefix='differential-')
+    try:
+        started = time.perf_counter()
+        error = None
+        difference = None
+        try:
+            process = subprocess.run([sys.executable, DIFFERENTIAL, '--seeds', str(seeds)] + flags, cwd=workdir,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True,
+                                     errors='replace', timeout=timeout)
+            if process.returncode == 1:
+                difference = '\n        '.join(line for line in process.stdout.splitlines()
+                                                 if 'disagrees' in line or line.startswith('minimised'))
+            elif process.returncode:
+                error = "exit status %d\n%s" % (process.returncode, process.stdout[-2000:])
+        except subprocess.TimeoutExpired:
+            error = "timed out after %gs" % timeout
+        return {'name': name, 'seconds': time.perf_counter() - started, 'error': error,
+                'results': [('engines', difference)]}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run cases of insight_testsuite/tests in parallel.")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="cases run at once (default: number of CPUs)")
+    parser.add_argument('-k', '--cases', metavar='PATTERN', help="run only cases matching shell pattern")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS', help="fail a case running longer")
+    parser.add_argument('--output4', action='store_true', help="compare output4.txt too")
+    parser.add_argument('--seeds', type=int, default=2, metavar='N',
+                        help="inputs differential.py generates per mode, 0 to skip it (default: 2)")
+    parser.add_argument('--timings', metavar='FILE', help="write run time of every case to CSV file")
+    parser.add_argument('--no-results', action='store_true', help="do not append summary to results.txt")
+    parser.add_argument('options', nargs=argparse.REMAINDER,
+                        help="options of antifraud.py, after --")
+    args = parser.parse_args(argv)
+    options = args.options[1:] if args.options[:1] == ['--'] else args.options
+    outputs = ['output1.txt', 'output2.txt', 'output3.txt'] + (['output4.txt'] if args.output4 else [])
+
+    cases = discover(args.cases)
+    if not cases:
+        parser.error("no cases found")
+    colour = sys.stdout.isatty()
+
+    def tag(passed):
+        if not colour:
+            return 'PASS' if passed else 'FAIL'
+        return '\033[0;32mPASS\033[0m' if passed else '\033[0;31mFAIL\033[0m'
+
+    started = time.perf_counter()
+    reports = []
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_case, case, outputs, options, args.timeout) for case in cases]
+        if args.seeds > 0:
+            futures += [pool.submit(run_differential, flags, args.seeds, args.timeout) for flags in DIFFERENTIAL_MODES]
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            passed = report['error'] is None and all(difference is None for _, difference in report['results'])
+            print("[%s]: %s (%.2fs)%s" % (tag(passed), report['name'], report['seconds'],
+                                          '' if report['results'] else ' performance case'))
+            if report['error'] is not None:
+                print("    %s" % report['error'].rstrip().replace('\n', '\n    '))
+            for output, difference in report['results']:
+                if difference is not None:
+                    print("    %s: %s" % (output, difference))
+            sys.stdout.flush()
+
+    checks = sum(len(report['results']) for report in reports)
+    passes = sum(1 for report in reports if report['error'] is None
+                 for _, difference in report['results'] if difference is None)
+    failed = sum(1 for report in reports if report['error'] is not None)
+    elapsed = time.perf_counter() - started
+    print("%d of %d tests passed, %d of %d cases failed to run; %.2fs (%.2fs of cases on %d jobs)" % (
+        passes, checks, failed, len(reports), elapsed, sum(report['seconds'] for report in reports), args.jobs))
+
+    if args.timings:
+        order = {os.path.basename(case): index for index, case in enumerate(cases)}
+        order.update((' '.join(['differential'] + flags), len(cases) + index)
+                     for index, flags in enumerate(DIFFERENTIAL_MODES))
+        with open(args.timings, 'w') as timings:
+            timings.write("case,seconds,result\n")
+            for report in sorted(reports, key=lambda report: order[report['name']]):
+                result = 'error' if report['error'] is not None else 'timed' if not report['results'] else \
+                    'pass' if all(difference is None for _, difference in report['results']) else 'fail'
+                timings.write("%s,%.4f,%s\n" % (report['name'], report['seconds'], result))
+    if not args.no_results:
+        with open(os.path.join(GRADER_ROOT, 'results.txt'), 'a') as results:
+            results.write("[%s] %d of %d tests passed\n" % (time.strftime('%a %b %d %H:%M:%S %Z %Y'), passes, checks))
+    return 0 if passes == checks and not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
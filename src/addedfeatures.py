@@ -27,8 +27,18 @@
     ----------------------------------------------
     Check if a payment amount is exceeding limit of maximum amount.
 
+    FEATURE 4: Fraud rings (optional, heatrings.py)
+    -------------------------------------------------
+    Check if a payment closes a triangle of users paying each other within the 60 seconds window.
+
+    FEATURE 5: Amount velocity (optional, velocity.py)
+    ----------------------------------------------------
+    Check if amount sent by payer within the 60 seconds window is above a velocity limit.
+
 """
 
+import bisect
+
 
 class AdditionalFeatures:
     """
@@ -36,23 +46,37 @@ class AdditionalFeatures:
     Firstly, it builds a heat graph of payments during a 60 seconds window from incoming payments' stream.
     It will then chek for suspicious payment based on features created and write status report for any doubtful payment.
     """
-    def __init__(self, h_graph=None):
+    def __init__(self, h_graph=None, rings=None, velocity=None, window=60, expiry=172800, fan_out_limit=10,
+                 pair_limit=10):
         """
         initializes a objects of class.
         :param h_graph: dictionary of payments made between users and count of number of transaction between them.
         It represent graph of payments made in a sliding window of 60 seconds,
+        :param rings: RingDetector told about every edge appearing in or expiring from heat graph, None to skip.
+        :param velocity: AmountVelocity told about every payment entering or leaving window, None to skip.
+        :param window: seconds of sliding window of heat graph.
+        :param expiry: seconds after latest payment a payment expires.
+        :param fan_out_limit: a user paying more users than this within window is suspicious.
+        :param pair_limit: two users paying each other more times than this within window are suspicious.
         """
         if h_graph is None:
             h_graph = {}
         self.__h_graph = h_graph
+        self.rings = rings
+        self.velocity = velocity
+        self.window = window
+        self.expiry = expiry
+        self.fan_out_limit = fan_out_limit
+        self.pair_limit = pair_limit
 
-        self.payments_in_60sec = {}          # dictionary of payments in 60 seconds window with timestamp(ts) as key.
+        self.payments_in_60sec = {}          # dictionary of payments in 60 seconds window with timestamp(ts) as key,
+                                             # payments at a ts are stored as flat pairs: [user1, user2, user1, ...]
         self.timestamp_in_60sec = []         # list of timestamps in the 60 seconds sliding window.
         self.max_timestamp = -1              # timestamp of latest payments.
         self.active = None                   # payment is active initially
         self.suspected = False               # considering payment initially is not supicious
 
-    def update_heat_graph(self, ts, user1, user2):
+    def update_heat_graph(self, payment):
         """
         This function will update heat graph with new incoming payments. Heat graph will contain payment
         payments within last 60 seconds. Any payment before 60 seconds is purged.
@@ -60,17 +84,18 @@ class AdditionalFeatures:
         There are following conditions that need to be checked before the graph is updated:
             1. If incoming payment appears in order of timestamp.
             2. If incoming  payment is out of order of timestamp.
-        :param ts: ts of incoming payment
-        :param user1: user making payment
-        :param user2: user initiating payment
+        :param payment: incoming Payment record with ts, user making payment and user receiving payment.
 
         :return: Status of a payment as active or expired and updated heat graph.
         """
+        ts = payment.timestamp
+        user1 = payment.user1
+        user2 = payment.user2
+
         # Step 1: check incoming payments:
         # --------------------------------
         # check if it is ACTIVE: i.e. if payment made in last two days
-        # max timestamp - incoming timestamp < (2 * 86400) .
-        if self.max_timestamp - ts < 172800:
+        if self.check_if_active(ts):
             self.active = True
             
             # Check if payment arrives in order of timestamp-
@@ -85,22 +110,24 @@ class AdditionalFeatures:
                 # check if already in payments_in_60Sec.
                 if ts in self.payments_in_60sec:
                     # append incoming payments at given time
-                    self.payments_in_60sec[ts].append([user1, user2])
+                    self.payments_in_60sec[ts] += (user1, user2)
                 else:
                     # add the new payments at given time
-                    self.payments_in_60sec[ts] = [[user1, user2]]
+                    self.payments_in_60sec[ts] = [user1, user2]
 
                 # Step 2: Update the heat graph by adding new edge to h_graph
                 # -------------------------------------------------------------
-                self.add_graph_edge(
-                    users=[user1, user2]
-                )
+                self.add_graph_edge(user1, user2)
+                if self.velocity is not None:
+                    self.velocity.payment_added(ts, user1, payment.amount)
 
                 # Step 3: Delete edge from heat_graph for payments older than 60 seconds.
                 # -----------------------------------------------------------------------
-                while self.max_timestamp - self.timestamp_in_60sec[0] > 60:
+                while self.max_timestamp - self.timestamp_in_60sec[0] > self.window:
                     # remove edge from heat map
                     self.delete_edge_graph()
+                    if self.velocity is not None:
+                        self.velocity.expire(self.timestamp_in_60sec[0])
                     # remove elements from payments_in_60sec for the timestamp
                     self.payments_in_60sec.pop(self.timestamp_in_60sec[0])
                     # remove the timestamp from list of last 60 seconds
@@ -109,7 +136,7 @@ class AdditionalFeatures:
             # If payment does not arrive in order:
             else:
                 # Check if incoming payment is in last 60 Seconds
-                if self.max_timestamp - ts <= 60:
+                if self.max_timestamp - ts <= self.window:
                     
                     # find index to insert the new payment in the sliding window
                     index = bisect.bisect_left(self.timestamp_in_60sec, ts)
@@ -122,12 +149,14 @@ class AdditionalFeatures:
 
                     # Check if ts already in payments60Sec
                     if ts in self.payments_in_60sec:
-                        self.payments_in_60sec[ts].append([user1, user2])
+                        self.payments_in_60sec[ts] += (user1, user2)
                     else:
-                        self.payments_in_60sec[ts] = [[user1, user2]]
+                        self.payments_in_60sec[ts] = [user1, user2]
 
                     # Update the heat graph for new payment.
-                    self.add_graph_edge(users=[user1, user2])
+                    self.add_graph_edge(user1, user2)
+                    if self.velocity is not None:
+                        self.velocity.payment_added(ts, user1, payment.amount)
 
                 # Check if incoming payment is older than 60 Seconds
                 else:
@@ -138,30 +167,48 @@ class AdditionalFeatures:
                     
         return self.active
 
-    def add_graph_edge(self, users):
+    def check_if_active(self, ts, max_timestamp=None):
+        """
+        This function checks if a payment is ACTIVE, i.e. it was made in last two days before latest payment.
+        :param ts: ts of incoming payment
+        :param max_timestamp: timestamp of latest payment, defaults to latest payment added to heat graph.
+
+        :return: True if payment is active, False if it has expired.
+        """
+        if max_timestamp is None:
+            max_timestamp = self.max_timestamp
+        # max timestamp - incoming timestamp < (2 * 86400) .
+        return max_timestamp - ts < self.expiry
+
+    def add_graph_edge(self, user1, user2):
         """
         This function adds edges to the heat graph.
-        :param users: list of users (user1 and user2 ) that will form edge in the graph.
+        :param user1: user making payment, forms edge in the graph with user2.
+        :param user2: user receiving payment.
 
         :return:
             graph  - updated heat graph with new edges from new payments by users.
         """
-        # for both the users in users list
-        for user1 in users:
-            for user2 in users:
-                if user1 != user2:
-                    # if user1 exist for user2 in current graph
-                    if user1 in self.__h_graph:
-                        # check if user2 is connected to user1
-                        if user2 in self.__h_graph[user1]:
-                            # increase number of payments that connect user1 and user2
-                            self.__h_graph[user1][user2] += 1
-                        # if user2 does not exist for user1 in current graph
-                        else:
-                            self.__h_graph[user1][user2] = 1
-                    # if user1 does not exist in graph at all: Add user1 to graph
-                    else:
-                        self.__h_graph[user1] = {user2: 1}
+        if user1 == user2:
+            return
+        # edges are undirected: count payment for both source and target
+        for source, target in ((user1, user2), (user2, user1)):
+            # if source exist in current graph
+            if source in self.__h_graph:
+                # check if target is connected to source
+                if target in self.__h_graph[source]:
+                    # increase number of payments that connect source and target
+                    self.__h_graph[source][target] += 1
+                # if target does not exist for source in current graph
+                else:
+                    self.__h_graph[source][target] = 1
+            # if source does not exist in graph at all: Add source to graph
+            else:
+                self.__h_graph[source] = {target: 1}
+
+        # first payment between users in window: edge is new to heat graph
+        if self.rings is not None and self.__h_graph[user1][user2] == 1:
+            self.rings.edge_added(user1, user2, len(self.__h_graph[user1]), len(self.__h_graph[user2]))
 
     def delete_edge_graph(self):
         """
@@ -169,23 +216,29 @@ class AdditionalFeatures:
         :return:
             graph - updated heat graph with edges from payments that happened before 60 seconds window.
         """
-        for users in self.payments_in_60sec[self.timestamp_in_60sec[0]]:
-            # check if there are users for current timestamp to delete
-            for user1 in users:
-                for user2 in users:
-                    if user2 != user1:
-                        # reduce count of connecting edges between user1 and user2:
-                        self.__h_graph[user1][user2] -= 1
-                        # if user1 and user2 are no longer connected:
-                        if self.__h_graph[user1][user2] == 0:
-                            # remove user2 from connection of user1:
-                            self.__h_graph[user1].pop(user2)
-                            # if user1 is not connected to any other user:
-                            if self.__h_graph[user1] == {}:
-                                # remove user1 from heat graph:
-                                self.__h_graph.pop(user1)
-
-    def check_if_suspicious(self, users):
+        payments = self.payments_in_60sec[self.timestamp_in_60sec[0]]
+        # payments are stored as flat pairs of users for current timestamp to delete
+        for index in range(0, len(payments), 2):
+            user1 = payments[index]
+            user2 = payments[index + 1]
+            if user1 == user2:
+                continue
+            # last payment between users leaves window: edge expires from heat graph
+            if self.rings is not None and self.__h_graph[user1][user2] == 1:
+                self.rings.edge_removed(user1, user2)
+            for source, target in ((user1, user2), (user2, user1)):
+                # reduce count of connecting edges between source and target:
+                self.__h_graph[source][target] -= 1
+                # if source and target are no longer connected:
+                if self.__h_graph[source][target] == 0:
+                    # remove target from connection of source:
+                    self.__h_graph[source].pop(target)
+                    # if source is not connected to any other user:
+                    if self.__h_graph[source] == {}:
+                        # remove source from heat graph:
+                        self.__h_graph.pop(source)
+
+    def check_if_suspicious(self, payment):
         """
         This function checks if an incoming payment looks suspicious.
         A payment is SUSPICIOUS if:
@@ -194,21 +247,21 @@ class AdditionalFeatures:
             NOTE: I have set limit for suspicious transactions as >100 in 60 seconds; this can be increased or decreased
                 as per requirement in future.
 
-        :param users: list of two users[user1, user2] between who payment needs to be checked
+        :param payment: Payment record with two users between who payment needs to be checked
 
         :return:
                 suspected: boolean value indicating if a payment is suspicious or not.
         """
-        for user1 in users:
-            for user2 in users:
-                if user2 != user1:
-                    # if user 1 has any payment in last 60 seconds
-                    if user1 in self.__h_graph:
-                        # if user1 have many transactions in less than 60 seconds: e.g.10 with different user 
-                        if len(self.__h_graph[user1]) > 10:
-                            self.suspected = True
-                        # if user1 has large number of transactions with user2
-                        elif user2 in self.__h_graph[user1] and self.__h_graph[user1][user2] > 10:
-                            self.suspected = True
+        if payment.user1 == payment.user2:
+            return self.suspected
+        for user1, user2 in ((payment.user1, payment.user2), (payment.user2, payment.user1)):
+            # if user 1 has any payment in last 60 seconds
+            if user1 in self.__h_graph:
+                # if user1 have many transactions in less than 60 seconds: e.g.10 with different user 
+                if len(self.__h_graph[user1]) > self.fan_out_limit:
+                    self.suspected = True
+                # if user1 has large number of transactions with user2
+                elif user2 in self.__h_graph[user1] and self.__h_graph[user1][user2] > self.pair_limit:
+                    self.suspected = True
 
         return self.suspected
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    PER-USER PAYMENT LIMITS: built in the batch stage, used by additional feature 3.
+    --------------------------------------------------------------------------------
+    A single maximum over the whole batch file lets one outlier disable "exceeded maximum" check for everyone.
+    Instead, while batch file is read, an amount profile is kept for every paying user:
+
+        count, mean, variance (Welford's streaming update) and
+        a P-square quantile sketch (Jain & Chlamtac) that estimates a high quantile of amounts with 5 markers.
+
+    Profiles are stored in a single flat array of doubles indexed by interned user id, so a lookup is O(1) and a
+    profile costs a fixed 13 doubles. Users without enough history fall back to a global profile of all payments.
+"""
+
+from array import array
+import math
+
+# layout of a profile inside the flat array
+COUNT, MEAN, M2, HEIGHTS, POSITIONS = 0, 1, 2, 3, 8
+STRIDE = 13
+
+
+class AmountProfiles:
+    """
+    AmountProfiles keeps streaming amount statistics for every paying user and for all payments together.
+    Limit for a user is the larger of the estimated quantile and mean + sigmas * standard deviation of amounts.
+    """
+    def __init__(self, quantile=0.99, sigmas=3.0, min_history=5):
+        """
+        initializes objects of class.
+        :param quantile: quantile of a user's amounts that is still considered a normal payment.
+        :param sigmas: number of standard deviations above mean that is still considered a normal payment.
+        :param min_history: payments a user needs in batch file before his own profile is used.
+        """
+        self.quantile = quantile
+        self.sigmas = sigmas
+        self.min_history = min_history
+        # marker increments of P-square sketch for minimum, p/2, p, (1+p)/2 and maximum.
+        self.increments = (0.0, quantile / 2, quantile, (1 + quantile) / 2, 1.0)
+        self.profiles = array('d')                  # profiles of users, STRIDE doubles per interned user id.
+        self.global_profile = array('d', bytes(8 * STRIDE))
+
+    def __len__(self):
+        return len(self.profiles) // STRIDE
+
+    def update(self, user, amount):
+        """
+        This function adds a payment made by user to his profile and to the global profile.
+        :param user: interned id of user making payment.
+        :param amount: amount of payment.
+        """
+        if user >= len(self):
+            # grow array up to new user, interned ids are dense so there is little unused space.
+            self.profiles.extend(array('d', bytes(8 * STRIDE * (user + 1 - len(self)))))
+        self.add(self.profiles, user * STRIDE, amount)
+        self.add(self.global_profile, 0, amount)
+
+    def relabel(self, order):
+        """
+        This function moves profiles to new ids of their users.
+        :param order: old interned ids in their new order.
+        """
+        profiles = array('d')
+        empty = array('d', bytes(8 * STRIDE))
+        for user in order:
+            profiles.extend(self.profiles[user * STRIDE: (user + 1) * STRIDE] if user < len(self) else empty)
+        self.profiles = profiles
+
+    def add(self, values, base, amount):
+        """
+        This function updates a single profile stored at values[base: base + STRIDE] with a new amount.
+        """
+        count = values[base + COUNT] + 1
+        values[base + COUNT] = count
+
+        # Welford's update of mean and sum of squared differences
+        delta = amount - values[base + MEAN]
+        values[base + MEAN] += delta / count
+        values[base + M2] += delta * (amount - values[base + MEAN])
+
+        heights = base + HEIGHTS
+        positions = base + POSITIONS
+        if count <= 5:
+            # first five amounts are kept sorted as initial marker heights
+            index = int(count) - 1
+            while index > 0 and values[heights + index - 1] > amount:
+                values[heights + index] = values[heights + index - 1]
+                index -= 1
+            values[heights + index] = amount
+            values[positions + int(count) - 1] = count
+            return
+
+        # find cell of the new amount and extend extreme markers if needed
+        if amount < values[heights]:
+            values[heights] = amount
+            cell = 0
+        elif amount >= values[heights + 4]:
+            values[heights + 4] = amount
+            cell = 3
+        else:
+            cell = 0
+            while amount >= values[heights + cell + 1]:
+                cell += 1
+        for marker in range(cell + 1, 5):
+            values[positions + marker] += 1
+
+        # move middle markers towards their desired positions
+        for marker in (1, 2, 3):
+            desired = 1 + (count - 1) * self.increments[marker]
+            position = values[positions + marker]
+            shift = desired - position
+            after = values[positions + marker + 1] - position
+            before = values[positions + marker - 1] - position
+            if (shift >= 1 and after > 1) or (shift <= -1 and before < -1):
+                step = 1.0 if shift > 0 else -1.0
+                height = values[heights + marker]
+                upper = values[heights + marker + 1]
+                lower = values[heights + marker - 1]
+                # piecewise parabolic prediction of new marker height
+                estimate = height + step / (after - before) * (
+                    (step - before) * (upper - height) / after + (after - step) * (height - lower) / -before)
+                if not lower < estimate < upper:
+                    # fall back to linear prediction
+                    neighbour = marker + int(step)
+                    estimate = height + step * (values[heights + neighbour] - height) / \
+                        (values[positions + neighbour] - position)
+                values[heights + marker] = estimate
+                values[positions + marker] = position + step
+
+    def limit(self, user):
+        """
+        This function returns maximum amount user can pay before payment is considered exceeding his limit.
+        :param user: interned id of user making payment.
+
+        :return:
+            limit: payment limit from user's own profile or from global profile when user has too little history.
+        """
+        if user < len(self) and self.profiles[user * STRIDE + COUNT] >= self.min_history:
+            return self.profile_limit(self.profiles, user * STRIDE)
+        return self.profile_limit(self.global_profile, 0)
+
+    def profile_limit(self, values, base):
+        """
+        This function computes limit of a single profile stored at values[base: base + STRIDE].
+        """
+        count = values[base + COUNT]
+        if count == 0:
+            return float('inf')
+        if count <= 5:
+            # markers are still the sorted amounts themselves, not yet the sketch: use nearest rank of them
+            estimate = values[base + HEIGHTS + int(round(self.quantile * (count - 1)))]
+        else:
+            estimate = values[base + HEIGHTS + 2]
+        deviation = math.sqrt(values[base + M2] / (count - 1)) if count > 1 else 0.0
+        return max(estimate, values[base + MEAN] + self.sigmas * deviation)
@@ -40,9 +40,20 @@
 
 import sys
 import csv
-from collections import deque
 import time
 from addedfeatures import AdditionalFeatures
+from payment import Payment, UserTable
+from paygraph import PaymentGraph
+from features import CORE_DEPTH, CORE_FEATURES, Feature, FeatureEngine, trust_score
+from payfile import PaymentColumns, is_payment_file
+
+# Verdicts of additional features, reported in output4.
+VERDICTS = ('trusted', 'unverified', 'expired', 'exceeded', 'ring', 'velocity', 'suspicious', 'budget')
+TRUSTED, UNVERIFIED, EXPIRED, EXCEEDED, RING, VELOCITY, SUSPICIOUS, BUDGET = range(len(VERDICTS))
+
+# Modules needed only by optional modes (amountprofile, watermark, edgelog, heatrings, graphstore, columnar,
+# sharding, profiling, searchbudget, spillgraph) and argparse are imported where they are used, so a plain run does
+# not pay for them at startup.
 
 class AntiFraud:
     """
@@ -51,95 +62,357 @@ class AntiFraud:
     Secondly, it reads the payments from stream_payment.txt file and classify a payment as verified or unverified
     user feature1, feature2 or feature3 as required by the challenge.
     """
-    def __init__(self,pay_graph=None):
+    def __init__(self,pay_graph=None, adaptive_limits=False, trust_horizon=None, allowed_lateness=None,
+                 state_dir=None, learn_stream=False, checkpoint_records=1000000, columnar=False,
+                 detect_rings=False, ring_degree_cap=50, graph_store=None, cache_partitions=1024,
+                 features=(), snapshot=None, overlap_io=False,
+                 paths=None, velocity_limit=None, reorder=None, trust_scores=None,
+                 hub_degree=None, search_budget=None, search_budget_us=None, recheck=None,
+                 max_resident_users=None, memory_limit=None, spill_dir=None):
         """
         initializes objects of class.
-        :param pay_graph: dictionary of payments made between users; this represents the payment graph
+        :param pay_graph: PaymentGraph of payments made between users; this represents the payment graph
+        :param adaptive_limits: if True, payment limit is taken from payer's amount profile built in batch stage
+                                instead of maximum amount in batch file.
+        :param trust_horizon: seconds a payment between two users keeps them connected, None to trust forever.
+        :param allowed_lateness: if set, payments are buffered and applied to heat graph in order of time once
+                                 this many seconds have passed; None to apply them in order of arrival.
+        :param state_dir: directory of write-ahead edge log and graph snapshot, None to keep state in memory only.
+        :param learn_stream: if True, every classified stream payment adds its edge to payment graph.
+        :param checkpoint_records: log records after which log is folded into a new snapshot.
+        :param columnar: if True, batch stage parses batch file into NumPy columns and builds payment graph from
+                         them with array operations (requires numpy).
+        :param detect_rings: if True, payments closing a triangle of users in heat graph are reported in output4.
+        :param ring_degree_cap: edges between two users with more connections than this in heat graph are not
+                                checked for rings.
+        :param graph_store: directory of partitioned graph store; payment graph is read from it on demand instead of
+                            being built in memory by batch stage. None to build graph in memory.
+        :param cache_partitions: partitions of graph store kept in memory.
+        :param features: additional outputs of core features, list of (name, max degree, output file).
+        :param snapshot: file holding state built by batch stage; loaded instead of running batch stage if it was
+                         built from the same batch file, written after batch stage otherwise.
+        :param overlap_io: if True, stream stage reads stream file and writes outputs in background threads.
+        :param paths: file shortest chain of users connecting the two users of every stream payment is written to,
+                      None to search degree of connection only.
+        :param trust_scores: file common neighbours of the two users of every stream payment and its trust score are
+                             written to, None to skip trust scores.
+        :param velocity_limit: amount a user may send within 60 seconds window before its payments are reported in
+                               output4, None to skip amount velocity check.
+        :param reorder: 'degree', 'bfs' or 'rcm' to relabel users after batch stage for locality of searches, None to
+                        keep ids in order of first appearance.
+        :param hub_degree: users with at least this many connections after batch stage are hubs: searches do not
+                           expand them and meet at them through precomputed hub distances. None to search plainly.
+        :param search_budget: users a degree search may visit before payment is reported unverified because search
+                              budget was exhausted, None for no limit.
+        :param search_budget_us: microseconds a degree search may run, same as search_budget; None for no limit.
+        :param recheck: file degrees of payments that exhausted search budget are written to, searched again without
+                        budget in a background process; None not to re-check them.
+        :param max_resident_users: users of payment graph kept in memory at most, least recently active users are
+                                   spilled to disk beyond it; None for no limit.
+        :param memory_limit: estimated megabytes of payment graph kept in memory at most, same as
+                             max_resident_users; None for no limit.
+        :param spill_dir: directory of spill file of payment graph, None for temporary directory of system.
         """
+        if graph_store is not None and (adaptive_limits or state_dir is not None or columnar or snapshot is not None
+                                        or reorder is not None):
+            raise ValueError("graph store can not be combined with adaptive limits, state directory, columnar, "
+                             "snapshot or reordering")
+        if hub_degree is not None and (trust_horizon is not None or learn_stream or paths is not None or
+                                       graph_store is not None):
+            raise ValueError("hub search can not be combined with trust horizon, learned stream, paths or graph store")
+        budgeted = search_budget is not None or search_budget_us is not None
+        if budgeted and (hub_degree is not None or paths is not None or allowed_lateness is not None):
+            raise ValueError("search budget can not be combined with hub search, paths or allowed lateness")
+        if recheck is not None and (not budgeted or learn_stream or graph_store is not None):
+            raise ValueError("re-check needs a search budget and can not be combined with learned stream or graph "
+                             "store")
+        self.spilling = max_resident_users is not None or memory_limit is not None
+        if self.spilling and (columnar or graph_store is not None or state_dir is not None or snapshot is not None or
+                              reorder is not None or hub_degree is not None or recheck is not None):
+            raise ValueError("memory governor can not be combined with columnar, graph store, state directory, "
+                             "snapshot, reordering, hub search or re-check")
+        if pay_graph is None and self.spilling:
+            from spillgraph import SpillingGraph
+            pay_graph = SpillingGraph(max_resident_users, None if memory_limit is None else int(memory_limit * 1e6),
+                                      spill_dir, horizon=trust_horizon)
         if pay_graph is None:
-            pay_graph = {}
+            pay_graph = PaymentGraph(horizon=trust_horizon)
         self.__pay_graph = pay_graph
         self.max_allowed_payment = 0
         self.status = None
         self.report = None
-        self.timestamp = None
-        self.user1 = None
-        self.user2 = None
-        self.amount = 0.0
-        
+        self.payment = None         # payment currently being processed.
+        self.ring = 0               # triangles closed by payment currently being processed.
+        self.users = UserTable()    # interned user ids shared by payment graph and heat graph.
+
+        # per-user amount profiles, only built if payment limits are adaptive.
+        self.amount_profiles = None
+        if adaptive_limits:
+            from amountprofile import AmountProfiles
+            self.amount_profiles = AmountProfiles()
+
+        # call AddedFeatures class, with triangle counts of heat graph if rings are detected.
+        self.rings = None
+        if detect_rings:
+            from heatrings import RingDetector
+            self.rings = RingDetector(ring_degree_cap)
+        # amount sent per user within window, if velocity is checked.
+        self.velocity = None
+        if velocity_limit is not None:
+            from velocity import AmountVelocity
+            self.velocity = AmountVelocity(velocity_limit)
+        self.added_features = AdditionalFeatures(rings=self.rings, velocity=self.velocity)
+
+        # watermark window feeding heat graph, and output4 reports waiting for earlier payments to be released.
+        self.window = None
+        if allowed_lateness is not None:
+            from watermark import WatermarkWindow
+            self.window = WatermarkWindow(allowed_lateness)
+        # stream compaction keeps every edge a payment within allowed lateness of latest payment may still trust.
+        self.compaction_margin = allowed_lateness or 0
+        self.reports = {}
+        self.next_report = 0
 
-        # call AddedFeatures class.
-        self.added_features = AdditionalFeatures()
+        # write-ahead log of payment graph changes, users already written to log.
+        self.edge_log = None
+        if state_dir is not None:
+            from edgelog import EdgeLog
+            self.edge_log = EdgeLog(state_dir)
+        self.logged_users = 0
+        self.learn_stream = learn_stream
+        self.columnar = columnar
+        self.checkpoint_records = checkpoint_records
+        self.graph_store = graph_store
+        self.cache_partitions = cache_partitions
+        self.snapshot = snapshot
+        # options shaping state saved in snapshot: a snapshot saved with others is rebuilt, not loaded.
+        self.snapshot_options = {'adaptive_limits': bool(adaptive_limits),
+                                 'compaction': (pay_graph.horizon, pay_graph.compaction_interval),
+                                 'reorder': reorder, 'columnar': bool(columnar)}
+        self.overlap_io = overlap_io
+        self.paths = paths
+        self.reorder = reorder
+        self.hub_degree = hub_degree
+        self.hub_search = None      # hubs.HubSearch of payment graph, if hubs are searched apart.
+        self.path = None            # users connecting payment, if paths are written.
+        self.trust_scores = trust_scores
+        self.common = 0             # common neighbours of users of payment, if trust scores are written.
 
-    def update_payment_network(self, users):
+        # degree searches within a budget of visits or time, payments exhausting it re-checked into recheck file.
+        self.search_budget = None
+        if budgeted:
+            from searchbudget import SearchBudget
+            self.search_budget = SearchBudget(search_budget, search_budget_us)
+        self.recheck = recheck
+
+        # outputs of core features and depth of the one search per payment that serves all of them.
+        self.features = list(features)
+        self.search_depth = max([max_degree for _, max_degree in CORE_FEATURES] +
+                                [max_degree for _, max_degree, _ in self.features])
+
+        # profiling.Profiler of this run, None if run is not profiled.
+        self.profiler = None
+
+    def update_payment_network(self, user1, user2, ts):
         """
         Update payment graph by adding new edge between users 1 and User 2.
         Input:
         :param user1: user making the payment
         :param user2: user receiving the payment
+        :param ts: timestamp of payment, kept as time the edge was last seen.
 
         :return:
             paymentGraph: updated graph with new edges added for new payment.
         """
-        for user1 in users:
-            for user2 in users:
-                if user1 != user2:
-                    # Check if Users1 had any transaction in past :
-                    if user1 in self.__pay_graph:
-                        # Check if user1 had transaction with user2:
-                        if user2 not in self.__pay_graph[user1]:
-                            # If NOT: Add user2 to connections of user 1.
-                            self.__pay_graph[user1].append(user2)
-                    else:
-                        # If NOT add user1 to payment_graph
-                        self.__pay_graph[user1] = [user2]
+        new = self.__pay_graph.add_edge(user1, user2, ts)
+        # without horizon only new edges change graph, with it every payment refreshes time edge was last seen.
+        if self.edge_log is not None and (new or self.__pay_graph.horizon is not None):
+            self.log_users()
+            self.edge_log.append_edge(user1, user2, ts)
 
-    def search_trusted_users(self, root_user):
+    def log_users(self):
         """
-        This function generate a list of all users that are connected to root till degree 4.
-        This is depth limited(4), queue-based implementation of Breadth First Search.
+        This function writes users interned since last call to edge log, so that log records can refer to them.
+        """
+        while self.logged_users < len(self.users):
+            self.edge_log.append_user(self.logged_users, self.users.name(self.logged_users))
+            self.logged_users += 1
+
+    def state(self):
+        """
+        This function returns complete state built from payments: user table, payment graph and payment limits.
+        """
+        return {
+            'names': self.users.names,
+            'graph': self.__pay_graph,
+            'max_allowed_payment': self.max_allowed_payment,
+            'profiles': None if self.amount_profiles is None else
+            (self.amount_profiles.profiles, self.amount_profiles.global_profile),
+        }
 
-        :param root_user: user for whom trusted users needed to be found.
+    def restore(self, state):
+        """
+        This function replaces state of class with state returned by state(), e.g. loaded from a snapshot.
+        """
+        self.users.names = state['names']
+        self.users.ids = dict((name, uid) for uid, name in enumerate(state['names']))
+        # graph keeps horizon this class was configured with
+        graph = state['graph']
+        graph.horizon, graph.compaction_interval = self.__pay_graph.horizon, self.__pay_graph.compaction_interval
+        self.__pay_graph = graph
+        self.max_allowed_payment = state['max_allowed_payment']
+        if self.amount_profiles is not None and state['profiles'] is not None:
+            self.amount_profiles.profiles, self.amount_profiles.global_profile = state['profiles']
+        self.logged_users = len(self.users)
+
+    def recover(self):
+        """
+        This function rebuilds state from latest snapshot and the log written after it. A log the snapshot already
+        holds (crash in the middle of a checkpoint) is not replayed.
 
         :return:
-            connection: a dictionary of users connected to root user at different degree.
-            rootUser is at level 0 as it is origination of the search.
+            True if a completed batch stage was recovered, False if batch stage has to be run.
         """
-        connection = {root_user: 0}  # connection to root users
-        queue = deque()
-        queue.append(root_user)
+        if self.edge_log is None:
+            return False
+        state = self.edge_log.load_snapshot()
+        batch_done = state is not None
+        if state is not None:
+            self.restore(state)
+        for kind, fields in self.edge_log.replay():
+            if kind == b'E':
+                self.__pay_graph.add_edge(*fields)
+            elif kind == b'U':
+                self.users.intern(fields[1])
+            elif kind == b'M':
+                self.max_allowed_payment = max(self.max_allowed_payment, fields[0])
+            elif kind == b'A' and self.amount_profiles is not None:
+                self.amount_profiles.update(*fields)
+            elif kind == b'B':
+                batch_done = True
+        self.logged_users = len(self.users)
+        if not batch_done:
+            # batch stage never completed: start again from an empty state
+            self.edge_log.clear()
+            self.users.names, self.users.ids = [], {}
+            self.__pay_graph.adjacency = {}
+            self.max_allowed_payment = 0
+            if self.amount_profiles is not None:
+                from amountprofile import AmountProfiles
+                self.amount_profiles = AmountProfiles()
+            self.logged_users = 0
+        return batch_done
 
-        while queue:
-            node = queue.popleft()
-            # restrict depth of search
-            if connection.get(node, 5) < 4:
-                for user in self.__pay_graph.get(node, []):
-                    # check if node has been traversed
-                    if user not in connection:
-                        connection[user] = connection[node] + 1
-                        queue.append(user)
+    def checkpoint(self):
+        """
+        This function folds edge log into a new snapshot of current state.
+        """
+        if self.edge_log is not None:
+            self.log_users()
+            self.edge_log.checkpoint(self.state())
 
-        return connection
+    def close(self):
+        """
+        This function commits edge log and closes it.
+        """
+        if self.edge_log is not None:
+            self.edge_log.close()
+        if self.spilling:
+            self.__pay_graph.close()
+        if self.graph_store is not None:
+            import graphstore
+            if isinstance(self.__pay_graph, graphstore.LazyGraph):
+                self.__pay_graph.close()
 
-    def check_payment_status(self):
+    def reorder_users(self):
         """
-        This function checks if incoming payment between two users is: TRUSTED or UNVERIFIED
-        :param user1: user making the payment
-        :param user2: user receiving the payment
+        This function relabels users built by batch stage in the configured ordering: payment graph, user table and
+        amount profiles are renamed together, state directory gets a snapshot of the relabelled state.
+        """
+        if self.reorder is None:
+            return
+        # imported here: only reordered runs need it.
+        import reorder
+        order = reorder.ordering(self.__pay_graph, len(self.users), self.reorder)
+        new_ids = reorder.inverse(order)
+        self.__pay_graph.relabel(order, new_ids)
+        self.users.relabel(order)
+        if self.amount_profiles is not None:
+            self.amount_profiles.relabel(order)
+        # log refers to old ids: fold it into a snapshot of relabelled state
+        self.checkpoint()
+
+    def index_hubs(self):
+        """
+        This function builds hub index of payment graph as batch stage left it, if hubs are searched apart.
+        """
+        if self.hub_degree is None:
+            return
+        # imported here: only runs with hub search need it.
+        from hubs import HubSearch
+        self.hub_search = HubSearch(self.__pay_graph, len(self.users), self.hub_degree, self.search_depth)
+        sys.stderr.write("hub search: %d users with at least %d connections are hubs\n" %
+                         (len(self.hub_search.hubs), self.hub_degree))
+
+    def load_snapshot(self, batchfile):
+        """
+        This function restores state from snapshot file, if it was built from batch file as it is now and by a run
+        with the same options shaping state (adaptive limits, compaction, reordering, columnar graph).
 
         :return:
-            Status: status of payment if TRUSTED or UNVERIFIED
+            True if state was loaded and batch stage does not have to run.
+        """
+        if self.snapshot is None:
+            return False
+        from edgelog import read_snapshot
+        from filesource import source_of
+        state = read_snapshot(self.snapshot)
+        if state is None or state.get('source') != source_of(batchfile) or \
+                state.get('options') != self.snapshot_options:
+            return False
+        self.restore(state)
+        # state directory, if any, starts from the loaded state
+        self.checkpoint()
+        return True
+
+    def save_snapshot(self, batchfile):
+        """
+        This function writes state built by batch stage to snapshot file, if one is configured.
+        """
+        if self.snapshot is not None:
+            from edgelog import write_snapshot
+            from filesource import source_of
+            state = self.state()
+            state['source'] = source_of(batchfile)
+            state['options'] = self.snapshot_options
+            write_snapshot(self.snapshot, state)
+
+    def check_payment_status(self):
         """
-        # Find list of trusted users from payment graph for user1.
-        users_trusted = self.search_trusted_users(self.user1)
+        This function finds degree of connection between users of incoming payment, searching payment graph once
+        to the largest degree any feature needs.
 
-        # check if user2 appears in Trusted users
-        if self.user2 in users_trusted:
-            # payment is trusted
-            self.status = users_trusted[self.user2]
+        :return:
+            Status: degree of connection, None if users are not connected within search depth (UNVERIFIED).
+        """
+        if self.hub_search is not None:
+            self.status = self.hub_search.degree(self.payment.user1, self.payment.user2, None, self.search_depth)
+        elif self.search_budget is not None:
+            self.status = self.search_budget.degree(self.__pay_graph, self.payment.user1, self.payment.user2,
+                                                    self.__pay_graph.live_since(self.payment.timestamp),
+                                                    self.search_depth)
+        elif self.paths is None:
+            self.status = self.__pay_graph.degree(self.payment.user1, self.payment.user2,
+                                                  self.__pay_graph.live_since(self.payment.timestamp),
+                                                  self.search_depth)
         else:
-            # payment is unverified
-            self.status = 5
+            self.path = self.__pay_graph.shortest_path(self.payment.user1, self.payment.user2,
+                                                       self.__pay_graph.live_since(self.payment.timestamp),
+                                                       self.search_depth)
+            self.status = None if self.path is None else len(self.path) - 1
+        if self.trust_scores is not None:
+            self.common = self.__pay_graph.common_neighbours(self.payment.user1, self.payment.user2,
+                                                             self.__pay_graph.live_since(self.payment.timestamp))
 
     def parse_row(self, row):
         """
@@ -147,17 +420,55 @@ class AntiFraud:
         :param row: record read from input file .
 
         :return:
-            timestamp - Timestamp of transaction    <type : time>
-            user1 - user making the payment         <type : str>
-            user2 - user receiving payments         <type : str>
-            amount - amount of payment to be made   <type : Float>
+            payment - Payment record with fields:
+                timestamp - Timestamp of transaction    <type : int>
+                user1 - user making the payment         <type : int, interned>
+                user2 - user receiving payments         <type : int, interned>
+                amount - amount of payment to be made   <type : Float>
+        """
+        timestamp, user1, user2, amount = self.parse_fields(row)
+        self.payment = Payment(timestamp, self.users.intern(user1), self.users.intern(user2), amount)
+
+    def take_parsed(self, parsed):
+        """
+        This function takes a row of stream file whose fields reader thread of overlapped I/O parsed already, and
+        interns its users.
+        :param parsed: overlapio.ParsedRow.
+        """
+        if parsed.error is not None:
+            raise parsed.error
+        timestamp, user1, user2, amount = parsed.fields
+        self.payment = Payment(timestamp, self.users.intern(user1), self.users.intern(user2), amount)
+
+    def take_payment(self, payment):
+        """
+        This function takes a payment of a binary payment file, users interned already.
+        :param payment: Payment record.
+        """
+        self.payment = payment
+
+    def payment_line(self):
+        """
+        This function returns current payment as a line of payment file, without message.
+        """
+        payment = self.payment
+        return "%s, %s, %s, %s" % (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(payment.timestamp)),
+                                   self.users.name(payment.user1), self.users.name(payment.user2), payment.amount)
+
+    @staticmethod
+    def parse_fields(row):
+        """
+        This function extracts fields of a row without interning users.
+        :param row: record read from input file .
+
+        :return:
+            (timestamp, user1 id, user2 id, amount)
         """
         # Extract fields from row:
-        self.timestamp = int(time.mktime(time.strptime((row[0].strip()[0:10] + " " + row[0].strip()[12:]),
+        timestamp = int(time.mktime(time.strptime((row[0].strip()[0:10] + " " + row[0].strip()[12:]),
                                                   '%Y-%m-%d %H:%M:%S')))
-        self.user1 = row[1].strip()
-        self.user2 = row[2].strip()
-        self.amount = float(row[3].strip())
+        amount = float(row[3].strip())
+        return timestamp, row[1].strip(), row[2].strip(), amount
 
     # -----------------------------------------------
     # STAGE 1: Batch Processing
@@ -169,24 +480,120 @@ class AntiFraud:
 
         :return: max_allowed_payment
         """
-        with open(batchfile, 'r') as batch:
-            field_batch = batch.readline()  # Column names in Batch File.
-            batch_reader = csv.reader(batch)
+        if self.columnar:
+            self.columnar_batch_processing(batchfile)
+            return
+        if self.graph_store is not None:
+            self.graph_store_processing(batchfile)
+            return
 
-            for row in batch_reader:
-                try:
-                    # Parse row read from batch file
-                    self.parse_row(row)
+        if is_payment_file(batchfile):
+            # binary payment file: rows are parsed already
+            with PaymentColumns(batchfile) as columns:
+                for payment in columns.payments(self.users):
+                    self.payment = payment
+                    self.add_batch_payment()
+        else:
+            with open(batchfile, 'r') as batch:
+                field_batch = batch.readline()  # Column names in Batch File.
+                batch_reader = csv.reader(batch)
+
+                for row in batch_reader:
+                    try:
+                        # Parse row read from batch file
+                        self.parse_row(row)
+                        self.add_batch_payment()
+
+                    except (IndexError, ValueError):
+                        pass
+
+        if self.edge_log is not None:
+            # batch stage is complete: fold it into a snapshot so restart does not read batch file again
+            self.edge_log.append_batch_done()
+            self.checkpoint()
+
+    def add_batch_payment(self):
+        """
+        This function adds payment read from batch file to payment graph, maximum amount and amount profiles.
+        """
+        # Add new edge for users making transaction in payment graph
+        self.update_payment_network(self.payment.user1, self.payment.user2, self.payment.timestamp)
+
+        # Find maximum amount of trusted payment in batch file
+        if self.payment.amount > self.max_allowed_payment:
+            self.max_allowed_payment = self.payment.amount
+            if self.edge_log is not None:
+                self.edge_log.append_maximum(self.payment.amount)
+
+        # Drop payment graph edges that went stale
+        self.__pay_graph.maybe_compact(self.payment.timestamp)
+
+        # Add payment to amount profile of paying user
+        if self.amount_profiles is not None:
+            self.amount_profiles.update(self.payment.user1, self.payment.amount)
+            if self.edge_log is not None:
+                self.edge_log.append_amount(self.payment.user1, self.payment.amount)
+
+    def columnar_batch_processing(self, batchfile):
+        """
+        This function handles Stage 1 with array operations: batch file is parsed into NumPy columns, edges are
+        deduplicated by sorting and payment graph is built as CSR arrays.
+        :param batchfile: a file containing records of payments between different users in past.
+        """
+        # imported here: numpy is only needed by this mode.
+        import columnar
+
+        timestamps, user1, user2, amounts = columnar.read_payment_columns(batchfile, self)
+        if len(amounts):
+            self.max_allowed_payment = max(self.max_allowed_payment, float(amounts.max()))
+        horizon, interval = self.__pay_graph.horizon, self.__pay_graph.compaction_interval
+        edges, latest = (timestamps, user1, user2), None
+        if horizon is not None and len(timestamps):
+            # keep edges as of latest compaction the row by row batch stage makes
+            keep, latest = columnar.compacted_rows(timestamps, horizon, interval)
+            edges = (timestamps[keep], user1[keep], user2[keep])
+        self.__pay_graph = columnar.build_graph(*edges, users=len(self.users), horizon=horizon,
+                                                compaction_interval=interval)
+        self.__pay_graph.last_compaction = latest
+        if self.amount_profiles is not None:
+            columnar.load_amount_profiles(self.amount_profiles, user1, amounts)
 
-                    # Add new edge for users making transaction in payment graph
-                    self.update_payment_network(
-                        users=[self.user1,self.user2]
-                    )
+        if self.edge_log is not None:
+            # graph is built in one step: snapshot holds all of it, log only marks batch stage as complete
+            self.edge_log.append_batch_done()
+            self.checkpoint()
 
-                    # Find maximum amount of trusted payment in batch file
-                    if self.amount > self.max_allowed_payment:
-                        self.max_allowed_payment = self.amount
+    def graph_store_processing(self, batchfile):
+        """
+        This function handles Stage 1 with a partitioned graph store: store is built from batch file only if it does
+        not hold this batch file already, then payment graph reads its partitions on demand.
+        :param batchfile: a file containing records of payments between different users in past.
+        """
+        import graphstore
+        horizon, interval = self.__pay_graph.horizon, self.__pay_graph.compaction_interval
+        meta = graphstore.open_meta(self.graph_store, batchfile, horizon, interval)
+        if meta is None:
+            meta = graphstore.build_store(self.graph_store, batchfile, self.read_batch_fields(batchfile),
+                                          horizon=horizon, compaction_interval=interval)
+        self.max_allowed_payment = meta['max_allowed_payment']
+        self.__pay_graph = graphstore.LazyGraph(self.graph_store, self.users, meta, self.cache_partitions,
+                                                horizon=self.__pay_graph.horizon,
+                                                compaction_interval=self.__pay_graph.compaction_interval)
 
+    def read_batch_fields(self, batchfile):
+        """
+        This function yields fields of every valid row of batch file, see parse_fields.
+        """
+        if is_payment_file(batchfile):
+            with PaymentColumns(batchfile) as columns:
+                for fields in columns.fields():
+                    yield fields
+            return
+        with open(batchfile, 'r') as batch:
+            batch.readline()  # Column names in Batch File.
+            for row in csv.reader(batch):
+                try:
+                    yield self.parse_fields(row)
                 except (IndexError, ValueError):
                     pass
 
@@ -201,66 +608,180 @@ class AntiFraud:
 
         Output: Generate output files with status of payment.
         """
-        stream = open(streamfile, 'r')
-        outputF1 = open(output1, 'w')
-        outputF2 = open(output2, 'w')
-        outputF3 = open(output3, 'w')
-        outputF4 = open(output4, 'w')
-        
+        buffering = -1
+        if self.overlap_io:
+            # imported here: only overlapped runs need threads.
+            from overlapio import BUFFER_BYTES, OverlappedIO
+            buffering = BUFFER_BYTES
+        rechecker = None
+        if self.recheck is not None:
+            # imported here: only re-checked runs start a process, before any file or thread of stream stage exists.
+            from searchbudget import Rechecker
+            rechecker = Rechecker(self.__pay_graph, self.search_depth)
+        columns = None
+        if is_payment_file(streamfile):
+            # binary payment file: rows are Payment records parsed already
+            stream = columns = PaymentColumns(streamfile)
+            read_payment = self.take_payment
+        else:
+            stream = open(streamfile, 'r', buffering)
+            read_payment = self.parse_row
+        outputF1 = open(output1, 'w', buffering)
+        outputF2 = open(output2, 'w', buffering)
+        outputF3 = open(output3, 'w', buffering)
+        outputF4 = open(output4, 'w', buffering)
+        extra_outputs = [open(path, 'w', buffering) for _, _, path in self.features]
+        if self.paths is not None:
+            extra_outputs.append(open(self.paths, 'w', buffering))
+        if self.trust_scores is not None:
+            extra_outputs.append(open(self.trust_scores, 'w', buffering))
+
         # open files:
         with stream, outputF1, outputF2, outputF3, outputF4:
-            stream.readline()  # Column names in Stream File
-            stream_reader = csv.reader(stream)
+            if columns is None:
+                stream.readline()  # Column names in Stream File
+                stream_reader = csv.reader(stream)
+            else:
+                stream_reader = columns.payments(self.users)
+            sinks = [outputF1, outputF2, outputF3, outputF4] + extra_outputs
+            overlapped = None
+            if self.overlap_io:
+                # rows come from reader thread, lines written go to writer thread
+                overlapped = OverlappedIO(stream_reader, sinks, self.parse_fields if columns is None else None)
+                sinks = overlapped.sinks
+                stream_reader = overlapped.rows()
+                if columns is None:
+                    # fields are parsed by reader thread, only users are interned here
+                    read_payment = self.take_parsed
+            report_sink = sinks[3]
+
+            # outputs of core features: output1-3 and any additional feature
+            engine = FeatureEngine([Feature(name, max_degree, sink) for (name, max_degree), sink in
+                                    zip(CORE_FEATURES, sinks[:3])] +
+                                   [Feature(name, max_degree, sink) for (name, max_degree, _), sink in
+                                    zip(self.features, sinks[4:])])
+            path_sink = sinks[4 + len(self.features)] if self.paths is not None else None
+            score_sink = sinks[-1] if self.trust_scores is not None else None
+            sequence = 0    # arrival sequence of payment in stream
             for row in stream_reader:
                 try:
+                    if self.profiler is not None:
+                        started = self.profiler.payment_started(sequence)
+
                     # Read records from CSV file
-                    self.parse_row(row)
-
-                    # -------------------
-                    # Core Features
-                    # -------------------
-                    # Check if the payment is TRUSTED or UNVERIFIED:
-                    self.check_payment_status()
-
-                    # ---------------------
-                    # Additional Features
-                    # ---------------------
-                    # Check if the payment is TRUSTED or UNVERIFIED:
-                    self.added_features_processing()
-                    
+                    read_payment(row)
+
+                    # Check if the payment is TRUSTED or UNVERIFIED with core and additional features:
+                    self.classify_payment(sequence)
+
+                    # Hand payment that exhausted search budget to re-check process
+                    if rechecker is not None and self.search_budget.exhausted is not None:
+                        rechecker.submit(sequence, self.payment, self.__pay_graph.live_since(self.payment.timestamp))
+                    sequence += 1
+
                     # -----------------------------------------------
                     # STAGE 3: Write Status to output files.
                     # -----------------------------------------------
-                    # Output1.txt : Feature 1, 1st degree of connection
-                    if self.status == 1:
-                        outputF1.write("trusted \n")
-                        outputF2.write("trusted \n")
-                        outputF3.write("trusted \n")
-                    
-                    # Output2.txt : Feature 2, 1st and 2nd degree connection
-                    elif self.status == 2:
-                        outputF1.write("unverified \n")
-                        outputF2.write("trusted \n")
-                        outputF3.write("trusted \n")
-                    
-                    # Output3.txt : Feature 3, at most 4th degree of connection
-                    elif self.status < 5:
-                        outputF1.write("unverified \n")
-                        outputF2.write("unverified \n")
-                        outputF3.write("trusted \n")
-                    
-                    # If none of features match.
-                    else:
-                        outputF1.write("unverified" + "\n")
-                        outputF2.write("unverified" + "\n")
-                        outputF3.write("unverified" + "\n")
-                    
+                    # Output1-3.txt and additional features: verdict of every feature from degree of connection
+                    engine.write(self.status)
+
+                    # Paths file: users connecting payment, "none" if not connected within search depth
+                    if path_sink is not None:
+                        path_sink.write("none\n" if self.path is None else
+                                        " -> ".join(self.users.name(user) for user in self.path) + "\n")
+
+                    # Trust scores file: common neighbours of users and trust score of payment
+                    if score_sink is not None:
+                        score_sink.write("%d %.4f\n" % (self.common, trust_score(self.status, self.common)))
+
                     # Output4.txt
-                    outputF4.write(self.report+"\n")
+                    if self.window is None:
+                        report_sink.write(self.report+"\n")
+                    else:
+                        self.write_reports(report_sink)
+
+                    if self.profiler is not None:
+                        searched = self.__pay_graph if self.hub_search is None else self.hub_search
+                        if self.search_budget is not None:
+                            searched = self.search_budget
+                        if columns is not None:
+                            line = self.payment_line()
+                        else:
+                            line = ','.join(row if overlapped is None else row.row)
+                        self.profiler.payment_finished(started, line, self.status, searched.visits)
 
                 except (IndexError, ValueError):
                     pass
 
+            if self.window is not None:
+                # end of stream: release every payment still waiting for watermark
+                self.release_window(flush=True)
+                self.write_reports(report_sink)
+                sys.stderr.write("heat window: %d payments applied in order, %d late payments not added\n" %
+                                 (self.window.released, self.window.late))
+            if self.rings is not None:
+                sys.stderr.write("fraud rings: %d payments closed a ring, %d heat graph edges above degree cap\n" %
+                                 (self.rings.rings, self.rings.untracked))
+            if self.velocity is not None:
+                sys.stderr.write("amount velocity: %d payments above velocity limit\n" % self.velocity.flagged)
+            if self.search_budget is not None:
+                sys.stderr.write(self.search_budget.summary() + "\n")
+            if self.spilling:
+                sys.stderr.write(self.__pay_graph.summary() + "\n")
+            if rechecker is not None:
+                self.write_rechecks(rechecker.close(), engine)
+            if overlapped is not None:
+                overlapped.close()
+        for output in extra_outputs:
+            output.close()
+
+    def classify_payment(self, sequence):
+        """
+        This function classifies current payment with core and additional features, then updates payment graph.
+        :param sequence: arrival sequence of payment in its stream.
+        """
+        # -------------------
+        # Core Features
+        # -------------------
+        # Check if the payment is TRUSTED or UNVERIFIED:
+        self.check_payment_status()
+
+        # ---------------------
+        # Additional Features
+        # ---------------------
+        # Check if the payment is TRUSTED or UNVERIFIED:
+        if self.window is None:
+            self.added_features_processing()
+        else:
+            self.window_processing(sequence)
+
+        # Drop payment graph edges that went stale for every payment still within allowed lateness
+        self.__pay_graph.maybe_compact(self.payment.timestamp - self.compaction_margin)
+
+        # Learn edge of payment once it has been classified
+        if self.learn_stream:
+            self.update_payment_network(self.payment.user1, self.payment.user2, self.payment.timestamp)
+            if self.edge_log is not None and self.edge_log.records >= self.checkpoint_records:
+                self.checkpoint()
+
+    def write_rechecks(self, degrees, engine):
+        """
+        This function writes degrees found by re-check process to recheck file: "line, degree, verdict of every
+        feature" for every payment that exhausted search budget, line being its line in output1-3.
+        :param degrees: dictionary of arrival sequence of payment to degree of connection (None if not connected).
+        :param engine: FeatureEngine of stream stage.
+        """
+        corrected = 0
+        with open(self.recheck, 'w') as rechecks:
+            for sequence in sorted(degrees):
+                degree = degrees[sequence]
+                corrected += degree is not None
+                verdicts = engine.lines[engine.depth + 1 if degree is None else degree]
+                rechecks.write("%d, %s, %s\n" % (sequence + 1, 'none' if degree is None else degree,
+                                                 ', '.join(verdict.strip() for verdict in verdicts)))
+        sys.stderr.write("re-check: %d payments searched without budget, %d found connected\n" %
+                         (len(degrees), corrected))
+
     # --------------------------------------------
     # STAGE 4: Implementing ADDITIONAL FEATURES
     # --------------------------------------------
@@ -272,38 +793,119 @@ class AntiFraud:
         """
         # Update payment heat graph for new payments 
         # -------------------------------------------
-        active = self.added_features.update_heat_graph(self.timestamp, self.user1, self.user2)       
-        
+        active = self.added_features.update_heat_graph(self.payment)
+        self.report_added_features(active)
+
+    def window_processing(self, sequence):
+        """
+        This function passes payment to watermark window. Payments released by window are checked for additional
+        features in order of time; a late payment is checked at once without being added to heat graph.
+        :param sequence: arrival sequence of payment, its report is written to output4 in this order.
+        """
+        if self.window.ingest(self.payment, (sequence, self.payment, self.status)):
+            self.release_window()
+        else:
+            self.report_added_features(self.added_features.check_if_active(self.payment.timestamp,
+                                                                           self.window.max_timestamp))
+            self.reports[sequence] = self.report
+
+    def release_window(self, flush=False):
+        """
+        This function checks additional features for payments released by watermark window.
+        :param flush: release every buffered payment (end of stream).
+        """
+        payment, status = self.payment, self.status
+        for sequence, self.payment, self.status in self.window.release(flush):
+            self.added_features_processing()
+            self.reports[sequence] = self.report
+        self.payment, self.status = payment, status
+
+    def write_reports(self, outputF4):
+        """
+        This function writes reports to output4 as soon as every earlier payment has its report.
+        """
+        while self.next_report in self.reports:
+            outputF4.write(self.reports.pop(self.next_report) + "\n")
+            self.next_report += 1
+
+    def added_features_verdict(self, active):
+        """
+        This function checks payment with additional features.
+        :param active: True if payment is active, False if it has expired.
+
+        :return:
+            verdict: one of TRUSTED, UNVERIFIED, EXPIRED, EXCEEDED, RING, VELOCITY, SUSPICIOUS, BUDGET.
+        """
+        payment = self.payment
+
         # check for active payments
-        if active:
-            exceeded = self.amount > self.max_allowed_payment
-            
-            # Check if requested amount is more than maximum amount:
-            if not exceeded:
-                suspicious = self.added_features.check_if_suspicious([self.user1, self.user2])
-                
-                # Check for suspicious payments:
-                if suspicious:
-                    self.report = "Unverified \t Reason: Payment %s was suspicious, between users %s and %s" % \
-                     (self.amount, self.user1, self.user2)
-                
-                else:
-                    if self.status < 5: 
-                        self.report = "trusted"   
-                    else:
-                        self.report = "unverified"
-            else:
-                self.report = "Unverified \t Reason: Payment %s has exceeded maximum payment, between users %s and %s" % \
-                     (self.amount, self.user1, self.user2)
-        
+        if not active:
+            return EXPIRED
+        if self.amount_profiles is not None:
+            exceeded = payment.amount > self.amount_profiles.limit(payment.user1)
         else:
-            self.report = "Unverified \t Reason: Payment %s has expired, between users %s and %s" % \
-                     (self.amount, self.user1, self.user2)
+            exceeded = payment.amount > self.max_allowed_payment
+
+        # Check if requested amount is more than maximum amount:
+        if exceeded:
+            return EXCEEDED
+        suspicious = self.added_features.check_if_suspicious(payment)
+
+        # Check if payment closes a ring of users paying each other in last 60 seconds:
+        self.ring = self.rings is not None and self.rings.closes_ring(payment.user1, payment.user2)
+        if self.ring:
+            self.rings.rings += 1
+            return RING
+
+        # Check if payer sent more than velocity limit in last 60 seconds:
+        if self.velocity is not None and self.velocity.exceeds(payment.user1):
+            self.velocity.flagged += 1
+            return VELOCITY
+
+        # Check for suspicious payments:
+        if suspicious:
+            return SUSPICIOUS
+
+        # Users not known to be connected because search ran out of budget:
+        if self.status is None and self.search_budget is not None and self.search_budget.exhausted is not None:
+            return BUDGET
+        if self.status is not None and self.status <= CORE_DEPTH:
+            return TRUSTED
+        return UNVERIFIED
+
+    def report_added_features(self, active):
+        """
+        This function writes report of additional features checks for payment into self.report.
+        :param active: True if payment is active, False if it has expired.
+        """
+        verdict = self.added_features_verdict(active)
+        if verdict == TRUSTED or verdict == UNVERIFIED:
+            self.report = VERDICTS[verdict]
+            return
+        payment = self.payment
+        users = "between users %s and %s" % (self.users.name(payment.user1), self.users.name(payment.user2))
+        if verdict == EXPIRED:
+            self.report = "Unverified \t Reason: Payment %s has expired, %s" % (payment.amount, users)
+        elif verdict == EXCEEDED:
+            self.report = "Unverified \t Reason: Payment %s has exceeded maximum payment, %s" % (payment.amount, users)
+        elif verdict == RING:
+            self.report = "Unverified \t Reason: Payment %s closes a payment ring (%d triangles in last 60 seconds), " \
+                          "%s" % (payment.amount, self.ring, users)
+        elif verdict == VELOCITY:
+            sent, count, largest, smallest = self.velocity.window(payment.user1)
+            self.report = "Unverified \t Reason: Payment %s brings amount sent by user %s in last 60 seconds to %.2f " \
+                          "(%d payments, largest %.2f, smallest %.2f), %s" % \
+                          (payment.amount, self.users.name(payment.user1), sent, count, largest, smallest, users)
+        elif verdict == BUDGET:
+            self.report = "Unverified \t Reason: Payment %s exhausted search budget at degree %d after %d users, " \
+                          "%s" % (payment.amount, self.search_budget.exhausted, self.search_budget.visits, users)
+        else:
+            self.report = "Unverified \t Reason: Payment %s was suspicious, %s" % (payment.amount, users)
 
 # ----------------------------------------------------
 #       Main method :
 # ----------------------------------------------------
-def main(batchfile, streamfile, output1, output2, output3, output4):
+def main(batchfile, streamfile, output1, output2, output3, output4, shards=None, profiler=None, **options):
     """
     Input:
         :param batchfile: batch file contains past transaction data. Used to build social network from payments
@@ -314,25 +916,160 @@ def main(batchfile, streamfile, output1, output2, output3, output4):
         :param output2: Output file for feature 2.
         :param output3: Output file for feature 3.
         :param output4: Output file for additional features implemented.
+        :param shards: number of worker processes to partition payment graph across, None to keep it in process.
+        :param profiler: profiling.Profiler of this run, None to run without profiling.
+        :param options: options of AntiFraud class, e.g. adaptive_limits, trust_horizon, allowed_lateness.
 
     Output: Classification of payments.
     """
-    # call AntiFraud class
-    anti_fraud = AntiFraud()
+    if shards:
+        # call ShardedAntiFraud class, imported here as it imports this module.
+        from sharding import ShardedAntiFraud
+        anti_fraud = ShardedAntiFraud(shards, **options)
+    else:
+        # call AntiFraud class
+        anti_fraud = AntiFraud(**options)
+    anti_fraud.profiler = profiler
+
+    try:
+        # ----------------------------------------------------------------
+        # STAGE 1: BATCH PROCESSING
+        # Read batch file and generate payment_graph, unless state directory or snapshot already holds it.
+        # ----------------------------------------------------------------
+        # get maximum allowed payment for stream payment.
+        if profiler is not None:
+            profiler.begin('batch')
+        if not anti_fraud.recover() and not anti_fraud.load_snapshot(batchfile):
+            anti_fraud.batch_processing(batchfile)
+            anti_fraud.reorder_users()
+            anti_fraud.save_snapshot(batchfile)
+        anti_fraud.index_hubs()
+
+        # -----------------------------------------------------------------------------
+        # STAGE 2 : STREAM PROCESSING
+        # Read stream of payments and classify payments as - "trusted" or "unverified"
+        # -----------------------------------------------------------------------------
+        if profiler is not None:
+            profiler.end('batch')
+            profiler.begin('stream')
+        anti_fraud.stream_processing(streamfile, output1, output2, output3, output4)
+    finally:
+        anti_fraud.close()
+        if profiler is not None:
+            profiler.close()
+
+
+def cli(argv=None):
+    """
+    This function parses command line arguments and runs main.
+    :param argv: command line arguments, defaults to sys.argv[1:].
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 6 and not any(arg.startswith('-') for arg in argv):
+        # plain run as in run.sh: nothing to parse, argparse is not even imported
+        main(*argv)
+        return
+
+    import argparse
+    parser = argparse.ArgumentParser(description="Classify stream of payments as trusted or unverified.")
+    for name in ('batchfile', 'streamfile', 'output1', 'output2', 'output3', 'output4'):
+        parser.add_argument(name)
+    parser.add_argument('--adaptive-limits', action='store_true',
+                        help="use per-user payment limits from batch file instead of a single maximum amount")
+    parser.add_argument('--trust-horizon', type=float, metavar='DAYS',
+                        help="days a payment keeps two users connected (default: forever)")
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help="partition payment graph across N worker processes")
+    parser.add_argument('--allowed-lateness', type=int, metavar='SECONDS',
+                        help="buffer payments and apply them to heat graph in order of time once SECONDS passed")
+    parser.add_argument('--state-dir', metavar='DIR',
+                        help="keep write-ahead edge log and graph snapshot in DIR and recover from them on restart")
+    parser.add_argument('--learn-stream', action='store_true',
+                        help="add edge of every classified stream payment to payment graph")
+    parser.add_argument('--columnar', action='store_true',
+                        help="build payment graph from NumPy columns of batch file (requires numpy)")
+    parser.add_argument('--detect-rings', action='store_true',
+                        help="report payments closing a triangle of users paying each other within 60 seconds")
+    parser.add_argument('--graph-store', metavar='DIR',
+                        help="read payment graph on demand from a partitioned store in DIR, built from batch file "
+                             "if DIR does not hold it yet")
+    parser.add_argument('--feature', action='append', default=[], metavar='NAME:DEGREE:FILE',
+                        help="write an additional output to FILE trusting payments connected by at most DEGREE; "
+                             "may be repeated")
+    parser.add_argument('--cache-partitions', type=int, default=1024, metavar='N',
+                        help="partitions of graph store kept in memory (default: 1024)")
+    parser.add_argument('--profile', choices=('cprofile', 'sample'),
+                        help="profile run with cProfile or with a SIGPROF stack sampler writing collapsed stacks")
+    parser.add_argument('--profile-scope', choices=('batch', 'stream', 'window'), default='stream',
+                        help="part of run to profile (default: stream)")
+    parser.add_argument('--profile-window', default='0:1000', metavar='FIRST:COUNT',
+                        help="stream payments profiled by window scope (default: 0:1000)")
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help="profile file (default: antifraud.prof or antifraud.folded)")
+    parser.add_argument('--sample-interval', type=float, default=1.0, metavar='MS',
+                        help="milliseconds of CPU time between two stack samples (default: 1)")
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help="load state of batch stage from FILE if it was built from this batch file, "
+                             "otherwise run batch stage and write it to FILE")
+    parser.add_argument('--ring-degree-cap', type=int, default=50, metavar='N',
+                        help="do not check rings on edges between two users with more than N connections in "
+                             "heat graph (default: 50)")
+    parser.add_argument('--overlap-io', action='store_true',
+                        help="read stream file and write outputs in background threads, overlapping I/O with "
+                             "classification")
+    parser.add_argument('--paths', metavar='FILE',
+                        help="write shortest chain of users connecting the users of every stream payment to FILE")
+    parser.add_argument('--trust-scores', metavar='FILE',
+                        help="write number of common neighbours of the users of every stream payment and its trust "
+                             "score to FILE")
+    parser.add_argument('--velocity-limit', type=float, metavar='AMOUNT',
+                        help="report payments of users who sent more than AMOUNT within the 60 seconds window")
+    parser.add_argument('--reorder', choices=('degree', 'bfs', 'rcm'),
+                        help="relabel users after batch stage so that connected users have close ids")
+    parser.add_argument('--hub-degree', type=int, metavar='N',
+                        help="treat users with at least N connections as hubs: searches meet at them through "
+                             "precomputed hub distances instead of expanding them")
+    parser.add_argument('--search-budget', type=int, metavar='USERS',
+                        help="report payment unverified once its degree search visited more than USERS users")
+    parser.add_argument('--search-budget-us', type=int, metavar='MICROSECONDS',
+                        help="report payment unverified once its degree search ran longer than MICROSECONDS")
+    parser.add_argument('--recheck', metavar='FILE',
+                        help="search payments that exhausted search budget again without budget in a background "
+                             "process and write their degrees and verdicts to FILE")
+    parser.add_argument('--max-resident-users', type=int, metavar='N',
+                        help="keep at most N users of payment graph in memory, spilling least recently active users "
+                             "to disk and reading them back when a search touches them")
+    parser.add_argument('--memory-limit', type=float, metavar='MB',
+                        help="keep at most an estimated MB megabytes of payment graph in memory, as "
+                             "--max-resident-users")
+    parser.add_argument('--spill-dir', metavar='DIR',
+                        help="directory of spill file of payment graph (default: temporary directory)")
+    args = parser.parse_args(argv)
+    features = []
+    for feature in args.feature:
+        name, degree, path = feature.split(':', 2)
+        features.append((name, int(degree), path))
 
-    # ----------------------------------------------------------------
-    # STAGE 1: BATCH PROCESSING
-    # Read batch file and generate payment_graph.
-    # ----------------------------------------------------------------
-    # get maximum allowed payment for stream payment.
-    anti_fraud.batch_processing(batchfile)
+    profiler = None
+    if args.profile:
+        # imported here: only profiled runs need it.
+        from profiling import Profiler
+        first, count = args.profile_window.split(':')
+        profiler = Profiler(args.profile, args.profile_scope, args.profile_output, (int(first), int(count)),
+                            args.sample_interval / 1000.0)
 
-    # -----------------------------------------------------------------------------
-    # STAGE 2 : STREAM PROCESSING
-    # Read stream of payments and classify payments as - "trusted" or "unverified"
-    # -----------------------------------------------------------------------------
-    anti_fraud.stream_processing(streamfile, output1, output2, output3, output4)
+    main(args.batchfile, args.streamfile, args.output1, args.output2, args.output3, args.output4,
+         adaptive_limits=args.adaptive_limits,
+         trust_horizon=None if args.trust_horizon is None else int(args.trust_horizon * 86400),
+         shards=args.shards, allowed_lateness=args.allowed_lateness, state_dir=args.state_dir,
+         learn_stream=args.learn_stream, columnar=args.columnar, detect_rings=args.detect_rings,
+         ring_degree_cap=args.ring_degree_cap, graph_store=args.graph_store, cache_partitions=args.cache_partitions,
+         features=features, profiler=profiler, snapshot=args.snapshot, overlap_io=args.overlap_io, paths=args.paths,
+         velocity_limit=args.velocity_limit, reorder=args.reorder, trust_scores=args.trust_scores,
+         hub_degree=args.hub_degree, search_budget=args.search_budget, search_budget_us=args.search_budget_us,
+         recheck=args.recheck, max_resident_users=args.max_resident_users, memory_limit=args.memory_limit,
+         spill_dir=args.spill_dir)
 
 
 if __name__ == "__main__":
-    main(sys.argv[1], sys.argv[2],sys.argv[3], sys.argv[4], sys.argv[5], sys.argv[6])
\ No newline at end of file
+    cli()
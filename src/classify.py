@@ -0,0 +1,21 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    ENTRY POINT: same command line as antifraud.py, faster to start.
+    ------------------------------------------------------------------
+    A script run directly is compiled from source on every start, a module it imports is loaded from bytecode cached
+    in __pycache__. This file only imports antifraud and calls its command line, so the classifier is never compiled
+    again unless it changes.
+
+        python ./src/classify.py batch_payment.txt stream_payment.txt output1.txt output2.txt output3.txt output4.txt
+"""
+
+from antifraud import cli
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,485 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    COLUMNAR BATCH STAGE: NumPy implementation of batch processing.  (requires numpy)
+    -----------------------------------------------------------------------------------
+    Batch file is read in large chunks of bytes and parsed into columns without a Python step per payment:
+
+        1. line starts and positions of the first four commas of every line are found with array operations,
+        2. timestamp, id1, id2 and amount fields are converted by digit arithmetic over the whole chunk,
+        3. users are interned once per distinct user, not once per payment.
+
+    A line the vectorised parser can not prove valid (blank line, quotes, unusual number format, ...) is handed to
+    AntiFraud.parse_row, so every line is accepted or skipped exactly as the row by row batch stage does.
+
+    Edges are deduplicated by sorting a 64 bit key (smaller user << 32 | larger user) and keeping the latest timestamp
+    of every key. Degrees come from bincount and CSR offsets from their cumulative sum; CSRGraph serves the payment
+    graph straight from these arrays.
+"""
+
+import csv
+import time
+
+import numpy as np
+
+from payfile import PaymentColumns, is_payment_file
+from paygraph import PaymentGraph
+
+CHUNK_BYTES = 64 * 1024 * 1024
+SPACE, COMMA, DOT, NEWLINE, RETURN, ZERO, QUOTE = 32, 44, 46, 10, 13, 48, 34
+POWERS = 10 ** np.arange(19, dtype=np.int64)
+
+
+class CSRGraph(PaymentGraph):
+    """
+    CSRGraph is a payment graph held in compressed sparse row arrays:
+        offsets[user]: offsets[user + 1] - slice of targets and seen holding connections of user,
+        targets: connected users, sorted within every slice,
+        seen: timestamp of latest payment between user and target.
+    Edges added after graph was built (e.g. learned from stream) are kept in adjacency of PaymentGraph.
+    """
+    def __init__(self, offsets, targets, seen, horizon=None, compaction_interval=None):
+        """
+        initializes objects of class.
+        :param offsets: int64 array, one entry more than users.
+        :param targets: uint32 array of connected users.
+        :param seen: int64 array of timestamps of edges.
+        :param horizon: seconds an edge stays trusted, None to trust forever.
+        :param compaction_interval: seconds of payment time between two compactions.
+        """
+        PaymentGraph.__init__(self, horizon=horizon, compaction_interval=compaction_interval)
+        self.offsets = offsets
+        self.targets = targets
+        self.seen = seen
+
+    def __contains__(self, user):
+        return self.connection_count(user) > 0 or user in self.adjacency
+
+    def __len__(self):
+        degrees = np.diff(self.offsets)
+        extra = sum(1 for user in self.adjacency if user >= len(degrees) or degrees[user] == 0)
+        return int(np.count_nonzero(degrees)) + extra
+
+    def connection_count(self, user):
+        """
+        This function returns number of connections of user held in arrays.
+        """
+        if user + 1 >= len(self.offsets):
+            return 0
+        return int(self.offsets[user + 1] - self.offsets[user])
+
+    def edge_count(self):
+        return (len(self.targets) + sum(len(connections) for connections in self.adjacency.values())) // 2
+
+    def add_half_edge(self, source, target, ts):
+        """
+        This function connects source to target: time of an edge held in arrays is refreshed in place, a new edge
+        goes to adjacency.
+        """
+        if source + 1 < len(self.offsets):
+            start, end = self.offsets[source], self.offsets[source + 1]
+            index = start + np.searchsorted(self.targets[start:end], target)
+            if index < end and self.targets[index] == target:
+                if ts > self.seen[index]:
+                    self.seen[index] = ts
+                return False
+        return PaymentGraph.add_half_edge(self, source, target, ts)
+
+    def neighbours(self, user, since=None):
+        """
+        This function returns users connected to user by an edge seen at or after since.
+        """
+        if user + 1 < len(self.offsets):
+            start, end = self.offsets[user], self.offsets[user + 1]
+            if since is None:
+                connected = self.targets[start:end].tolist()
+            else:
+                connected = self.targets[start:end][self.seen[start:end] >= since].tolist()
+        else:
+            connected = []
+        if self.adjacency:
+            connected += PaymentGraph.neighbours(self, user, since)
+        return connected
+
+    def common_neighbours(self, user1, user2, since=None):
+        """
+        This function counts users connected to both user1 and user2 by intersecting their sorted slices of targets:
+        every target of the shorter slice is found in the longer one by binary search.
+        """
+        if self.adjacency or user1 == user2:
+            # edges learned since graph was built are not in arrays
+            return PaymentGraph.common_neighbours(self, user1, user2, since)
+        if max(user1, user2) + 1 >= len(self.offsets):
+            return 0
+        (start1, end1), (start2, end2) = sorted(((self.offsets[user1], self.offsets[user1 + 1]),
+                                                 (self.offsets[user2], self.offsets[user2 + 1])),
+                                                key=lambda bounds: bounds[1] - bounds[0])
+        if start1 == end1:
+            return 0
+        shorter, longer = self.targets[start1:end1], self.targets[start2:end2]
+        index = np.minimum(np.searchsorted(longer, shorter), len(longer) - 1)
+        found = longer[index] == shorter
+        if since is not None:
+            found &= (self.seen[start1:end1] >= since) & (self.seen[start2:end2][index] >= since)
+        return int(np.count_nonzero(found))
+
+    def relabel(self, order, new_ids):
+        """
+        This function renames every user of graph: arrays are rebuilt in order of new ids.
+        :param order: old user ids in their new order.
+        :param new_ids: new id of every old id.
+        """
+        users = len(self.offsets) - 1
+        renamed = np.asarray(new_ids, dtype=np.int64)
+        owners = renamed[np.repeat(np.arange(users), np.diff(self.offsets))]
+        targets = renamed[self.targets]
+        edges = np.lexsort((targets, owners))
+        self.offsets = csr_offsets(owners[edges], users)
+        self.targets = targets[edges].astype(np.uint32)
+        self.seen = self.seen[edges]
+        PaymentGraph.relabel(self, order, new_ids)
+
+    def compact(self, now):
+        """
+        This function drops edges that are stale at time now from arrays and from adjacency.
+        """
+        since = self.live_since(now)
+        if since is not None:
+            keep = self.seen >= since
+            owners = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+            removed = len(keep) - int(np.count_nonzero(keep))
+            self.offsets = csr_offsets(owners[keep], len(self.offsets) - 1)
+            self.targets = self.targets[keep]
+            self.seen = self.seen[keep]
+        else:
+            removed = 0
+        return removed // 2 + PaymentGraph.compact(self, now)
+
+
+def csr_offsets(sources, users):
+    """
+    This function returns CSR offsets for connections sorted by source user.
+    """
+    offsets = np.zeros(users + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=users), out=offsets[1:])
+    return offsets
+
+
+def strip(buf, starts, ends):
+    """
+    This function moves field boundaries past surrounding spaces (and carriage return at the end of a line).
+    """
+    while True:
+        move = (starts < ends) & (buf[np.minimum(starts, len(buf) - 1)] == SPACE)
+        if not move.any():
+            break
+        starts[move] += 1
+    while True:
+        last = buf[np.maximum(ends - 1, 0)]
+        move = (ends > starts) & ((last == SPACE) | (last == RETURN))
+        if not move.any():
+            break
+        ends[move] -= 1
+    return starts, ends
+
+
+def parse_numbers(buf, starts, ends, decimals):
+    """
+    This function parses fields buf[starts[i]: ends[i]] as numbers with digit arithmetic over all fields together.
+    :param decimals: if True a single '.' is allowed and the digits must fit in 53 bits, so that value is exactly
+                     float(text); integer fields must not have leading zeros so that they are equal to the user id
+                     strings they came from.
+
+    :return:
+        (values, valid): int64 values for integer fields, float64 values for decimal fields, and a mask of fields
+        that were well formed.
+    """
+    lengths = ends - starts
+    valid = (lengths > 0) & (lengths <= 18)
+    lengths = np.where(valid, lengths, 0)
+    count = len(starts)
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(count, dtype=np.float64 if decimals else np.int64), valid
+    present = lengths > 0
+    firsts = np.zeros(count, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=firsts[1:])
+    segments = firsts[present]
+
+    # every character of every field, with its field number
+    field = np.repeat(np.arange(count, dtype=np.int32), lengths)
+    positions = np.repeat(starts - firsts, lengths) + np.arange(total)
+    chars = buf[positions]
+    values = chars - np.uint8(ZERO)        # wraps around below '0', so only digits are <= 9
+    digits = values <= 9
+
+    # power of ten of every digit: number of digits right of it within its field
+    running = np.cumsum(digits, dtype=np.int32)
+    in_field = np.zeros(count, dtype=np.int32)
+    in_field[present] = np.add.reduceat(digits, segments, dtype=np.int32)
+    before = np.zeros(count, dtype=np.int32)
+    before[present] = running[segments] - digits[segments]
+    power = (in_field + before)[field] - running
+
+    def per_field(flags):
+        counts = np.zeros(count, dtype=np.int64)
+        counts[present] = np.add.reduceat(flags, segments, dtype=np.int64)
+        return counts
+
+    if decimals:
+        dots = chars == DOT
+        valid &= per_field(dots) <= 1
+        # digits after decimal point are the digits right of the dot
+        places = per_field(np.where(dots, power, 0))
+        allowed = digits | dots
+    else:
+        # a leading zero would make the number differ from the id string
+        valid &= ~((lengths > 1) & (buf[np.minimum(starts, len(buf) - 1)] == ZERO))
+        allowed = digits
+    valid &= per_field(~allowed) == 0
+
+    numbers = per_field(np.where(digits, values * POWERS[np.clip(power, 0, 18)], 0))
+    if decimals:
+        # integer mantissa below 2**53 and power of ten below 10**23 are exact doubles, so their quotient is the
+        # correctly rounded double float(text) gives; longer mantissas go to the row by row parser
+        valid &= numbers < 1 << 53
+        return numbers / (10.0 ** np.where(valid, places, 0)), valid
+    return numbers, valid
+
+
+def local_timestamps(buf, starts, ends):
+    """
+    This function converts timestamp fields to seconds the same way AntiFraud.parse_row does: the field is read as
+    field[0:10] + " " + field[12:] with time.strptime and converted by time.mktime in local time.
+
+    :return:
+        (timestamps, valid)
+    """
+    valid = (ends - starts) == 19
+    base = np.where(valid, starts, 0)
+
+    def number(offset, width):
+        value = np.zeros(len(starts), dtype=np.int64)
+        for index in range(width):
+            char = buf[base + offset + index].astype(np.int64)
+            valid[:] &= (char >= ZERO) & (char <= ZERO + 9)
+            value = value * 10 + (char - ZERO)
+        return value
+
+    year, month, day = number(0, 4), number(5, 2), number(8, 2)
+    hour, minute, second = number(12, 1), number(14, 2), number(17, 2)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (minute < 60) & (second < 62)
+    valid &= (buf[base + 4] == ord('-')) & (buf[base + 7] == ord('-')) & (buf[base + 13] == ord(':')) & \
+        (buf[base + 16] == ord(':'))
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    days = months.astype('datetime64[D]') + np.where(valid, day - 1, 0).astype('timedelta64[D]')
+    # day has to exist in its month, e.g. no 2016-02-30
+    valid &= days.astype('datetime64[M]') == months
+    fields_as_utc = days.astype(np.int64) * 86400 + hour * 3600 + minute * 60 + second
+
+    # local time offset is looked up once per distinct hour
+    hours, inverse = np.unique(fields_as_utc // 3600, return_inverse=True)
+    offsets = np.array([int(time.mktime(time.gmtime(int(value) * 3600)[:8] + (-1,))) - int(value) * 3600
+                        for value in hours], dtype=np.int64)
+    return fields_as_utc + offsets[inverse.ravel()], valid
+
+
+def parse_chunk(data):
+    """
+    This function parses whole lines of a batch file.
+
+    :return:
+        (timestamps, id1, id2, amounts, lines, rejected): columns of lines parsed by array operations, index of their
+        lines in data, and list of (index, line) of lines that have to be parsed row by row.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == NEWLINE)
+    line_starts = np.concatenate(([0], newlines[:-1] + 1)).astype(np.int64)
+    line_ends = newlines.astype(np.int64)
+    lines = len(line_starts)
+
+    # first four commas of every line
+    commas = np.flatnonzero(buf == COMMA)
+    line_of_comma = np.searchsorted(line_starts, commas, side='right') - 1
+    rank = np.arange(len(commas)) - np.searchsorted(line_of_comma, line_of_comma, side='left')
+    found = np.bincount(line_of_comma, minlength=lines)
+    cut = []
+    for index in range(4):
+        position = np.full(lines, -1, dtype=np.int64)
+        chosen = rank == index
+        position[line_of_comma[chosen]] = commas[chosen]
+        cut.append(position)
+    quoted = np.bincount(np.searchsorted(line_starts, np.flatnonzero(buf == QUOTE), side='right') - 1,
+                         minlength=lines)
+    valid = (found >= 3) & (quoted == 0)
+    amount_end = np.where(found >= 4, cut[3], line_ends)
+
+    def field(start, end):
+        return strip(buf, np.where(valid, start, 0).astype(np.int64), np.where(valid, end, 0).astype(np.int64))
+
+    timestamps, ok = local_timestamps(buf, *field(line_starts, cut[0]))
+    valid &= ok
+    id1, ok = parse_numbers(buf, *field(cut[0] + 1, cut[1]), decimals=False)
+    valid &= ok
+    id2, ok = parse_numbers(buf, *field(cut[1] + 1, cut[2]), decimals=False)
+    valid &= ok
+    amounts, ok = parse_numbers(buf, *field(cut[2] + 1, amount_end), decimals=True)
+    valid &= ok
+
+    rejected = [(int(line), bytes(buf[line_starts[line]:line_ends[line]])) for line in np.flatnonzero(~valid)]
+    return timestamps[valid], id1[valid], id2[valid], amounts[valid], np.flatnonzero(valid), rejected
+
+
+def read_payment_columns(path, anti_fraud):
+    """
+    This function reads payments of a batch file into columns. Users are interned into anti_fraud.users.
+    :param path: batch file.
+    :param anti_fraud: AntiFraud object; its parse_row handles lines rejected by vectorised parser.
+
+    :return:
+        (timestamps, user1, user2, amounts) NumPy arrays in order of batch file, users as interned ids.
+    """
+    if is_payment_file(path):
+        return read_binary_columns(path, anti_fraud)
+    parts = []
+    rejected = []
+    first_line = 0      # index of first line of chunk in file, header not counted
+
+    def parse(data):
+        part = parse_chunk(data)
+        parts.append(part[:4] + (part[4] + first_line,))
+        rejected.extend((first_line + line, text) for line, text in part[5])
+        return data.count(b'\n')
+
+    with open(path, 'rb') as batch:
+        batch.readline()    # Column names in Batch File.
+        rest = b''
+        while True:
+            block = batch.read(CHUNK_BYTES)
+            if not block:
+                break
+            block = rest + block
+            end = block.rfind(b'\n') + 1
+            rest = block[end:]
+            if end:
+                first_line += parse(block[:end])
+        if rest:
+            parse(rest + b'\n')
+
+    def joined(column, dtype):
+        return np.concatenate([part[column] for part in parts]) if parts else np.zeros(0, dtype=dtype)
+
+    timestamps, id1, id2, amounts = joined(0, np.int64), joined(1, np.int64), joined(2, np.int64), \
+        joined(3, np.float64)
+
+    # intern every distinct user once
+    distinct, inverse = np.unique(np.concatenate((id1, id2)), return_inverse=True)
+    interned = np.array(anti_fraud.users.intern_all([str(user) for user in distinct.tolist()]), dtype=np.uint32)
+    users = interned[inverse.ravel()] if len(distinct) else np.zeros(0, dtype=np.uint32)
+    user1, user2 = users[:len(id1)], users[len(id1):]
+
+    # lines vectorised parser could not prove valid are parsed row by row, exactly as batch stage does
+    extra = []
+    for line, text in rejected:
+        for row in csv.reader([text.decode('utf-8', 'replace')]):
+            try:
+                anti_fraud.parse_row(row)
+                payment = anti_fraud.payment
+                extra.append((line, payment.timestamp, payment.user1, payment.user2, payment.amount))
+            except (IndexError, ValueError):
+                pass
+    if extra:
+        # put them back at their place in file: compaction schedule and amount profiles follow file order
+        lines = np.concatenate((joined(4, np.int64), np.array([row[0] for row in extra], dtype=np.int64)))
+        order = np.argsort(lines, kind='stable')
+        timestamps = np.concatenate((timestamps, np.array([row[1] for row in extra], dtype=np.int64)))[order]
+        user1 = np.concatenate((user1, np.array([row[2] for row in extra], dtype=np.uint32)))[order]
+        user2 = np.concatenate((user2, np.array([row[3] for row in extra], dtype=np.uint32)))[order]
+        amounts = np.concatenate((amounts, np.array([row[4] for row in extra], dtype=np.float64)))[order]
+    return timestamps, user1, user2, amounts
+
+
+def read_binary_columns(path, anti_fraud):
+    """
+    This function reads payments of a binary payment file into columns, see read_payment_columns.
+    """
+    with PaymentColumns(path) as columns:
+        interned = np.array(anti_fraud.users.intern_all(columns.names), dtype=np.uint32)
+        timestamps = np.frombuffer(columns.timestamps, dtype=np.int64).copy()
+        user1 = interned[np.frombuffer(columns.user1, dtype=np.uint32)]
+        user2 = interned[np.frombuffer(columns.user2, dtype=np.uint32)]
+        amounts = np.frombuffer(columns.amounts, dtype=np.int64) / float(10 ** columns.scale)
+    return timestamps, user1, user2, amounts
+
+
+def build_graph(timestamps, user1, user2, users, horizon=None, compaction_interval=None):
+    """
+    This function builds CSRGraph from payment columns.
+    :param users: number of interned users.
+
+    :return:
+        CSRGraph with one edge per pair of users that paid each other, time of edge is their latest payment.
+    """
+    keep = user1 != user2
+    lower = np.minimum(user1[keep], user2[keep]).astype(np.uint64)
+    upper = np.maximum(user1[keep], user2[keep]).astype(np.uint64)
+    times = timestamps[keep]
+
+    # deduplicate edges: sort by key then time, keep last entry of every key
+    keys = (lower << np.uint64(32)) | upper
+    order = np.lexsort((times, keys))
+    keys, times = keys[order], times[order]
+    last = np.flatnonzero(np.append(keys[1:] != keys[:-1], True)) if len(keys) else np.zeros(0, dtype=np.int64)
+    keys, times = keys[last], times[last]
+    lower = (keys >> np.uint64(32)).astype(np.int64)
+    upper = (keys & np.uint64(0xFFFFFFFF)).astype(np.int64)
+
+    # both directions of every edge, sorted by source then target
+    sources = np.concatenate((lower, upper))
+    targets = np.concatenate((upper, lower))
+    seen = np.concatenate((times, times))
+    order = np.lexsort((targets, sources))
+    return CSRGraph(csr_offsets(sources[order], users), targets[order].astype(np.uint32), seen[order],
+                    horizon=horizon, compaction_interval=compaction_interval)
+
+
+def compacted_rows(timestamps, horizon, compaction_interval):
+    """
+    This function replays schedule of PaymentGraph.maybe_compact over batch payments in order, so a graph built in one
+    step holds the edges the row by row batch stage leaves. Latest compaction drops every edge whose payments up to it
+    are all stale; payments after it add their edge again, however old. Running maximum of timestamps only grows, so
+    next compaction is found by binary search, one step per compaction instead of per payment.
+    :param timestamps: timestamps of batch payments, in order of batch file.
+    :param horizon: seconds an edge stays trusted.
+    :param compaction_interval: seconds of payment time between two compactions.
+
+    :return:
+        (mask of payments whose edges are kept, time of latest compaction).
+    """
+    running = np.maximum.accumulate(timestamps)
+    latest, compacted = 0, False
+    while True:
+        index = int(np.searchsorted(running, timestamps[latest] + compaction_interval, side='left'))
+        if index == len(timestamps):
+            break
+        latest, compacted = index, True
+    keep = np.ones(len(timestamps), dtype=bool)
+    if compacted:
+        keep[:latest + 1] = timestamps[:latest + 1] >= timestamps[latest] - horizon
+    return keep, int(timestamps[latest])
+
+
+def load_amount_profiles(profiles, user1, amounts):
+    """
+    This function fills AmountProfiles from payment columns by replaying AmountProfiles.update over payments in order
+    of batch file. Markers of a P-square sketch depend on the order amounts arrive in, so they can not be placed from
+    sorted amounts without changing limits: this is the one part of columnar batch stage that runs per payment.
+    """
+    update = profiles.update
+    for user, amount in zip(user1.tolist(), amounts.tolist()):
+        update(user, amount)
@@ -0,0 +1,530 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    DIFFERENTIAL TESTING: optimised engines checked against the reference classifier.
+    -----------------------------------------------------------------------------------
+    Every engine (columnar batch stage, hub search, sharding, graph store, memory governor, binary input, ...) must
+    give exactly the verdicts of the plain run: breadth first degree search of PaymentGraph, heat graph of
+    AdditionalFeatures. The fixtures of insight_testsuite are too small to show a subtle difference, so:
+
+        1. inputs are generated from a seed: random payments between a pool of users, plus the cases engines get
+           wrong: hubs paid by many users, long chains of users (degrees 4 and 5 apart), duplicate and reversed
+           edges, self payments, bursts of payments within the 60 seconds window, timestamps out of order and
+           amounts above the batch maximum.
+        2. reference run and every registered engine classify the input; outputs 1-4 are compared line by line.
+           An engine raising an exception is a mismatch too.
+        3. first mismatch is minimised: stream is cut after the mismatching payment, then stream and batch payments
+           are removed by delta debugging as long as the engine still disagrees with the reference. Reproducer is
+           written as a case of insight_testsuite/tests: paymo_input, paymo_output of the reference run, and
+           engine.txt naming the engine and its options.
+
+    An engine is registered with register(name, options, prepare): options of antifraud.main (a dictionary, or a
+    function of the working directory returning one), and optionally a function converting the input files. Options
+    shared by reference run and every engine (trust horizon, learned stream, allowed lateness, ...) put the engines
+    under those modes; engines that can not be combined with them are left out.
+
+    Usage: python src/differential.py [--seeds N] [--first-seed S] [--engines a,b] [--reproducer DIR]
+                                      [--trust-horizon DAYS] [--learn-stream] [--allowed-lateness SECONDS] ...
+"""
+
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import antifraud
+import payfile
+
+OUTPUTS = ('output1.txt', 'output2.txt', 'output3.txt', 'output4.txt')
+HEADER = "time, id1, id2, amount, message\n"
+MESSAGES = [u"Spam", u"rent \U0001f3e0", u"lunch, then drinks", u"\U0001f355\U0001f37a", u"Uber", u""]
+# registered engines: name -> (options of antifraud.main or function of working directory, function converting
+# (batch file, stream file, working directory) to files it reads, or None; module needed, or None)
+ENGINES = OrderedDict()
+
+
+def register(name, options=None, prepare=None, requires=None):
+    """
+    This function registers an engine compared to the reference run.
+    :param name: name of engine.
+    :param options: options of antifraud.main, or function of working directory returning them.
+    :param prepare: function of (batch file, stream file, working directory) returning the two files engine reads,
+                    None to read input files.
+    :param requires: module engine needs; engine is skipped if it can not be imported.
+    """
+    ENGINES[name] = (options or {}, prepare, requires)
+
+
+def binary_input(batchfile, streamfile, workdir):
+    """
+    This function converts both input files to binary payment files.
+    """
+    paths = []
+    for path in (batchfile, streamfile):
+        paths.append(os.path.join(workdir, os.path.basename(path) + '.pay'))
+        payfile.convert(path, paths[-1])
+    return paths
+
+
+def graph_store_run(batchfile, streamfile, workdir):
+    """
+    This function builds graph store of working directory by a first run learning stream, as a restart finds it.
+    """
+    paths = [os.path.join(workdir, 'first-' + output) for output in OUTPUTS]
+    antifraud.main(batchfile, streamfile, *paths, graph_store=os.path.join(workdir, 'store'), cache_partitions=2,
+                   learn_stream=True)
+    return batchfile, streamfile
+
+
+register('columnar', {'columnar': True}, requires='numpy')
+register('hub-search', {'hub_degree': 3})
+register('reorder-degree', {'reorder': 'degree'})
+register('reorder-bfs', {'reorder': 'bfs'})
+register('reorder-rcm', {'reorder': 'rcm'})
+register('shards', {'shards': 3})
+register('graph-store', lambda workdir: {'graph_store': os.path.join(workdir, 'store'), 'cache_partitions': 2})
+register('graph-store-reuse', lambda workdir: {'graph_store': os.path.join(workdir, 'store'), 'cache_partitions': 2},
+         prepare=graph_store_run)
+register('memory-governor', lambda workdir: {'max_resident_users': 3, 'spill_dir': workdir})
+register('overlap-io', {'overlap_io': True})
+register('paths', lambda workdir: {'paths': os.path.join(workdir, 'paths.txt')})
+register('search-budget', {'search_budget': 1 << 30})
+register('binary-input', prepare=binary_input)
+
+
+def compatible(options, shared):
+    """
+    This function checks if options of an engine can be combined with shared options, by creating its AntiFraud.
+    """
+    workdir = tempfile.mkdtemp(prefix='differential-')
+    try:
+        options = dict(shared, **(options(workdir) if callable(options) else options))
+        options.pop('shards', None)
+        antifraud.AntiFraud(**options).close()
+        return True
+    except ValueError:
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def available_engines(names=None, shared=None):
+    """
+    This function returns registered engines whose module can be imported and whose options can be combined with
+    shared options.
+    :param names: names of engines wanted, None for all.
+    :param shared: options of antifraud.main of reference run and every engine.
+
+    :return:
+        (dictionary of engines, as ENGINES; dictionary of name of engine left out to reason)
+    """
+    engines = OrderedDict()
+    skipped = OrderedDict()
+    for name in (names or ENGINES):
+        if name not in ENGINES:
+            raise ValueError("unknown engine %s, registered: %s" % (name, ', '.join(ENGINES)))
+        options, _, requires = ENGINES[name]
+        if requires is not None:
+            try:
+                __import__(requires)
+            except ImportError:
+                skipped[name] = "%s not installed" % requires
+                continue
+        if shared and not compatible(options, shared):
+            skipped[name] = "not combined with shared options"
+            continue
+        engines[name] = ENGINES[name]
+    return engines, skipped
+
+
+# ----------------------------------------------------
+#       Generated inputs :
+# ----------------------------------------------------
+def stamp(ts):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+
+
+def generate(seed, users=120, batch_rows=300, stream_rows=200):
+    """
+    This function generates batch and stream payments of a seed, mixing random payments with adversarial ones.
+
+    :param users: users of an input of average density, half to twice as many are drawn.
+
+    :return:
+        (batch lines, stream lines), without header.
+    """
+    rng = random.Random(seed)
+    # density of payment graph varies with seed: degrees of connection from 1 to beyond 4
+    ids = [str(rng.randrange(1, 100000)) for _ in range(rng.randint(max(2, users // 2), users * 2))]
+    hubs = rng.sample(ids, rng.randint(0, 3))
+    chain = rng.sample(ids, min(len(ids), rng.randint(4, 9)))
+    ts = 1477990000 + rng.randrange(86400)
+
+    def line(ts, user1, user2, amount):
+        return "%s, %s, %s, %s, %s\n" % (stamp(ts), user1, user2, amount, rng.choice(MESSAGES))
+
+    def amount(limit):
+        shape = rng.random()
+        if shape < 0.1:
+            return "%d" % rng.randint(1, int(limit))
+        if shape < 0.15:
+            return "%.1f" % rng.uniform(0.1, limit)
+        return "%.2f" % rng.uniform(0.01, limit)
+
+    batch = []
+    previous = None
+    for row in range(batch_rows):
+        ts += rng.choice((0, 0, 1, 5, 60, 3600))
+        shape = rng.random()
+        if shape < 0.15 and hubs:
+            user1, user2 = rng.choice(ids), rng.choice(hubs)
+            if rng.random() < 0.5:
+                user1, user2 = user2, user1
+        elif shape < 0.25 and previous is not None:
+            user1, user2 = previous if rng.random() < 0.5 else previous[::-1]
+        elif shape < 0.28:
+            user1 = user2 = rng.choice(ids)
+        else:
+            user1, user2 = rng.choice(ids), rng.choice(ids)
+        previous = (user1, user2)
+        batch.append(line(ts - rng.randrange(120) if rng.random() < 0.05 else ts, user1, user2, amount(100)))
+    # chain of users, in random places of batch
+    for index in range(len(chain) - 1):
+        batch.insert(rng.randrange(len(batch) + 1), line(ts - rng.randrange(86400), chain[index], chain[index + 1],
+                                                         amount(100)))
+
+    stream = []
+    ts += rng.randrange(1, 172800 * 2)
+    while len(stream) < stream_rows:
+        shape = rng.random()
+        ts += rng.choice((0, 0, 1, 2, 30, 61, 600))
+        if shape < 0.1:
+            # burst: one payer fanning out to many users within a few seconds
+            payer = rng.choice(ids)
+            for _ in range(rng.randint(5, 15)):
+                stream.append(line(ts + rng.randrange(3), payer, rng.choice(ids), amount(50)))
+        elif shape < 0.2:
+            # pair paying each other again and again
+            pair = (rng.choice(ids), rng.choice(ids))
+            for _ in range(rng.randint(5, 14)):
+                stream.append(line(ts + rng.randrange(5), pair[0], pair[1], amount(50)))
+        elif shape < 0.3:
+            stream.append(line(ts, chain[0], rng.choice(chain[1:]), amount(100)))
+        elif shape < 0.35:
+            # late payment, and payment past expiry of heat graph
+            stream.append(line(ts - rng.choice((30, 90, 172801)), rng.choice(ids), rng.choice(ids), amount(100)))
+        elif shape < 0.4:
+            stream.append(line(ts, rng.choice(ids), rng.choice(ids), amount(300)))
+        elif shape < 0.45 and hubs:
+            stream.append(line(ts, rng.choice(hubs), rng.choice(ids), amount(100)))
+        elif shape < 0.48:
+            user = rng.choice(ids)
+            stream.append(line(ts, user, user, amount(100)))
+        elif shape < 0.5:
+            # user never seen in batch
+            stream.append(line(ts, str(rng.randrange(100000, 200000)), rng.choice(ids), amount(100)))
+        else:
+            stream.append(line(ts, rng.choice(ids), rng.choice(ids), amount(100)))
+    return batch, stream[:stream_rows]
+
+
+# ----------------------------------------------------
+#       Runs and comparison :
+# ----------------------------------------------------
+def write_input(workdir, batch, stream):
+    """
+    This function writes batch and stream lines to payment files of working directory.
+
+    :return:
+        (batch file, stream file)
+    """
+    paths = (os.path.join(workdir, 'batch_payment.txt'), os.path.join(workdir, 'stream_payment.txt'))
+    for path, lines in zip(paths, (batch, stream)):
+        with io.open(path, 'w', encoding='utf-8') as payments:
+            payments.write(HEADER)
+            payments.writelines(lines)
+    return paths
+
+
+def classify(batchfile, streamfile, workdir, options, prepare=None, shared=None):
+    """
+    This function runs antifraud.main on input files with options and shared options, its summaries to stderr
+    discarded.
+
+    :return:
+        list of lines of every output.
+    """
+    os.mkdir(workdir)
+    if prepare is not None:
+        batchfile, streamfile = prepare(batchfile, streamfile, workdir)
+    if callable(options):
+        options = options(workdir)
+    options = dict(shared or {}, **options)
+    paths = [os.path.join(workdir, output) for output in OUTPUTS]
+    stderr = sys.stderr
+    sys.stderr = open(os.devnull, 'w')
+    try:
+        antifraud.main(batchfile, streamfile, *paths, **options)
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+    outputs = []
+    for path in paths:
+        with io.open(path, encoding='utf-8') as output:
+            outputs.append(output.read().splitlines())
+    return outputs
+
+
+def first_mismatch(expected, outputs):
+    """
+    This function compares outputs of an engine to reference outputs.
+
+    :return:
+        None if they are identical, else (output, line number, reference line, engine line); a missing line is None.
+    """
+    for output, wanted, got in zip(OUTPUTS, expected, outputs):
+        for number in range(max(len(wanted), len(got))):
+            reference = wanted[number] if number < len(wanted) else None
+            engine = got[number] if number < len(got) else None
+            if reference != engine:
+                return output, number + 1, reference, engine
+    return None
+
+
+def check(batch, stream, engines, workdir=None, shared=None):
+    """
+    This function classifies an input with the reference run and with engines.
+    :param batch: batch lines.
+    :param stream: stream lines.
+    :param engines: dictionary of engines, as ENGINES.
+    :param workdir: directory files are written in, None for a temporary directory removed afterwards.
+    :param shared: options of antifraud.main of reference run and every engine.
+
+    :return:
+        (reference outputs, dictionary of engine name to its first mismatch, or to 'raised ...' if it raised an
+        exception; engines giving identical outputs are left out), reference outputs are None if reference run
+        itself raised an exception.
+    """
+    temporary = workdir is None
+    workdir = tempfile.mkdtemp(prefix='differential-') if temporary else workdir
+    try:
+        batchfile, streamfile = write_input(workdir, batch, stream)
+        try:
+            expected = classify(batchfile, streamfile, os.path.join(workdir, 'reference'), {}, shared=shared)
+        except Exception:
+            return None, {}
+        mismatches = {}
+        for name, (options, prepare, _) in engines.items():
+            try:
+                mismatch = first_mismatch(expected, classify(batchfile, streamfile, os.path.join(workdir, name),
+                                                             options, prepare, shared))
+            except Exception as error:
+                mismatch = 'raised %s: %s' % (type(error).__name__, error)
+            if mismatch is not None:
+                mismatches[name] = mismatch
+        return expected, mismatches
+    finally:
+        if temporary:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ----------------------------------------------------
+#       Minimisation :
+# ----------------------------------------------------
+def reduce_lines(lines, failing, budget):
+    """
+    This function removes lines by delta debugging as long as input keeps failing: chunks of halving size are
+    removed, a removal that still fails is kept.
+    :param lines: lines of a failing input.
+    :param failing: function of lines returning True if they still fail.
+    :param budget: list holding tests still allowed, decremented by each test.
+
+    :return:
+        smallest failing lines found.
+    """
+    if lines and budget[0] > 0:
+        budget[0] -= 1
+        if failing([]):
+            return []
+    chunks = 2
+    while len(lines) >= 2 and budget[0] > 0:
+        size = -(-len(lines) // chunks)
+        for start in range(0, len(lines), size):
+            if budget[0] <= 0:
+                break
+            candidate = lines[:start] + lines[start + size:]
+            budget[0] -= 1
+            if failing(candidate):
+                lines = candidate
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if chunks >= len(lines):
+                break
+            chunks = min(len(lines), chunks * 2)
+    return lines
+
+
+def minimise(batch, stream, name, mismatch, max_tests=400, shared=None):
+    """
+    This function shrinks an input an engine disagrees on to a small reproducer.
+    :param batch: batch lines.
+    :param stream: stream lines.
+    :param name: name of engine.
+    :param mismatch: first mismatch found on input, a line number of output1-3 is the stream payment disagreed on.
+    :param max_tests: runs of reference and engine allowed.
+    :param shared: options of antifraud.main of reference run and engine.
+
+    :return:
+        (batch lines, stream lines)
+    """
+    engine = {name: ENGINES[name]}
+    budget = [max_tests]
+
+    def failing(batch, stream):
+        return name in check(batch, stream, engine, shared=shared)[1]
+
+    if isinstance(mismatch, tuple) and mismatch[0] != 'output4.txt' and mismatch[1] < len(stream):
+        # payments after the one disagreed on can not change it
+        budget[0] -= 1
+        if failing(batch, stream[:mismatch[1]]):
+            stream = stream[:mismatch[1]]
+    for _ in range(2):
+        size = len(batch) + len(stream)
+        stream = reduce_lines(stream, lambda lines: failing(batch, lines), budget)
+        batch = reduce_lines(batch, lambda lines: failing(lines, stream), budget)
+        if len(batch) + len(stream) == size:
+            break
+    return batch, stream
+
+
+def write_reproducer(directory, name, batch, stream, shared=None):
+    """
+    This function writes a reproducer as a case of insight_testsuite/tests, outputs of the reference run expected.
+    """
+    inputs = os.path.join(directory, 'paymo_input')
+    expected = os.path.join(directory, 'paymo_output')
+    for path in (inputs, expected):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    batchfile, streamfile = write_input(inputs, batch, stream)
+    workdir = tempfile.mkdtemp(prefix='differential-')
+    try:
+        outputs = classify(batchfile, streamfile, os.path.join(workdir, 'reference'), {}, shared=shared)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    for output, lines in zip(OUTPUTS, outputs):
+        with io.open(os.path.join(expected, output), 'w', encoding='utf-8') as written:
+            written.writelines(line + u'\n' for line in lines)
+    options, prepare, _ = ENGINES[name]
+    with open(os.path.join(directory, 'engine.txt'), 'w') as description:
+        description.write("engine: %s\noptions: %r\nshared options: %r\nconvert input: %s\n" % (
+            name, options if not callable(options) else options('WORKDIR'), shared or {},
+            prepare.__name__ if prepare is not None else 'no'))
+
+
+def describe(mismatch):
+    if not isinstance(mismatch, tuple):
+        return mismatch
+    output, number, reference, engine = mismatch
+    return "%s line %d: reference %r, engine %r" % (output, number, reference, engine)
+
+
+# ----------------------------------------------------
+#       Main method :
+# ----------------------------------------------------
+def main(seeds=20, first_seed=0, engines=None, users=120, batch_rows=300, stream_rows=200, reproducer=None,
+         max_tests=400, shared=None):
+    """
+    This function checks engines against the reference run on generated inputs; the first engine to disagree has
+    its input minimised and written as reproducer.
+    :param seeds: number of inputs generated.
+    :param first_seed: seed of first input.
+    :param engines: names of engines checked, None for all registered.
+    :param users, batch_rows, stream_rows: size of generated inputs.
+    :param reproducer: directory reproducer is written to, None for differential-<engine> in current directory.
+    :param max_tests: runs allowed to minimise a mismatch.
+    :param shared: options of antifraud.main of reference run and every engine, e.g. trust_horizon; engines that
+                   can not be combined with them are left out.
+
+    :return:
+        True if every engine agreed on every input.
+    """
+    engines, skipped = available_engines(engines, shared)
+    print("engines: %s%s" % (', '.join(engines), '' if not skipped else " (skipped: %s)" %
+                             '; '.join('%s: %s' % item for item in skipped.items())))
+    if shared:
+        print("shared options: %s" % ', '.join('%s=%r' % item for item in sorted(shared.items())))
+    for seed in range(first_seed, first_seed + seeds):
+        batch, stream = generate(seed, users, batch_rows, stream_rows)
+        expected, mismatches = check(batch, stream, engines, shared=shared)
+        if expected is None:
+            print("seed %d: reference run raised an exception, input skipped" % seed)
+            continue
+        if not mismatches:
+            print("seed %d: %d batch, %d stream payments, %d engines agree" % (seed, len(batch), len(stream),
+                                                                             len(engines)))
+            continue
+        for name, mismatch in mismatches.items():
+            print("seed %d: engine %s disagrees: %s" % (seed, name, describe(mismatch)))
+        name, mismatch = next(iter(mismatches.items()))
+        batch, stream = minimise(batch, stream, name, mismatch, max_tests, shared)
+        directory = reproducer or os.path.join(os.getcwd(), 'differential-%s' % name)
+        write_reproducer(directory, name, batch, stream, shared)
+        _, mismatches = check(batch, stream, {name: ENGINES[name]}, shared=shared)
+        print("minimised to %d batch and %d stream payments: %s" % (len(batch), len(stream),
+                                                                   describe(mismatches.get(name, 'no longer fails'))))
+        print("reproducer written to %s" % directory)
+        return False
+    return True
+
+
+def cli(argv=None):
+    """
+    This function parses command line arguments and runs main.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Check optimised engines against the reference classifier on "
+                                                 "generated inputs.")
+    parser.add_argument('--seeds', type=int, default=20, metavar='N', help="inputs generated (default: 20)")
+    parser.add_argument('--first-seed', type=int, default=0, metavar='S', help="seed of first input (default: 0)")
+    parser.add_argument('--engines', metavar='NAME,...', help="engines checked (default: all of %s)" %
+                                                             ', '.join(ENGINES))
+    parser.add_argument('--users', type=int, default=120, metavar='N',
+                        help="users of generated inputs, varied per seed (default: 120)")
+    parser.add_argument('--batch-rows', type=int, default=300, metavar='N', help="batch payments (default: 300)")
+    parser.add_argument('--stream-rows', type=int, default=200, metavar='N', help="stream payments (default: 200)")
+    parser.add_argument('--reproducer', metavar='DIR',
+                        help="directory reproducer is written to (default: differential-<engine>)")
+    parser.add_argument('--max-tests', type=int, default=400, metavar='N',
+                        help="runs allowed to minimise a mismatch (default: 400)")
+    # options of antifraud.py shared by reference run and every engine
+    parser.add_argument('--adaptive-limits', action='store_true', help="see antifraud.py")
+    parser.add_argument('--trust-horizon', type=float, metavar='DAYS', help="see antifraud.py")
+    parser.add_argument('--allowed-lateness', type=int, metavar='SECONDS', help="see antifraud.py")
+    parser.add_argument('--learn-stream', action='store_true', help="see antifraud.py")
+    parser.add_argument('--detect-rings', action='store_true', help="see antifraud.py")
+    parser.add_argument('--velocity-limit', type=float, metavar='AMOUNT', help="see antifraud.py")
+    args = parser.parse_args(argv)
+    shared = {}
+    for option in ('adaptive_limits', 'allowed_lateness', 'learn_stream', 'detect_rings', 'velocity_limit'):
+        if getattr(args, option):
+            shared[option] = getattr(args, option)
+    if args.trust_horizon is not None:
+        shared['trust_horizon'] = int(args.trust_horizon * 86400)
+    agreed = main(args.seeds, args.first_seed, args.engines.split(',') if args.engines else None, args.users,
+                  args.batch_rows, args.stream_rows, args.reproducer, args.max_tests, shared)
+    sys.exit(0 if agreed else 1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,249 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    WRITE-AHEAD EDGE LOG: crash recovery of payment graph.
+    --------------------------------------------------------
+    State directory holds two files:
+
+        snapshot.bin - payment graph, user table and payment limits at the time of latest checkpoint.
+        edges.log    - append-only log of every change made after that checkpoint.
+
+    Log is a sequence of length-prefixed binary records, <length: uint32><type: 1 byte><fields>:
+
+        U  <uid: uint32><name: utf-8>               new interned user
+        E  <user1: uint32><user2: uint32><ts: int64> payment between two users
+        M  <amount: float64>                        new maximum allowed payment
+        A  <user: uint32><amount: float64>           payment amount added to payer's profile (adaptive limits only)
+        B                                           batch stage completed
+        G  <generation: uint64>                     first record: checkpoint the log was started by
+
+    Records are written with group commit: they are buffered and the log is flushed and fsync'ed once per
+    group_size records or group_interval seconds, whichever comes first, and on checkpoint and close.
+
+    Recovery loads snapshot and replays only the log written after it, so it takes time proportional to log tail.
+    Checkpoint folds current state into a new snapshot (written to a temporary file and renamed) and starts an
+    empty log. Replaying a record twice is not harmless (an A record would be counted twice in the profile), so every
+    checkpoint has a generation: snapshot stores it and the log started after it opens with a G record of it. A crash
+    after the snapshot is renamed but before the log is started again leaves a log of an older generation, which
+    recovery drops unread since the snapshot already holds it. A log without G record is of generation 0.
+    A torn record at the end of log (crash in the middle of a write) is ignored and cut off.
+"""
+
+import gc
+import os
+import pickle
+import struct
+import time
+
+LENGTH = struct.Struct('<I')
+USER = struct.Struct('<I')
+EDGE = struct.Struct('<IIq')
+MAXIMUM = struct.Struct('<d')
+AMOUNT = struct.Struct('<Id')
+GENERATION = struct.Struct('<Q')
+
+
+def write_snapshot(path, state):
+    """
+    This function writes state to a snapshot file: pickled into a temporary file, flushed to disk and renamed.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as snapshot:
+        pickle.dump(state, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+
+
+def read_snapshot(path):
+    """
+    This function returns state saved in a snapshot file, or None if there is none.
+    """
+    if not os.path.exists(path):
+        return None
+    # snapshot creates millions of containers that all live on: garbage collector passes would only slow loading
+    collect = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, 'rb') as snapshot:
+            return pickle.load(snapshot)
+    finally:
+        if collect:
+            gc.enable()
+
+
+class EdgeLog:
+    """
+    EdgeLog appends changes of payment graph to a write-ahead log and manages snapshots of state directory.
+    """
+    def __init__(self, directory, group_size=4096, group_interval=1.0):
+        """
+        initializes objects of class and opens log for appending.
+        :param directory: state directory, created if missing.
+        :param group_size: records written between two fsync calls.
+        :param group_interval: seconds allowed between two fsync calls while records are waiting.
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self.log_path = os.path.join(directory, 'edges.log')
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.buffer = bytearray()
+        self.waiting = 0                # records in buffer.
+        self.records = 0                # records in log since latest checkpoint.
+        self.generation = 0             # generation of latest checkpoint, set by load_snapshot.
+        self.last_commit = time.time()
+        self.log = open(self.log_path, 'ab')
+        if self.log.tell() == 0:
+            self.start()
+
+    # -----------------------------------------------
+    # Writing
+    # -----------------------------------------------
+    def append(self, kind, fields=b''):
+        """
+        This function buffers one record and commits the group if it is full or old enough.
+        """
+        self.buffer += LENGTH.pack(len(fields) + 1)
+        self.buffer += kind
+        self.buffer += fields
+        self.waiting += 1
+        self.records += 1
+        if self.waiting >= self.group_size or time.time() - self.last_commit >= self.group_interval:
+            self.commit()
+
+    def append_user(self, uid, name):
+        self.append(b'U', USER.pack(uid) + name.encode('utf-8'))
+
+    def append_edge(self, user1, user2, ts):
+        self.append(b'E', EDGE.pack(user1, user2, ts))
+
+    def append_maximum(self, amount):
+        self.append(b'M', MAXIMUM.pack(amount))
+
+    def append_amount(self, user, amount):
+        self.append(b'A', AMOUNT.pack(user, amount))
+
+    def append_batch_done(self):
+        self.append(b'B')
+
+    def start(self):
+        """
+        This function writes G record of current generation to an empty log and waits until it is on disk.
+        """
+        self.log.write(LENGTH.pack(1 + GENERATION.size) + b'G' + GENERATION.pack(self.generation))
+        self.log.flush()
+        os.fsync(self.log.fileno())
+
+    def commit(self):
+        """
+        This function writes buffered records to log and waits until they are on disk.
+        """
+        if self.buffer:
+            self.log.write(self.buffer)
+            self.log.flush()
+            os.fsync(self.log.fileno())
+            self.buffer = bytearray()
+            self.waiting = 0
+        self.last_commit = time.time()
+
+    def checkpoint(self, state):
+        """
+        This function folds log into a new snapshot of state and starts an empty log.
+        :param state: dictionary describing complete state, as returned by AntiFraud.state().
+        """
+        self.commit()
+        self.generation += 1
+        write_snapshot(self.snapshot_path, dict(state, log_generation=self.generation))
+        # snapshot now holds everything in log: a crash before the new log is started leaves an older generation
+        self.log.close()
+        self.log = open(self.log_path, 'wb')
+        self.start()
+        self.records = 0
+
+    def clear(self):
+        """
+        This function drops log and snapshot, e.g. when they hold a batch stage that never completed.
+        """
+        self.buffer = bytearray()
+        self.waiting = 0
+        self.records = 0
+        self.log.truncate(0)
+        self.log.seek(0)
+        self.start()
+        if os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+
+    def close(self):
+        """
+        This function commits waiting records and closes log.
+        """
+        self.commit()
+        self.log.close()
+
+    # -----------------------------------------------
+    # Recovery
+    # -----------------------------------------------
+    def load_snapshot(self):
+        """
+        This function returns state saved by latest checkpoint, or None if there is no snapshot, and takes its
+        generation.
+        """
+        state = read_snapshot(self.snapshot_path)
+        if state is not None:
+            self.generation = state.get('log_generation', 0)
+        return state
+
+    def replay(self):
+        """
+        This function yields (type, fields) of every complete record of log. A torn record at the end of log is cut
+        off so that new records are appended after the last complete one. A log older than the snapshot loaded
+        is already held by it: nothing is yielded and the log is started again.
+        """
+        self.commit()
+        with open(self.log_path, 'rb') as log:
+            data = log.read()
+        header = LENGTH.size + 1 + GENERATION.size
+        generation = 0
+        offset = 0
+        end = len(data)
+        started = data[LENGTH.size:LENGTH.size + 1] == b'G'
+        if started and end >= header:
+            generation = GENERATION.unpack_from(data, LENGTH.size + 1)[0]
+            offset = header
+        if generation < self.generation or end == 0 or (started and offset == 0):
+            # log folded into snapshot already, empty, or torn while being started: start it again
+            self.log.truncate(0)
+            self.log.seek(0)
+            self.start()
+            return
+        while offset + LENGTH.size <= end:
+            length = LENGTH.unpack_from(data, offset)[0]
+            start = offset + LENGTH.size
+            if length == 0 or start + length > end:
+                break
+            kind = data[start:start + 1]
+            body = start + 1
+            if kind == b'E':
+                yield kind, EDGE.unpack_from(data, body)
+            elif kind == b'U':
+                yield kind, (USER.unpack_from(data, body)[0],
+                             data[body + USER.size:start + length].decode('utf-8'))
+            elif kind == b'M':
+                yield kind, MAXIMUM.unpack_from(data, body)
+            elif kind == b'A':
+                yield kind, AMOUNT.unpack_from(data, body)
+            else:
+                yield kind, ()
+            offset = start + length
+            self.records += 1
+        if offset < end:
+            # torn record: truncate log to the last complete record
+            self.log.truncate(offset)
+            self.log.seek(offset)
@@ -0,0 +1,91 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    FEATURE ENGINE: outputs of core features declared as data.
+    ------------------------------------------------------------
+    Every output is a feature (name, max degree, sink): a payment is trusted by the feature if its two users are
+    connected by at most max degree over the payment network, and the verdict is written to sink.
+
+    Engine searches payment network once per payment, to the largest max degree of any feature, and derives every
+    output from the exact degree found. Adding or removing a feature never adds a search.
+
+    Lines written are the same as the original three outputs: "trusted " for a trusted payment, "unverified " if users
+    are connected within CORE_DEPTH (4) but further than max degree, "unverified" otherwise. Payments beyond
+    CORE_DEPTH are unverified in output4 whatever additional features trust them.
+
+    Trust score weighs a payment by the paths of degree 2 between its users (their common neighbours) instead of a
+    verdict per degree: a pair with fifty common friends is trusted more than a pair with one. It needs the degree
+    found by the one search and a count of common neighbours, never a second search.
+"""
+
+# Features of the challenge: output1.txt, output2.txt and output3.txt, in this order.
+CORE_FEATURES = (('feature1', 1), ('feature2', 2), ('feature3', 4))
+CORE_DEPTH = max(max_degree for _, max_degree in CORE_FEATURES)
+DIRECT_PATHS = 2    # a direct payment between two users weighs as much as this many common neighbours.
+
+
+def trust_score(degree, common):
+    """
+    This function scores trust of a payment between 0 and 1: every path between its users halves the remaining
+    distrust, 1 - 2 ** -(common + DIRECT_PATHS if users paid each other directly).
+    :param degree: degree of connection of payment, None if users are not connected within search depth.
+    :param common: number of common neighbours of users of payment.
+    """
+    paths = common + (DIRECT_PATHS if degree == 1 else 0)
+    return 1.0 - 0.5 ** paths
+
+
+class Feature:
+    """
+    Feature is one output of core features.
+    """
+    __slots__ = ('name', 'max_degree', 'sink')
+
+    def __init__(self, name, max_degree, sink):
+        """
+        initializes objects of class.
+        :param name: name of feature.
+        :param max_degree: largest degree of connection trusted by feature.
+        :param sink: file verdicts are written to.
+        """
+        self.name = name
+        self.max_degree = max_degree
+        self.sink = sink
+
+
+class FeatureEngine:
+    """
+    FeatureEngine writes verdict of every feature for the degree of connection of a payment.
+    """
+    def __init__(self, features):
+        """
+        initializes objects of class.
+        :param features: list of Feature.
+        """
+        self.features = list(features)
+        self.depth = max(feature.max_degree for feature in self.features)     # depth of the one search per payment.
+        self.sinks = [feature.sink for feature in self.features]
+
+        # lines[degree]: line written to every sink, lines[depth + 1] for users not connected within depth.
+        self.lines = []
+        for degree in range(self.depth + 2):
+            found = degree <= self.depth
+            self.lines.append(["trusted \n" if found and degree <= feature.max_degree else
+                               "unverified \n" if degree <= CORE_DEPTH else "unverified\n"
+                               for feature in self.features])
+        # payment to oneself (degree 0) counts as degree CORE_DEPTH, as the original if/elif ladder over degrees
+        # 1, 2 and < 5 did.
+        self.lines[0] = self.lines[min(CORE_DEPTH, self.depth)]
+
+    def write(self, degree):
+        """
+        This function writes verdict of every feature for a payment.
+        :param degree: degree of connection of payment, None if users are not connected within depth.
+        """
+        for sink, line in zip(self.sinks, self.lines[self.depth + 1 if degree is None else degree]):
+            sink.write(line)
@@ -0,0 +1,24 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    FILE SOURCE: identity of an input file that state built from it is keyed by.
+    -----------------------------------------------------------------------------
+    Graph store, snapshot and replay event file are rebuilt when the file they were built from changes. The file is
+    identified by path, size and modification time, without reading it. Kept apart so that a restart only checking
+    its state imports os and nothing else.
+"""
+
+import os
+
+
+def source_of(path):
+    """
+    This function identifies a file by path, size and modification time.
+    """
+    status = os.stat(path)
+    return os.path.abspath(path), status.st_size, status.st_mtime
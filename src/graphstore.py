@@ -0,0 +1,312 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    GRAPH STORE: payment graph partitioned on disk and loaded on demand.
+    ---------------------------------------------------------------------
+    Users are hash partitioned by their user id string. Store directory holds:
+
+        meta.bin       - number of partitions, maximum batch payment, the batch file the store was built from and the
+                         trust horizon it was compacted with.
+        part-NNNN.bin  - connections of every user of partition NNNN: {user: {connected user: timestamp}}.
+
+    Store is built once from batch_payment.txt in two passes that never hold the whole graph in memory: half edges are
+    appended to a spill file of the partition owning their source user, then every partition is deduplicated on its
+    own and written. meta.bin is written last, a store without it is incomplete and is built again. With a trust
+    horizon the store holds the edges the row by row batch stage leaves after its latest compaction.
+
+    LazyGraph serves a store with the interface of PaymentGraph. A partition is read the first time a search touches
+    one of its users and kept in an LRU page cache of cache_partitions partitions; the least recently used one is
+    dropped from memory when the cache is full. Startup does not read the graph at all, memory follows the users
+    searched by stream payments instead of total history. The store only ever holds the batch file it was built from:
+    a partition changed by edges learned from stream is written, when it is evicted, to a run directory of the store
+    (run-XXXX/) and read from there for the rest of the run. close() removes the run directory, so the next run starts
+    from the batch graph again.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+from collections import OrderedDict
+
+from filesource import source_of
+from paygraph import PaymentGraph
+
+SPILL_EDGES = 65536     # half edges buffered for a partition before they are appended to its spill file.
+
+
+def partition_of(name, partitions):
+    """
+    This function returns partition owning a user, stable across runs (str hash is randomised per process).
+    """
+    return zlib.crc32(name.encode('utf-8')) % partitions
+
+
+def partition_path(directory, partition, suffix='.bin'):
+    return os.path.join(directory, 'part-%04d%s' % (partition, suffix))
+
+
+def write_atomic(path, value):
+    """
+    This function pickles value into a temporary file and renames it to path.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as output:
+        pickle.dump(value, output, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def read_meta(directory):
+    """
+    This function returns meta data of a complete store, or None if there is none.
+    """
+    path = os.path.join(directory, 'meta.bin')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as meta:
+        return pickle.load(meta)
+
+
+def open_meta(directory, batchfile, horizon=None, compaction_interval=None):
+    """
+    This function returns meta data of store if it was built from batchfile as it is now and compacted the same way,
+    None otherwise.
+    """
+    meta = read_meta(directory)
+    if meta is None or meta['source'] != source_of(batchfile) or \
+            meta.get('compaction', (None, None)) != (horizon, compaction_interval):
+        return None
+    return meta
+
+
+def build_store(directory, batchfile, payments, partitions=1024, horizon=None, compaction_interval=None):
+    """
+    This function builds a partitioned graph store.
+    :param directory: store directory, created if missing.
+    :param batchfile: batch file payments are read from, recorded so a changed file causes a rebuild.
+    :param payments: iterable of (timestamp, user1 id, user2 id, amount) of batch payments.
+    :param partitions: number of partitions.
+    :param horizon: seconds an edge stays trusted, None to trust forever.
+    :param compaction_interval: seconds of payment time between two compactions of payment graph.
+
+    :return:
+        meta: meta data of the new store.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    meta_path = os.path.join(directory, 'meta.bin')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    # Pass 1: spill half edges to the partition owning their source user
+    spills = [partition_path(directory, partition, '.edges') for partition in range(partitions)]
+    for path in spills:
+        open(path, 'wb').close()
+    pending = [[] for _ in range(partitions)]
+    max_allowed_payment = 0
+    # compactions of batch stage so far, its latest time and edges it trusts
+    compactions, last_compaction, since = 0, None, None
+
+    def spill(partition):
+        with open(spills[partition], 'ab') as output:
+            pickle.dump(pending[partition], output, protocol=pickle.HIGHEST_PROTOCOL)
+        pending[partition] = []
+
+    for timestamp, user1, user2, amount in payments:
+        if amount > max_allowed_payment:
+            max_allowed_payment = amount
+        if user1 != user2:
+            for source, target in ((user1, user2), (user2, user1)):
+                partition = partition_of(source, partitions)
+                pending[partition].append((source, target, timestamp, compactions))
+                if len(pending[partition]) >= SPILL_EDGES:
+                    spill(partition)
+        # same schedule as PaymentGraph.maybe_compact, after the payment's own edge is added
+        if horizon is not None:
+            if last_compaction is None:
+                last_compaction = timestamp
+            elif timestamp - last_compaction >= compaction_interval:
+                compactions, last_compaction, since = compactions + 1, timestamp, timestamp - horizon
+    for partition in range(partitions):
+        if pending[partition]:
+            spill(partition)
+
+    # Pass 2: deduplicate every partition on its own, keeping latest payment between two users. Latest compaction
+    # dropped edges whose payments before it are all stale; payments after it add their edge again, however old.
+    users = 0
+    for partition in range(partitions):
+        adjacency = {}
+        with open(spills[partition], 'rb') as spilled:
+            while True:
+                try:
+                    edges = pickle.load(spilled)
+                except EOFError:
+                    break
+                for source, target, timestamp, compacted in edges:
+                    if compacted < compactions and timestamp < since:
+                        continue
+                    connections = adjacency.get(source)
+                    if connections is None:
+                        adjacency[source] = {target: timestamp}
+                    elif timestamp > connections.get(target, timestamp - 1):
+                        connections[target] = timestamp
+        write_atomic(partition_path(directory, partition), adjacency)
+        os.remove(spills[partition])
+        users += len(adjacency)
+
+    meta = {'partitions': partitions, 'max_allowed_payment': max_allowed_payment, 'users': users,
+            'source': source_of(batchfile), 'compaction': (horizon, compaction_interval),
+            'last_compaction': last_compaction}
+    write_atomic(meta_path, meta)
+    return meta
+
+
+class LazyGraph(PaymentGraph):
+    """
+    LazyGraph is a payment graph whose partitions are read from a graph store when a search first needs them.
+    adjacency holds only users of partitions in page cache.
+    """
+    def __init__(self, directory, users, meta, cache_partitions=1024, horizon=None, compaction_interval=None):
+        """
+        initializes objects of class.
+        :param directory: store directory.
+        :param users: UserTable interning user ids of loaded partitions.
+        :param meta: meta data of store, as returned by build_store or open_meta.
+        :param cache_partitions: partitions kept in memory.
+        :param horizon: seconds an edge stays trusted, None to trust forever.
+        :param compaction_interval: seconds of payment time between two compactions.
+        """
+        PaymentGraph.__init__(self, horizon=horizon, compaction_interval=compaction_interval)
+        self.directory = directory
+        self.users = users
+        self.partitions = meta['partitions']
+        self.cache_partitions = max(cache_partitions, 1)
+        self.cache = OrderedDict()      # partition to set of its users in adjacency, least recently used first.
+        self.dirty = set()              # cached partitions changed since they were read.
+        self.owner = {}                 # user of a cached partition to its partition.
+        self.loads = 0
+        self.evictions = 0
+        self.last_compaction = meta.get('last_compaction')
+        # stream compactions reach partitions that are not cached when they are read: edges last seen before
+        # compacted_since are dropped from a partition unless it was written back after latest compaction.
+        self.compacted_since = None
+        self.written = {}               # partition to compacted_since when it was written to run directory.
+        self.run_dir = None             # directory of partitions changed during this run, created on first write.
+
+    def __contains__(self, user):
+        self.load(user)
+        return user in self.adjacency
+
+    def load(self, user):
+        """
+        This function makes sure partition owning user is in page cache.
+
+        :return:
+            partition: partition owning user.
+        """
+        partition = self.owner.get(user)
+        if partition is None:
+            partition = partition_of(self.users.name(user), self.partitions)
+        if partition in self.cache:
+            self.cache.move_to_end(partition)
+            return partition
+        owned = set()
+        directory = self.run_dir if partition in self.written else self.directory
+        with open(partition_path(directory, partition), 'rb') as stored:
+            intern = self.users.intern
+            since = self.compacted_since
+            if since is not None and self.written.get(partition) == since:
+                since = None
+            for name, connections in pickle.load(stored).items():
+                source = intern(name)
+                self.adjacency[source] = dict((intern(target), seen) for target, seen in connections.items()
+                                              if since is None or seen >= since)
+                owned.add(source)
+                self.owner[source] = partition
+        self.cache[partition] = owned
+        self.loads += 1
+        while len(self.cache) > self.cache_partitions:
+            self.evict()
+        return partition
+
+    def evict(self):
+        """
+        This function drops least recently used partition from memory, writing it back first if it changed.
+        """
+        partition, owned = self.cache.popitem(last=False)
+        if partition in self.dirty:
+            self.write(partition, owned)
+        for user in owned:
+            self.adjacency.pop(user, None)
+            self.owner.pop(user, None)
+        self.evictions += 1
+
+    def write(self, partition, owned):
+        """
+        This function writes connections of users of a cached partition to run directory, never to store itself.
+        """
+        name = self.users.name
+        stored = {}
+        for user in owned:
+            connections = self.adjacency.get(user)
+            if connections:
+                stored[name(user)] = dict((name(target), seen) for target, seen in connections.items())
+        if self.run_dir is None:
+            self.run_dir = tempfile.mkdtemp(prefix='run-', dir=self.directory)
+        write_atomic(partition_path(self.run_dir, partition), stored)
+        self.dirty.discard(partition)
+        self.written[partition] = self.compacted_since
+
+    def flush(self):
+        """
+        This function writes every changed partition to run directory.
+        """
+        for partition in list(self.dirty):
+            self.write(partition, self.cache[partition])
+
+    def close(self):
+        """
+        This function drops partitions changed during this run: store is left as batch stage built it.
+        """
+        if self.run_dir is not None:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+            self.run_dir = None
+
+    def compact(self, now):
+        """
+        This function drops stale edges of cached partitions; other partitions drop them when they are read.
+        """
+        since = self.live_since(now)
+        if since is not None:
+            self.compacted_since = since
+        return PaymentGraph.compact(self, now)
+
+    def add_half_edge(self, source, target, ts):
+        """
+        This function connects source to target in partition owning source, reading it first if needed.
+        """
+        partition = self.load(source)
+        self.cache[partition].add(source)
+        self.owner[source] = partition
+        self.dirty.add(partition)
+        return PaymentGraph.add_half_edge(self, source, target, ts)
+
+    def neighbours(self, user, since=None):
+        """
+        This function returns users connected to user, reading partition owning user first if needed.
+        """
+        connections = self.adjacency.get(user)
+        if connections is None:
+            self.load(user)
+            return PaymentGraph.neighbours(self, user, since)
+        # user is cached: only mark its partition as recently used
+        self.cache.move_to_end(self.owner[user])
+        if since is None:
+            return connections
+        return [target for target, seen in connections.items() if seen >= since]
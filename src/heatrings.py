@@ -0,0 +1,117 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    FRAUD RINGS: triangles of the payment heat graph.
+    ---------------------------------------------------
+    A small group of users passing money around among themselves inside the 60 seconds window shows up in the heat
+    graph as a dense subgraph, its smallest building block is a triangle: three users that all paid each other.
+
+    RingDetector keeps triangle counts of the heat graph incrementally:
+
+        support[edge]   - triangles the edge is part of.
+        triangles[user] - triangles the user is part of.
+
+    When an edge appears in the heat graph (first payment between two users in the window) its triangles are the
+    common connections of its two users; when it expires they are removed again. Both take time proportional to the
+    smaller degree of the two users (set intersection iterates the smaller set).
+    A payment closes a ring if its edge is part of at least one triangle.
+
+    Users paying many others in the window (hubs) would make every update expensive: an edge whose two users both have
+    more than degree_cap connections is not tracked. Its triangles are missed, but such payments are already reported
+    by the fan-out check of check_if_suspicious.
+"""
+
+
+def edge_key(user1, user2):
+    """
+    This function returns key of an undirected edge.
+    """
+    return (user1, user2) if user1 < user2 else (user2, user1)
+
+
+class RingDetector:
+    """
+    RingDetector maintains triangle counts of the heat graph as its edges appear and expire.
+    """
+    def __init__(self, degree_cap=50):
+        """
+        initializes objects of class.
+        :param degree_cap: an edge is not tracked if both its users have more connections than this in heat graph.
+        """
+        self.degree_cap = degree_cap
+        self.tracked = {}           # dictionary of user to set of connected users, tracked edges only.
+        self.support = {}           # dictionary of edge key to number of triangles through the edge.
+        self.triangles = {}         # dictionary of user to number of triangles through the user.
+        self.total = 0              # triangles in heat graph.
+        self.untracked = 0          # edges skipped because of degree cap.
+        self.rings = 0              # payments reported as closing a ring.
+
+    def edge_added(self, user1, user2, degree1, degree2):
+        """
+        This function adds triangles closed by a new edge of heat graph.
+        :param user1, user2: users of the edge.
+        :param degree1, degree2: connections of user1 and user2 in heat graph, including the new edge.
+        """
+        if degree1 > self.degree_cap and degree2 > self.degree_cap:
+            self.untracked += 1
+            return
+        connected1 = self.tracked.setdefault(user1, set())
+        connected2 = self.tracked.setdefault(user2, set())
+        common = connected1 & connected2
+        if common:
+            for user in common:
+                self.count_triangle(user1, user2, user, 1)
+            self.support[edge_key(user1, user2)] = len(common)
+        connected1.add(user2)
+        connected2.add(user1)
+
+    def edge_removed(self, user1, user2):
+        """
+        This function removes triangles of an edge that expired from heat graph.
+        :param user1, user2: users of the edge.
+        """
+        connected1 = self.tracked.get(user1)
+        if connected1 is None or user2 not in connected1:
+            return
+        connected2 = self.tracked[user2]
+        connected1.discard(user2)
+        connected2.discard(user1)
+        for user in connected1 & connected2:
+            self.count_triangle(user1, user2, user, -1)
+        self.support.pop(edge_key(user1, user2), None)
+        for user in (user1, user2):
+            if not self.tracked[user]:
+                self.tracked.pop(user)
+
+    def count_triangle(self, user1, user2, user3, change):
+        """
+        This function adds (change=1) or removes (change=-1) triangle user1, user2, user3. Support of edge
+        user1-user2 is set by the caller.
+        """
+        for edge in (edge_key(user1, user3), edge_key(user2, user3)):
+            support = self.support[edge] + change if edge in self.support else change
+            if support:
+                self.support[edge] = support
+            else:
+                self.support.pop(edge)
+        for user in (user1, user2, user3):
+            triangles = self.triangles.get(user, 0) + change
+            if triangles:
+                self.triangles[user] = triangles
+            else:
+                self.triangles.pop(user)
+        self.total += change
+
+    def closes_ring(self, user1, user2):
+        """
+        This function checks if edge between user1 and user2 is part of a triangle of heat graph.
+
+        :return:
+            number of triangles through the edge, 0 if it is not part of a ring.
+        """
+        return self.support.get(edge_key(user1, user2), 0)
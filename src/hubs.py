@@ -0,0 +1,212 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    HUB-AWARE SEARCH: degree of connection without expanding hubs.
+    ----------------------------------------------------------------
+    A few merchant-like users (hubs) are connected to tens of thousands of users. A degree search reaching one of them
+    puts all its connections in the next level and explodes. HubSearch finds the same degree without ever expanding
+    a hub it reaches:
+
+        1. users with at least hub_degree connections are hubs. Their connections are kept as sets, so "is X
+           connected to hub H" is O(1), and every user knows the hubs it is connected to.
+        2. distance between every two hubs, up to max_depth, is computed once when index is built.
+        3. search from payer goes level by level as PaymentGraph.degree does, but a hub it reaches is only recorded
+           with its depth (a terminal meeting point) and never expanded. Degree found this way is the shortest
+           connection that does not pass through a hub.
+        4. if payer reached hubs early enough to do better, the same hub-free search is done from payee, and every
+           pair of hubs H1 (reached from payer) and H2 (reached from payee) gives a connection of degree
+           depth(payer, H1) + distance(H1, H2) + depth(H2, payee).
+
+    Shortest connection through hubs is found in 4: its first hub is reached from payer without passing another hub,
+    its last hub likewise from payee. A payer (or payee) that is a hub is its own first (last) hub at depth 0; search
+    then starts from the other user. Result is exactly the degree PaymentGraph.degree finds.
+
+    Index is built from the graph as it is after batch stage: edges added later, or trusted only for a while (trust
+    horizon), are not supported.
+"""
+
+import heapq
+
+
+class HubSearch:
+    """
+    HubSearch answers degree of connection queries of a payment graph treating hubs as terminal meeting points.
+    """
+    def __init__(self, graph, users, hub_degree=1000, max_depth=4):
+        """
+        initializes objects of class and builds hub index.
+        :param graph: PaymentGraph built by batch stage.
+        :param users: number of interned users.
+        :param hub_degree: users with at least this many connections are hubs.
+        :param max_depth: largest depth of searches.
+        """
+        self.graph = graph
+        self.hub_degree = hub_degree
+        self.max_depth = max_depth
+        self.visits = 0             # users reached by latest degree search, payer not counted.
+
+        # connections of every hub, and hubs every user is connected to
+        self.hubs = {}
+        self.hubs_of = {}
+        for user in range(users):
+            connections = graph.neighbours(user)
+            if len(connections) >= hub_degree:
+                self.hubs[user] = frozenset(connections)
+                for connected in connections:
+                    self.hubs_of.setdefault(connected, []).append(user)
+
+        # distances between hubs: first without passing other hubs (up to max_depth - 1), then through them (Dijkstra
+        # over hubs, up to max_depth)
+        direct = dict((hub, self.hub_free_distances(hub, max_depth - 1)) for hub in self.hubs)
+        limit = max_depth
+        self.distances = {}
+        for hub in self.hubs:
+            distances = {hub: 0}
+            heap = [(0, hub)]
+            while heap:
+                distance, current = heapq.heappop(heap)
+                if distance > distances[current]:
+                    continue
+                for other, step in direct[current].items():
+                    if distance + step < distances.get(other, limit + 1):
+                        distances[other] = distance + step
+                        heapq.heappush(heap, (distance + step, other))
+            self.distances[hub] = distances
+
+    def connections(self, user):
+        """
+        This function returns connections of user, as a set for a hub.
+        """
+        hub = self.hubs.get(user)
+        return self.graph.neighbours(user) if hub is None else hub
+
+    def hub_free_distances(self, hub, limit):
+        """
+        This function returns distances from hub to other hubs up to limit, over connections not passing a hub.
+        Users of the last level are not expanded: hubs connected to them are known from index.
+        """
+        hubs = self.hubs
+        visited = {hub}
+        reached = {}
+        frontier = [hub]
+        for depth in range(1, limit + 1):
+            next_frontier = []
+            for user in frontier:
+                if depth == limit:
+                    for other in self.hubs_of.get(user, ()):
+                        if other != hub and other not in reached:
+                            reached[other] = depth
+                    continue
+                for connected in self.connections(user):
+                    if connected not in visited:
+                        visited.add(connected)
+                        if connected in hubs:
+                            reached[connected] = depth
+                        else:
+                            next_frontier.append(connected)
+            frontier = next_frontier
+        return reached
+
+    def hub_free_search(self, start, max_depth, target=None):
+        """
+        This function searches graph level by level from start, hubs are reached but not expanded.
+        :param start: user search starts from, not a hub.
+        :param max_depth: depth of search.
+        :param target: user search stops at, None to search whole depth.
+
+        :return:
+            (depth target was reached at or None, dictionary of hubs reached to their depth, visited users to depth)
+        """
+        hubs = self.hubs
+        visited = {start: 0}
+        reached = {}
+        frontier = [start]
+        found = None
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for user in frontier:
+                connections = self.graph.neighbours(user)
+                if target is not None and target in connections:
+                    found = depth
+                    break
+                for connected in connections:
+                    if connected not in visited:
+                        visited[connected] = depth
+                        if connected in hubs:
+                            reached[connected] = depth
+                        elif depth < max_depth:
+                            next_frontier.append(connected)
+            if found is not None or not next_frontier:
+                break
+            frontier = next_frontier
+        return found, reached, visited
+
+    def meet(self, hub1, hub2, max_depth):
+        """
+        This function checks if two hubs are connected by exactly max_depth over users that are not hubs: hub
+        distances only follow such connections up to max_depth - 1.
+        """
+        half = max_depth // 2
+        reached = {}
+        for connected in self.hubs[hub1]:
+            if connected not in self.hubs:
+                for user, depth in self.hub_free_search(connected, half - 1)[2].items():
+                    if depth + 1 < reached.get(user, max_depth):
+                        reached[user] = depth + 1
+        self.visits += len(reached)
+        for connected in self.hubs[hub2]:
+            if connected not in self.hubs:
+                for user, depth in self.hub_free_search(connected, max_depth - half - 1)[2].items():
+                    if reached.get(user, max_depth) + depth + 1 <= max_depth:
+                        return True
+        return False
+
+    def degree(self, root_user, target_user, since=None, max_depth=4):
+        """
+        This function finds degree of connection between root_user and target_user, same as PaymentGraph.degree.
+        :param root_user: user making payment.
+        :param target_user: user receiving payment.
+        :param since: oldest trusted timestamp, must be None.
+        :param max_depth: depth of search, at most max_depth of index.
+
+        :return:
+            degree of connection, or None if users are not connected within max_depth.
+        """
+        self.visits = 0
+        if root_user == target_user:
+            return 0
+        hubs = self.hubs
+        if root_user in hubs:
+            if target_user in hubs:
+                # payment between two hubs: their distance, or a connection of max_depth not passing a hub
+                distance = self.distances[root_user].get(target_user)
+                if distance is None and self.meet(root_user, target_user, max_depth):
+                    distance = max_depth
+                return distance
+            # connections are undirected: search from user that is not a hub
+            root_user, target_user = target_user, root_user
+
+        found, forward, visited = self.hub_free_search(root_user, max_depth, target_user)
+        self.visits = len(visited) - 1
+
+        # a connection through hubs must be shorter than the one found without them
+        limit = max_depth if found is None else found - 1
+        if forward and min(forward.values()) < limit:
+            if target_user in hubs:
+                backward = {target_user: 0}
+            else:
+                _, backward, visited = self.hub_free_search(target_user, limit - min(forward.values()))
+                self.visits += len(visited) - 1
+            for hub, depth in forward.items():
+                distances = self.distances[hub]
+                for other, other_depth in backward.items():
+                    distance = distances.get(other)
+                    if distance is not None and depth + distance + other_depth <= limit:
+                        limit = depth + distance + other_depth
+                        found = limit
+        return found
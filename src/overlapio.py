@@ -0,0 +1,157 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    OVERLAPPED I/O: stream stage reading and writing in background threads.
+    -------------------------------------------------------------------------
+    A reader thread reads stream file through a large buffer, splits it into csv rows and parses the fields of every
+    row (timestamp, user id strings, amount) into blocks (or takes payments of a binary payment file), handed to the
+    classifier over a bounded queue. The classifier only interns users and classifies. Outputs written by the
+    classifier are only appended to in-memory chunks; when the classifier moves on to the next block, chunks of
+    every output are handed to a writer thread over a second bounded queue.
+
+        reader thread --(blocks of parsed rows)--> classifier --(chunks of lines)--> writer thread
+
+    There is a single writer thread and chunks are queued in the order they were written, so every output file gets
+    its lines in the same order as without overlap. Threads wait on I/O without holding the GIL: while the file
+    system is slow to answer, the classifier keeps running.
+"""
+
+import queue
+import threading
+from itertools import islice
+
+BUFFER_BYTES = 1 << 20      # buffer of stream and output files, one system call per megabyte.
+
+
+class ChunkSink:
+    """
+    ChunkSink collects lines written to an output file until the pipeline hands them to the writer thread.
+    """
+    def __init__(self, output):
+        """
+        initializes objects of class.
+        :param output: file lines are written to.
+        """
+        self.output = output
+        self.lines = []
+        self.write = self.lines.append
+
+
+class ParsedRow:
+    """
+    ParsedRow is a row of stream file with its fields, parsed by reader thread.
+    """
+    __slots__ = ('row', 'fields', 'error')
+
+    def __init__(self, row, parse):
+        """
+        initializes objects of class.
+        :param row: row of stream file.
+        :param parse: function of row returning its fields; IndexError or ValueError it raises is kept in error and
+                      raised again by the classifier, which skips the row as it would skip it unparsed.
+        """
+        self.row = row
+        self.fields = None
+        self.error = None
+        try:
+            self.fields = parse(row)
+        except (IndexError, ValueError) as error:
+            self.error = error
+
+
+class OverlappedIO:
+    """
+    OverlappedIO runs reader and writer threads of the stream stage.
+    """
+    def __init__(self, rows, outputs, parse=None, block_rows=8192, queue_blocks=8):
+        """
+        initializes objects of class and starts threads.
+        :param rows: iterator of rows of stream file, e.g. csv.reader of stream file positioned after its header.
+        :param outputs: output files.
+        :param parse: function of a row returning its fields, run by reader thread; rows are then handed over as
+                      ParsedRow. None to hand rows over as they are.
+        :param block_rows: rows parsed by reader thread per block.
+        :param queue_blocks: blocks (and chunks) queued at most between threads.
+        """
+        self.parse = parse
+        self.block_rows = block_rows
+        self.blocks = queue.Queue(queue_blocks)
+        self.chunks = queue.Queue(queue_blocks * len(outputs))
+        self.sinks = [ChunkSink(output) for output in outputs]
+        self.error = None           # first error of writer thread, raised by close.
+        self.reader = threading.Thread(target=self.read, args=(rows,), daemon=True)
+        self.writer = threading.Thread(target=self.write, daemon=True)
+        self.reader.start()
+        self.writer.start()
+
+    def read(self, rows):
+        """
+        This function is reader thread: it queues blocks of rows, parsed if a parse function was given, an empty block
+        at end of stream.
+        """
+        parse = self.parse
+        try:
+            while True:
+                block = list(islice(rows, self.block_rows))
+                if parse is not None:
+                    block = [ParsedRow(row, parse) for row in block]
+                self.blocks.put(block)
+                if not block:
+                    return
+        except Exception as error:
+            self.blocks.put(error)
+
+    def rows(self):
+        """
+        This function yields rows of stream in order. Lines written while a block is classified are handed to writer
+        thread before the next block is taken.
+        """
+        while True:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            for row in block:
+                yield row
+            self.flush()
+            if not block:
+                return
+
+    def flush(self):
+        """
+        This function hands lines collected by every sink to writer thread.
+        """
+        for sink in self.sinks:
+            if sink.lines:
+                self.chunks.put((sink.output, ''.join(sink.lines)))
+                sink.lines.clear()
+
+    def write(self):
+        """
+        This function is writer thread: it writes chunks in the order they were queued until None is queued.
+        """
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            if self.error is None:
+                output, text = chunk
+                try:
+                    output.write(text)
+                except Exception as error:
+                    self.error = error
+
+    def close(self):
+        """
+        This function writes lines still collected and waits for writer thread to finish.
+        """
+        self.flush()
+        self.chunks.put(None)
+        self.writer.join()
+        self.reader.join()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,252 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    BINARY PAYMENT FILES: payments in columns, read through a memory map.
+    -----------------------------------------------------------------------
+    A text payment file is parsed field by field on every run: padded spaces stripped, timestamps parsed with strptime,
+    long messages read and thrown away. A binary payment file holds the same valid rows already parsed, one column per
+    field (all numbers little-endian, every section starting at a multiple of 8 bytes):
+
+        header      magic, rows, amount scale, flags, size of user ids and of messages
+        user ids    user id strings joined by newlines, in order of first appearance
+        timestamps  int64 per row, seconds as AntiFraud.parse_fields converts them (local time of conversion)
+        user1/user2 uint32 per row, index into user ids
+        amounts     int64 per row, fixed point: amount * 10 ** scale, scale is the most decimals of any amount
+        messages    optional: int64 offsets (rows + 1) into utf-8 text of all messages
+
+    Readers map the file and cast its sections to memoryviews, so nothing is parsed or copied before payments are
+    used. Users are interned once per user id, not once per row. An amount converts back to exactly the float
+    float() gives for its text, so every output is the same as for the text file. Rows AntiFraud skips (bad
+    timestamp, missing field, ...) are dropped by the converter.
+
+    AntiFraud reads binary payment files in batch and stream stages whenever a file starts with MAGIC.
+
+    Usage: python src/payfile.py batch_payment.txt batch_payment.pay [--no-messages]
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from payment import Payment, UserTable
+
+MAGIC = b'PAYCOL1\n'
+HEADER = struct.Struct('<8sQIIQQ')     # magic, rows, scale, flags, size of user ids, size of messages
+MESSAGES = 1                            # flag: file has messages column
+MAX_SCALE = 9
+MAX_FIXED = 1 << 53                     # larger fixed point amounts do not convert back to float exactly
+
+
+def aligned(offset):
+    """
+    This function rounds offset up to a multiple of 8 bytes.
+    """
+    return (offset + 7) & ~7
+
+
+def is_payment_file(path):
+    """
+    This function checks if path is a binary payment file.
+    """
+    with open(path, 'rb') as payments:
+        return payments.read(len(MAGIC)) == MAGIC
+
+
+class PaymentColumns:
+    """
+    PaymentColumns is a binary payment file mapped into memory, its columns as memoryviews.
+    """
+    def __init__(self, path):
+        """
+        initializes objects of class and maps file.
+        :param path: binary payment file.
+        """
+        if sys.byteorder != 'little':
+            raise ValueError("binary payment files can only be read on little-endian machines")
+        with open(path, 'rb') as payments:
+            self.map = mmap.mmap(payments.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, self.scale, flags, names_size, messages_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError("%s is not a binary payment file" % path)
+        self.rows = rows
+        view = memoryview(self.map)
+        self.views = [view]
+        offset = HEADER.size
+        names = bytes(view[offset:offset + names_size]).decode('utf-8')
+        self.names = names.split('\n') if rows else []
+        offset = aligned(offset + names_size)
+
+        def column(fmt, width):
+            nonlocal offset
+            section = view[offset:offset + rows * width].cast(fmt)
+            self.views.append(section)
+            offset += rows * width
+            return section
+
+        self.timestamps = column('q', 8)
+        self.user1 = column('I', 4)
+        self.user2 = column('I', 4)
+        self.amounts = column('q', 8)
+        self.message_offsets = None
+        self.messages = None
+        if flags & MESSAGES:
+            rows += 1
+            self.message_offsets = column('q', 8)
+            self.messages = view[offset:offset + messages_size]
+            self.views.append(self.messages)
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        This function releases columns and unmaps file.
+        """
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.map.close()
+
+    def amount(self, row):
+        """
+        This function returns amount of row as float.
+        """
+        return self.amounts[row] / 10 ** self.scale
+
+    def message(self, row):
+        """
+        This function returns message of row, None if file has no messages.
+        """
+        if self.messages is None:
+            return None
+        return bytes(self.messages[self.message_offsets[row]:self.message_offsets[row + 1]]).decode('utf-8')
+
+    def payments(self, users):
+        """
+        This function interns users of file and returns payments of every row.
+        :param users: UserTable users are interned into, once per user id, in order of first appearance.
+
+        :return:
+            iterator of Payment records.
+        """
+        uids = [users.intern(name) for name in self.names]
+        divisor = 10 ** self.scale
+
+        def rows():
+            for timestamp, user1, user2, amount in zip(self.timestamps, self.user1, self.user2, self.amounts):
+                yield Payment(timestamp, uids[user1], uids[user2], amount / divisor)
+        return rows()
+
+    def fields(self):
+        """
+        This function yields fields of every row as AntiFraud.parse_fields returns them.
+        """
+        names = self.names
+        divisor = 10 ** self.scale
+        for timestamp, user1, user2, amount in zip(self.timestamps, self.user1, self.user2, self.amounts):
+            yield timestamp, names[user1], names[user2], amount / divisor
+
+
+def convert(textfile, path, messages=True):
+    """
+    This function converts a text payment file into a binary payment file.
+    :param textfile: payment file with header line and rows "time, id1, id2, amount, message".
+    :param path: binary payment file written.
+    :param messages: if False, messages are not stored.
+
+    :return:
+        (rows converted, rows skipped)
+    """
+    import csv
+    from decimal import Decimal, InvalidOperation
+    # imported here: antifraud reads binary payment files through this module.
+    from antifraud import AntiFraud
+
+    users = UserTable()
+    timestamps, user1, user2 = array('q'), array('I'), array('I')
+    amounts = []
+    texts = []
+    skipped = 0
+    with open(textfile, 'r') as payments:
+        payments.readline()  # Column names
+        for row in csv.reader(payments):
+            try:
+                timestamp, name1, name2, _ = AntiFraud.parse_fields(row)
+                amount = Decimal(row[3].strip())
+            except (IndexError, ValueError, InvalidOperation):
+                skipped += 1
+                continue
+            if not amount.is_finite():
+                raise ValueError("amount %r can not be stored as fixed point" % row[3].strip())
+            timestamps.append(timestamp)
+            user1.append(users.intern(name1))
+            user2.append(users.intern(name2))
+            amounts.append(amount)
+            if messages:
+                texts.append(','.join(row[4:]).strip())
+
+    scale = max([0] + [-amount.as_tuple().exponent for amount in amounts])
+    if scale > MAX_SCALE:
+        raise ValueError("amounts have more than %d decimals" % MAX_SCALE)
+    fixed = array('q')
+    for amount in amounts:
+        value = int(amount.scaleb(scale))
+        if abs(value) >= MAX_FIXED:
+            raise ValueError("amount %s can not be stored as fixed point" % amount)
+        fixed.append(value)
+
+    names = '\n'.join(users.names).encode('utf-8')
+    message_offsets, message_bytes = array('q', [0]), []
+    for text in texts:
+        message_bytes.append(text.encode('utf-8'))
+        message_offsets.append(message_offsets[-1] + len(message_bytes[-1]))
+    message_bytes = b''.join(message_bytes)
+
+    with open(path + '.tmp', 'wb') as output:
+        output.write(HEADER.pack(MAGIC, len(timestamps), scale, MESSAGES if messages else 0, len(names),
+                                 len(message_bytes)))
+        output.write(names)
+        output.write(b'\0' * (aligned(HEADER.size + len(names)) - HEADER.size - len(names)))
+        for column in (timestamps, user1, user2, fixed):
+            if sys.byteorder != 'little':
+                column.byteswap()
+            column.tofile(output)
+        if messages:
+            if sys.byteorder != 'little':
+                message_offsets.byteswap()
+            message_offsets.tofile(output)
+            output.write(message_bytes)
+    os.replace(path + '.tmp', path)
+    return len(timestamps), skipped
+
+
+def cli(argv=None):
+    """
+    This function parses command line arguments and converts a text payment file.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert a text payment file into a binary payment file.")
+    parser.add_argument('textfile')
+    parser.add_argument('output')
+    parser.add_argument('--no-messages', action='store_true', help="do not store messages column")
+    args = parser.parse_args(argv)
+    rows, skipped = convert(args.textfile, args.output, messages=not args.no_messages)
+    sys.stderr.write("%s: %d payments converted, %d rows skipped\n" % (args.output, rows, skipped))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,273 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    PAYMENT GRAPH: time-aware edge store used by core features.
+    ------------------------------------------------------------
+    Every edge of the payment graph remembers when two users last paid each other. With a trust horizon set, an edge
+    that was last seen before (time of payment - horizon) is stale: searches do not traverse it and compaction drops
+    it from the graph. Graph size and search cost are then bounded by recent activity instead of total history.
+
+    Without a trust horizon every edge is trusted forever, same as the original payment graph.
+
+    Common neighbours of two users (distinct paths of degree 2 between them) are counted by intersecting their
+    connections: the smaller dictionary is walked and looked up in the larger, O(smaller degree). Connections are
+    kept up to date as edges are added, so counts need no index of their own and no search.
+"""
+
+
+class PaymentGraph:
+    """
+    PaymentGraph is an undirected graph of interned user ids.
+    adjacency: dictionary of user to dictionary of connected user and timestamp of their latest payment.
+    """
+    def __init__(self, horizon=None, compaction_interval=None):
+        """
+        initializes objects of class.
+        :param horizon: seconds an edge stays trusted after latest payment between its users, None to trust forever.
+        :param compaction_interval: seconds of payment time between two automatic compactions,
+                                    defaults to a tenth of the horizon.
+        """
+        self.adjacency = {}
+        self.horizon = horizon
+        if compaction_interval is None and horizon is not None:
+            compaction_interval = max(horizon // 10, 1)
+        self.compaction_interval = compaction_interval
+        self.last_compaction = None     # payment time of latest compaction.
+        self.visits = 0                 # users reached by latest degree search, payer not counted.
+
+    def __contains__(self, user):
+        return user in self.adjacency
+
+    def __len__(self):
+        return len(self.adjacency)
+
+    def edge_count(self):
+        """
+        This function returns number of undirected edges in graph.
+        """
+        return sum(len(connections) for connections in self.adjacency.values()) // 2
+
+    def add_edge(self, user1, user2, ts):
+        """
+        This function adds an edge between user1 and user2, or refreshes the time it was last seen.
+        :param user1: user making the payment
+        :param user2: user receiving the payment
+        :param ts: timestamp of payment
+
+        :return:
+            True if edge is new to the graph.
+        """
+        if user1 == user2:
+            return False
+        # edges are undirected: connect user1 to user2 and user2 to user1.
+        new = self.add_half_edge(user1, user2, ts)
+        self.add_half_edge(user2, user1, ts)
+        return new
+
+    def add_half_edge(self, source, target, ts):
+        """
+        This function connects source to target only. A graph partition holds half edges of the users it owns.
+        :param source: user whose connections are updated
+        :param target: user connected to source
+        :param ts: timestamp of payment
+
+        :return:
+            True if target is a new connection of source.
+        """
+        connections = self.adjacency.get(source)
+        if connections is None:
+            # add source to payment graph
+            self.adjacency[source] = {target: ts}
+            return True
+        seen = connections.get(target)
+        if seen is None:
+            connections[target] = ts
+            return True
+        if ts > seen:
+            # keep only latest payment between the users
+            connections[target] = ts
+        return False
+
+    def relabel(self, order, new_ids):
+        """
+        This function renames every user of graph, connections of every user are kept in order of new ids.
+        :param order: old user ids in their new order.
+        :param new_ids: new id of every old id.
+        """
+        adjacency = {}
+        for new, old in enumerate(order):
+            connections = self.adjacency.get(old)
+            if connections:
+                adjacency[new] = dict(sorted((new_ids[target], seen) for target, seen in connections.items()))
+        self.adjacency = adjacency
+
+    def live_since(self, now):
+        """
+        This function returns oldest timestamp an edge may have been last seen to be trusted at time now.
+        :param now: timestamp of payment being checked.
+
+        :return:
+            since: oldest trusted timestamp or None if every edge is trusted.
+        """
+        if self.horizon is None or now is None:
+            return None
+        return now - self.horizon
+
+    def neighbours(self, user, since=None):
+        """
+        This function returns users connected to user by an edge seen at or after since.
+        :param user: user whose connections are needed.
+        :param since: oldest trusted timestamp, as returned by live_since; None to return every connection.
+
+        :return:
+            iterable of connected users.
+        """
+        connections = self.adjacency.get(user)
+        if connections is None:
+            return ()
+        if since is None:
+            return connections
+        return [target for target, seen in connections.items() if seen >= since]
+
+    def common_neighbours(self, user1, user2, since=None):
+        """
+        This function counts users connected to both user1 and user2 by edges seen at or after since.
+        :param user1: user making payment.
+        :param user2: user receiving payment.
+        :param since: oldest trusted timestamp, None to count every connection.
+
+        :return:
+            number of distinct paths of degree 2 between user1 and user2.
+        """
+        if user1 == user2:
+            return 0
+        first, second = self.neighbours(user1), self.neighbours(user2)
+        if isinstance(first, dict) and isinstance(second, dict):
+            # connections with times: walk the smaller, look up the larger
+            if len(first) > len(second):
+                first, second = second, first
+            if since is None:
+                return sum(1 for user in first if user in second)
+            return sum(1 for user, seen in first.items()
+                       if seen >= since and user in second and second[user] >= since)
+        # graphs returning lists of connections (arrays, shards)
+        first, second = self.neighbours(user1, since), set(self.neighbours(user2, since))
+        return sum(1 for user in set(first) if user in second)
+
+    def degree(self, root_user, target_user, since=None, max_depth=4):
+        """
+        This function finds degree of connection between root_user and target_user by breadth first search, one
+        level at a time. Search stops as soon as target_user is reached, users of the last level are not expanded.
+        :param root_user: user making payment.
+        :param target_user: user receiving payment.
+        :param since: oldest trusted timestamp, None to follow every edge.
+        :param max_depth: depth of search.
+
+        :return:
+            degree of connection, or None if users are not connected within max_depth.
+        """
+        if root_user == target_user:
+            self.visits = 0
+            return 0
+        visited = {root_user}
+        frontier = [root_user]
+        found = None
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for user in frontier:
+                connections = self.neighbours(user, since)
+                if target_user in connections:
+                    found = depth
+                    break
+                if depth < max_depth:
+                    for connected in connections:
+                        if connected not in visited:
+                            visited.add(connected)
+                            next_frontier.append(connected)
+            if found is not None or not next_frontier:
+                break
+            frontier = next_frontier
+        self.visits = len(visited) - 1
+        return found
+
+    def shortest_path(self, root_user, target_user, since=None, max_depth=4):
+        """
+        This function does the same search as degree, keeping the user each visited user was first reached from, and
+        returns shortest chain of users connecting root_user to target_user.
+        :param root_user: user making payment.
+        :param target_user: user receiving payment.
+        :param since: oldest trusted timestamp, None to follow every edge.
+        :param max_depth: depth of search.
+
+        :return:
+            list of users from root_user to target_user (degree is its length - 1), or None if users are not
+            connected within max_depth.
+        """
+        if root_user == target_user:
+            self.visits = 0
+            return [root_user]
+        parents = {root_user: None}     # user: user it was first reached from
+        frontier = [root_user]
+        path = None
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for user in frontier:
+                connections = self.neighbours(user, since)
+                if target_user in connections:
+                    path = [target_user]
+                    while user is not None:
+                        path.append(user)
+                        user = parents[user]
+                    path.reverse()
+                    break
+                if depth < max_depth:
+                    for connected in connections:
+                        if connected not in parents:
+                            parents[connected] = user
+                            next_frontier.append(connected)
+            if path is not None or not next_frontier:
+                break
+            frontier = next_frontier
+        self.visits = len(parents) - 1
+        return path
+
+    def maybe_compact(self, now):
+        """
+        This function compacts graph if compaction_interval seconds of payment time passed since latest compaction.
+        :param now: timestamp of latest payment.
+        """
+        if self.horizon is None or now is None:
+            return 0
+        if self.last_compaction is None:
+            self.last_compaction = now
+        elif now - self.last_compaction >= self.compaction_interval:
+            return self.compact(now)
+        return 0
+
+    def compact(self, now):
+        """
+        This function drops edges that are stale at time now, users left without any edge are removed from graph.
+        :param now: timestamp of latest payment.
+
+        :return:
+            removed: number of undirected edges dropped.
+        """
+        self.last_compaction = now
+        since = self.live_since(now)
+        if since is None:
+            return 0
+        removed = 0
+        for user in list(self.adjacency):
+            connections = self.adjacency[user]
+            stale = [target for target, seen in connections.items() if seen < since]
+            for target in stale:
+                del connections[target]
+            removed += len(stale)
+            if not connections:
+                del self.adjacency[user]
+        return removed // 2
@@ -0,0 +1,107 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    PAYMENT RECORD AND USER TABLE: shared by antifraud.py and addedfeatures.py
+    ---------------------------------------------------------------------------
+
+    Payment: compact record of a single payment. It uses __slots__ so each payment costs one small fixed size object
+    instead of a dictionary of attributes plus the [user1, user2] lists that were built for every payment.
+
+    UserTable: interns user ids read from input files into dense integers. Payment graph, heat graph and heat window
+    only ever store these integers, the original user id string is looked up only when a report has to be written.
+"""
+
+
+class Payment:
+    """
+    Payment holds fields of a single payment read from batch_payment.txt or stream_payment.txt file.
+    Users are stored as integer ids handed out by UserTable.
+    """
+    __slots__ = ('timestamp', 'user1', 'user2', 'amount')
+
+    def __init__(self, timestamp, user1, user2, amount):
+        """
+        initializes objects of class.
+        :param timestamp: timestamp of payment in seconds        <type : int>
+        :param user1: interned id of user making the payment     <type : int>
+        :param user2: interned id of user receiving payment      <type : int>
+        :param amount: amount of payment                         <type : float>
+        """
+        self.timestamp = timestamp
+        self.user1 = user1
+        self.user2 = user2
+        self.amount = amount
+
+
+class UserTable:
+    """
+    UserTable maps user ids read from input files to dense integers and back.
+    Same integer object is returned every time a user is seen, therefore graphs holding a user many times do not
+    allocate a new object for every payment.
+    """
+    __slots__ = ('ids', 'names')
+
+    def __init__(self):
+        """
+        initializes objects of class.
+        ids: dictionary of user id string to interned integer id.
+        names: list of user id strings, indexed by interned integer id.
+        """
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """
+        This function returns interned id of user, a new id is assigned if user was never seen before.
+        :param name: user id read from input file.
+
+        :return:
+            uid: interned integer id of user.
+        """
+        uid = self.ids.get(name)
+        if uid is None:
+            uid = len(self.names)
+            self.ids[name] = uid
+            self.names.append(name)
+        return uid
+
+    def intern_all(self, names):
+        """
+        This function interns many users at once.
+        :param names: list of user id strings.
+
+        :return:
+            list of interned integer ids, in order of names.
+        """
+        if not self.names and len(set(names)) == len(names):
+            # empty table and distinct names: ids are just their positions
+            self.names = list(names)
+            self.ids = dict(zip(self.names, range(len(self.names))))
+            return list(range(len(self.names)))
+        return [self.intern(name) for name in names]
+
+    def relabel(self, order):
+        """
+        This function renames interned ids, every user id string keeps its user.
+        :param order: old interned ids in their new order.
+        """
+        self.names = [self.names[uid] for uid in order]
+        self.ids = dict(zip(self.names, range(len(self.names))))
+
+    def name(self, uid):
+        """
+        This function returns user id string for an interned id.
+        :param uid: interned integer id of user.
+
+        :return:
+            name: user id as read from input file.
+        """
+        return self.names[uid]
@@ -0,0 +1,167 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    PROFILING: built-in profiling of antifraud.py runs.
+    -----------------------------------------------------
+    Two profilers, each scoped to the batch stage, the stream stage or a window of stream payments:
+
+        cprofile - deterministic profile of every call (cProfile), written in pstats format.
+        sample   - statistical profile: SIGPROF interrupts the process every interval seconds of CPU time and the
+                   current call stack is counted. Written as collapsed stacks, one "frame;frame;frame count" line per
+                   distinct stack, ready for flamegraph.pl or speedscope. Overhead depends on interval only.
+
+    Every profiled run also keeps its slowest stream payments with the number of users their degree search visited,
+    and reports them with the payment line so that a pathological hub query can be replayed on its own.
+"""
+
+import cProfile
+import heapq
+import os
+import signal
+import sys
+import time
+
+SCOPES = ('batch', 'stream', 'window')
+
+
+class Profiler:
+    """
+    Profiler starts and stops a cProfile or sampling profiler around the configured scope and keeps slowest payments.
+    """
+    def __init__(self, mode, scope='stream', output=None, window=(0, 1000), interval=0.001, slowest=10):
+        """
+        initializes objects of class.
+        :param mode: 'cprofile' or 'sample'.
+        :param scope: 'batch', 'stream' or 'window'.
+        :param output: file profile is written to, defaults to antifraud.prof or antifraud.folded.
+        :param window: (first payment, number of payments) of stream profiled in 'window' scope.
+        :param interval: seconds of CPU time between two samples.
+        :param slowest: number of slowest payments kept.
+        """
+        if mode not in ('cprofile', 'sample'):
+            raise ValueError("unknown profiler %r" % mode)
+        if scope not in SCOPES:
+            raise ValueError("unknown profiling scope %r" % scope)
+        self.mode = mode
+        self.scope = scope
+        self.output = output or ('antifraud.prof' if mode == 'cprofile' else 'antifraud.folded')
+        self.window = window
+        self.interval = interval
+        self.slowest = slowest
+        self.profile = None
+        self.stacks = {}            # dictionary of collapsed call stack to number of samples.
+        self.samples = 0
+        self.running = False
+        self.sequence = None        # arrival sequence of payment being processed.
+        self.payments = []          # heap of (latency, sequence, payment line, degree, users visited).
+
+    # -----------------------------------------------
+    # Scopes
+    # -----------------------------------------------
+    def begin(self, scope):
+        """
+        This function starts profiler if scope is the configured one.
+        """
+        if scope == self.scope and not self.running:
+            self.start()
+
+    def end(self, scope):
+        """
+        This function stops profiler at end of the configured scope.
+        """
+        if scope == self.scope and self.running:
+            self.stop()
+
+    def payment_started(self, sequence):
+        """
+        This function is called before a stream payment is processed: it starts or stops profiler of 'window' scope.
+        :param sequence: arrival sequence of payment in stream.
+
+        :return:
+            time payment started, for payment_finished.
+        """
+        self.sequence = sequence
+        if self.scope == 'window':
+            first, count = self.window
+            if sequence == first:
+                self.begin('window')
+            elif sequence == first + count:
+                self.end('window')
+        return time.perf_counter()
+
+    def payment_finished(self, started, line, degree, visits):
+        """
+        This function keeps a payment if it is among the slowest seen.
+        :param started: value returned by payment_started.
+        :param line: payment as read from stream file.
+        :param degree: degree of connection found, None if not connected.
+        :param visits: users visited by degree search.
+        """
+        entry = (time.perf_counter() - started, self.sequence, line, degree, visits)
+        if len(self.payments) < self.slowest:
+            heapq.heappush(self.payments, entry)
+        elif entry[0] > self.payments[0][0]:
+            heapq.heapreplace(self.payments, entry)
+
+    # -----------------------------------------------
+    # Profilers
+    # -----------------------------------------------
+    def start(self):
+        self.running = True
+        if self.mode == 'cprofile':
+            if self.profile is None:
+                self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            signal.signal(signal.SIGPROF, self.sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        self.running = False
+        if self.mode == 'cprofile':
+            self.profile.disable()
+        else:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def sample(self, signum, frame):
+        """
+        This function is SIGPROF handler: it counts current call stack, outermost frame first.
+        """
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        stack = ';'.join(reversed(frames))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    # -----------------------------------------------
+    # Reports
+    # -----------------------------------------------
+    def close(self, report=sys.stderr):
+        """
+        This function stops profiler, writes profile and reports slowest payments.
+        :param report: file summary is written to.
+        """
+        if self.running:
+            self.stop()
+        if self.mode == 'cprofile':
+            if self.profile is not None:
+                self.profile.dump_stats(self.output)
+                report.write("profile: cProfile of %s written to %s\n" % (self.scope, self.output))
+        else:
+            with open(self.output, 'w') as folded:
+                for stack, count in sorted(self.stacks.items()):
+                    folded.write("%s %d\n" % (stack, count))
+            report.write("profile: %d samples of %s written to %s\n" % (self.samples, self.scope, self.output))
+        if self.payments:
+            report.write("profile: slowest payments (sequence, ms, degree, users visited, payment)\n")
+            for latency, sequence, line, degree, visits in sorted(self.payments, reverse=True):
+                report.write("    %d\t%.3f\t%s\t%d\t%s\n" % (sequence, latency * 1000, degree, visits, line))
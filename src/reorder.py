@@ -0,0 +1,112 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    GRAPH REORDERING: relabelling users after batch stage for locality of searches.
+    --------------------------------------------------------------------------------
+    Users are interned in order of first appearance in batch file, so connected users get ids far apart and a degree
+    search jumps all over adjacency. After batch stage users can be relabelled so that users a search reaches together
+    have ids close together:
+
+        degree - users with most connections first (hubs are touched by most searches and stay in cache).
+        bfs    - breadth first order of every connected component, starting from its user with most connections.
+        rcm    - reverse Cuthill-McKee: breadth first from a user with fewest connections, neighbours in order of
+                 increasing connections, whole order reversed. Keeps ids of connected users close (small bandwidth).
+
+    An ordering is a list of old ids in their new order. Payment graph, user table and amount profiles are relabelled
+    with it; user table maps new ids to the same user id strings, so reports in output4 are unchanged.
+"""
+
+from collections import deque
+
+ORDERINGS = ('degree', 'bfs', 'rcm')
+
+
+def connection_counts(graph, users):
+    """
+    This function returns number of connections of every user.
+    """
+    return [len(graph.neighbours(user)) for user in range(users)]
+
+
+def degree_order(graph, users):
+    """
+    This function orders users by number of connections, most connected first.
+    """
+    counts = connection_counts(graph, users)
+    return sorted(range(users), key=lambda user: -counts[user])
+
+
+def bfs_order(graph, users, start_key, neighbour_key=None):
+    """
+    This function orders users breadth first, one connected component after the other.
+    :param graph: PaymentGraph.
+    :param users: number of interned users.
+    :param start_key: key of users, component starts from unvisited user with smallest key.
+    :param neighbour_key: key neighbours of a user are visited in order of, None for order of graph.
+    """
+    order = []
+    visited = bytearray(users)
+    for start in sorted(range(users), key=start_key):
+        if visited[start]:
+            continue
+        visited[start] = 1
+        queue = deque([start])
+        while queue:
+            user = queue.popleft()
+            order.append(user)
+            connections = [connected for connected in graph.neighbours(user) if not visited[connected]]
+            if neighbour_key is not None:
+                connections.sort(key=neighbour_key)
+            for connected in connections:
+                visited[connected] = 1
+                queue.append(connected)
+    return order
+
+
+def ordering(graph, users, method):
+    """
+    This function returns ordering of users.
+    :param graph: PaymentGraph built by batch stage.
+    :param users: number of interned users.
+    :param method: 'degree', 'bfs' or 'rcm'.
+
+    :return:
+        list of old user ids in their new order.
+    """
+    if method == 'degree':
+        return degree_order(graph, users)
+    counts = connection_counts(graph, users)
+    if method == 'bfs':
+        return bfs_order(graph, users, lambda user: -counts[user])
+    if method == 'rcm':
+        order = bfs_order(graph, users, counts.__getitem__, counts.__getitem__)
+        order.reverse()
+        return order
+    raise ValueError("unknown ordering %r" % method)
+
+
+def inverse(order):
+    """
+    This function returns new id of every old id of an ordering.
+    """
+    new_ids = [0] * len(order)
+    for new, old in enumerate(order):
+        new_ids[old] = new
+    return new_ids
+
+
+def bandwidth(graph, users):
+    """
+    This function returns mean distance between ids of connected users, a measure of locality of graph.
+    """
+    total = edges = 0
+    for user in range(users):
+        for connected in graph.neighbours(user):
+            total += abs(user - connected)
+            edges += 1
+    return total / float(edges) if edges else 0.0
@@ -0,0 +1,325 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    REPLAY: re-classifying a historical stream under many parameter sets.
+    -----------------------------------------------------------------------
+    Backtesting a change of the additional features (60 seconds window, 2 days expiry, limits of check_if_suspicious,
+    maximum payment) would otherwise run antifraud.py, with all its parsing and I/O, once per parameter set.
+
+        1. stream file is parsed once into a binary event file: a small header, user id strings of the stream, then
+           columns of timestamps (int64), payer and payee (uint32 index into user ids) and amounts (float64).
+           Event file is parsed again only if stream file changed (path, size and modification time).
+        2. payment graph is built once by the batch stage (or loaded from --snapshot) and frozen; degree of
+           connection of every event is searched once and shared by every configuration.
+        3. every configuration replays events through its own heat graph only: verdict of every event comes from
+           AntiFraud.added_features_verdict, the same checks output4 is written from. Configurations run one after
+           the other, or in worker processes that inherit events and degrees.
+
+    Output is a verdict array per configuration (one byte per event, index into antifraud.VERDICTS), the degree array
+    shared by all of them (one signed byte per event, -1 if not connected), and summary counts per configuration.
+
+    Usage: python src/replay.py batch_payment.txt stream_payment.txt --config window=30 --config pair_limit=5 ...
+"""
+
+import csv
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+from addedfeatures import AdditionalFeatures
+from antifraud import AntiFraud, VERDICTS
+from features import CORE_FEATURES
+from filesource import source_of
+from payfile import PaymentColumns, is_payment_file
+from payment import Payment, UserTable
+
+MAGIC = b'PAYEVT1\n'
+# parameters of a configuration and their defaults, max_payment defaults to maximum amount of batch file.
+PARAMETERS = {'window': 60, 'expiry': 172800, 'fan_out_limit': 10, 'pair_limit': 10, 'max_payment': None}
+
+
+class Events:
+    """
+    Events is a stream of payments held in columns, users as indices into names.
+    """
+    __slots__ = ('names', 'timestamps', 'user1', 'user2', 'amounts')
+
+    def __init__(self):
+        self.names = []
+        self.timestamps = array('q')
+        self.user1 = array('I')
+        self.user2 = array('I')
+        self.amounts = array('d')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+def parse_events(streamfile):
+    """
+    This function parses stream file into events; rows stream stage would skip are skipped.
+    :param streamfile: stream of payments, text or binary payment file.
+
+    :return:
+        Events
+    """
+    events = Events()
+    if is_payment_file(streamfile):
+        with PaymentColumns(streamfile) as columns:
+            events.names = columns.names
+            events.timestamps = array('q', columns.timestamps)
+            events.user1 = array('I', columns.user1)
+            events.user2 = array('I', columns.user2)
+            events.amounts = array('d', (amount for _, _, _, amount in columns.fields()))
+        return events
+    users = UserTable()
+    with open(streamfile, 'r') as stream:
+        stream.readline()  # Column names in Stream File
+        for row in csv.reader(stream):
+            try:
+                timestamp, user1, user2, amount = AntiFraud.parse_fields(row)
+            except (IndexError, ValueError):
+                continue
+            events.timestamps.append(timestamp)
+            events.user1.append(users.intern(user1))
+            events.user2.append(users.intern(user2))
+            events.amounts.append(amount)
+    events.names = users.names
+    return events
+
+
+def write_events(path, events, source):
+    """
+    This function writes events to a binary event file.
+    :param source: identity of stream file events were parsed from.
+    """
+    header = json.dumps({'source': source, 'events': len(events)}).encode('utf-8')
+    names = '\n'.join(events.names).encode('utf-8')
+    with open(path + '.tmp', 'wb') as output:
+        output.write(MAGIC + struct.pack('<QQ', len(header), len(names)) + header + names)
+        for column in (events.timestamps, events.user1, events.user2, events.amounts):
+            column.tofile(output)
+    os.replace(path + '.tmp', path)
+
+
+def read_events(path, source):
+    """
+    This function reads a binary event file.
+    :param source: identity of stream file, events parsed from another file are not returned.
+
+    :return:
+        Events, or None if file does not exist or was parsed from another stream file.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as stored:
+        if stored.read(len(MAGIC)) != MAGIC:
+            return None
+        header_size, names_size = struct.unpack('<QQ', stored.read(16))
+        header = json.loads(stored.read(header_size).decode('utf-8'))
+        if header['source'] != list(source):
+            return None
+        events = Events()
+        names = stored.read(names_size).decode('utf-8')
+        events.names = names.split('\n') if names else []
+        for column in (events.timestamps, events.user1, events.user2, events.amounts):
+            column.fromfile(stored, header['events'])
+    return events
+
+
+def load_events(streamfile, path):
+    """
+    This function returns events of stream file, from event file if it holds them, parsing stream file otherwise.
+    """
+    source = source_of(streamfile)
+    events = read_events(path, source)
+    if events is None:
+        events = parse_events(streamfile)
+        write_events(path, events, source)
+    return events
+
+
+def search_degrees(anti_fraud, events):
+    """
+    This function searches degree of connection of every event in frozen payment graph.
+
+    :return:
+        array of degrees, -1 if users are not connected within search depth.
+    """
+    # user ids of event file, interned in user table of payment graph once per user
+    uids = [anti_fraud.users.intern(name) for name in events.names]
+    degrees = array('b')
+    for index in range(len(events)):
+        anti_fraud.payment = Payment(events.timestamps[index], uids[events.user1[index]], uids[events.user2[index]],
+                                     events.amounts[index])
+        anti_fraud.check_payment_status()
+        degrees.append(-1 if anti_fraud.status is None else anti_fraud.status)
+    return degrees
+
+
+def replay(events, degrees, max_allowed_payment, config):
+    """
+    This function classifies events with additional features of one configuration.
+    :param events: Events.
+    :param degrees: degree of every event, -1 if not connected.
+    :param max_allowed_payment: maximum amount of batch file.
+    :param config: dictionary of PARAMETERS.
+
+    :return:
+        bytearray of verdicts, one per event.
+    """
+    anti_fraud = AntiFraud()
+    max_payment = config.get('max_payment')
+    anti_fraud.max_allowed_payment = max_allowed_payment if max_payment is None else max_payment
+    anti_fraud.added_features = AdditionalFeatures(**dict((name, value) for name, value in config.items()
+                                                          if name != 'max_payment'))
+    verdicts = bytearray(len(events))
+    for index in range(len(events)):
+        anti_fraud.payment = Payment(events.timestamps[index], events.user1[index], events.user2[index],
+                                     events.amounts[index])
+        degree = degrees[index]
+        anti_fraud.status = None if degree < 0 else degree
+        verdicts[index] = anti_fraud.added_features_verdict(
+            anti_fraud.added_features.update_heat_graph(anti_fraud.payment))
+    return verdicts
+
+
+# events, degrees and maximum payment shared with worker processes.
+shared = None
+
+
+def share(events, degrees, max_allowed_payment):
+    """
+    This function is initializer of worker processes.
+    """
+    global shared
+    shared = (events, degrees, max_allowed_payment)
+
+
+def replay_shared(config):
+    """
+    This function replays one configuration in a worker process.
+    """
+    return replay(shared[0], shared[1], shared[2], config)
+
+
+def parse_config(text):
+    """
+    This function parses a configuration "name=value,name=value" of PARAMETERS.
+    """
+    config = {}
+    for item in filter(None, text.split(',')):
+        name, value = item.split('=', 1)
+        if name not in PARAMETERS:
+            raise ValueError("unknown replay parameter %r" % name)
+        config[name] = float(value) if name == 'max_payment' else int(value)
+    return config
+
+
+def main(batchfile, streamfile, configs, events_file=None, output=None, workers=1, until=None, report=sys.stdout,
+         **options):
+    """
+    This function replays stream under every configuration and reports summary counts.
+    :param batchfile: batch file the frozen payment graph is built from.
+    :param streamfile: stream of payments to replay.
+    :param configs: list of configurations, dictionaries of PARAMETERS.
+    :param events_file: binary event file of stream, defaults to stream file name + '.events'.
+    :param output: directory verdict arrays are written to, None not to write them.
+    :param workers: worker processes configurations are replayed in.
+    :param until: only events up to this timestamp are replayed, None for all.
+    :param report: file summary is written to.
+    :param options: options of AntiFraud class building payment graph, e.g. columnar, snapshot, hub_degree.
+
+    :return:
+        list of verdict arrays, in order of configs.
+    """
+    started = time.time()
+    events = load_events(streamfile, events_file or streamfile + '.events')
+    if until is not None:
+        kept = [index for index in range(len(events)) if events.timestamps[index] <= until]
+        for name in ('timestamps', 'user1', 'user2', 'amounts'):
+            column = getattr(events, name)
+            setattr(events, name, array(column.typecode, (column[index] for index in kept)))
+    parsed = time.time()
+
+    anti_fraud = AntiFraud(**options)
+    try:
+        if not anti_fraud.load_snapshot(batchfile):
+            anti_fraud.batch_processing(batchfile)
+            anti_fraud.save_snapshot(batchfile)
+        anti_fraud.index_hubs()
+        degrees = search_degrees(anti_fraud, events)
+    finally:
+        anti_fraud.close()
+    searched = time.time()
+
+    if workers > 1:
+        from multiprocessing import Pool
+        with Pool(workers, initializer=share, initargs=(events, degrees, anti_fraud.max_allowed_payment)) as pool:
+            results = pool.map(replay_shared, configs)
+    else:
+        results = [replay(events, degrees, anti_fraud.max_allowed_payment, config) for config in configs]
+    replayed = time.time()
+
+    if output is not None:
+        if not os.path.isdir(output):
+            os.makedirs(output)
+        with open(os.path.join(output, 'degrees.bin'), 'wb') as stored:
+            degrees.tofile(stored)
+        for index, verdicts in enumerate(results):
+            with open(os.path.join(output, 'verdicts-%d.bin' % index), 'wb') as stored:
+                stored.write(verdicts)
+
+    report.write("replay: %d events parsed in %.2fs, degrees searched in %.2fs, %d configurations replayed in %.2fs\n"
+                 % (len(events), parsed - started, searched - parsed, len(configs), replayed - searched))
+    report.write("core features: %s\n" % ', '.join("%s %d trusted" % (name, sum(1 for degree in degrees
+                                                                               if 0 <= degree <= max_degree))
+                                                   for name, max_degree in CORE_FEATURES))
+    report.write("%-4s %-50s %s\n" % ('#', 'configuration', ' '.join("%10s" % verdict for verdict in VERDICTS)))
+    for index, (config, verdicts) in enumerate(zip(configs, results)):
+        counts = [verdicts.count(verdict) for verdict in range(len(VERDICTS))]
+        label = ','.join("%s=%s" % item for item in sorted(config.items())) or 'defaults'
+        report.write("%-4d %-50s %s\n" % (index, label, ' '.join("%10d" % count for count in counts)))
+    return results
+
+
+def cli(argv=None):
+    """
+    This function parses command line arguments and runs main.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay stream of payments under many parameter sets of additional "
+                                                 "features.")
+    parser.add_argument('batchfile')
+    parser.add_argument('streamfile')
+    parser.add_argument('--config', action='append', default=[], metavar='NAME=VALUE,...',
+                        help="configuration to replay, parameters %s; may be repeated (default: one configuration "
+                             "of defaults)" % ', '.join(sorted(PARAMETERS)))
+    parser.add_argument('--events', metavar='FILE', help="binary event file (default: stream file + .events)")
+    parser.add_argument('--output', metavar='DIR', help="write degree and verdict arrays to DIR")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="replay configurations in N worker processes (default: 1)")
+    parser.add_argument('--until', metavar='TIME', help="replay only payments up to TIME, as written in stream file")
+    parser.add_argument('--snapshot', metavar='FILE', help="load frozen payment graph from FILE, see antifraud.py")
+    parser.add_argument('--columnar', action='store_true', help="build payment graph with NumPy (requires numpy)")
+    parser.add_argument('--hub-degree', type=int, metavar='N', help="search with hub index, see antifraud.py")
+    args = parser.parse_args(argv)
+    configs = [parse_config(text) for text in args.config] or [{}]
+    until = None
+    if args.until is not None:
+        # same conversion as timestamps of stream file
+        until = AntiFraud.parse_fields([args.until, '', '', '0'])[0]
+    main(args.batchfile, args.streamfile, configs, events_file=args.events, output=args.output, workers=args.workers,
+         until=until, snapshot=args.snapshot, columnar=args.columnar, hub_degree=args.hub_degree)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,182 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    SEARCH BUDGET: bounded latency of degree searches in the stream stage.
+    ------------------------------------------------------------------------
+    A degree 4 search that reaches a dense part of the payment graph can visit a large share of all users and stall
+    the stream for a long time. With a budget every search gives up once it has visited more users, or run for more
+    microseconds, than allowed:
+
+        1. payment is classified conservatively: users are not known to be connected, so every feature reports it as
+           unverified and output4 gives the budget as reason. Degrees below the level search gave up at are exact,
+           so a feature of lower degree would have said unverified anyway.
+        2. optionally, payment is handed to a re-check process that searches it without budget, in a copy of the
+           payment graph taken when stream stage started. Corrected verdicts are written to a file once stream ends:
+           one line per re-checked payment, "line, degree (or none), verdict of every feature", where line is the
+           line of the payment in output1-3.
+
+    Budget statistics and latency of every search (p50, p99, worst) are reported at end of stream, so the accuracy
+    given up can be weighed against the tail latency gained.
+"""
+
+import time
+from array import array
+
+
+class SearchBudget:
+    """
+    SearchBudget runs degree searches of a payment graph that stop once their budget is exhausted.
+    """
+    def __init__(self, max_visits=None, max_micros=None):
+        """
+        initializes objects of class.
+        :param max_visits: users a search may visit, None for no limit.
+        :param max_micros: microseconds a search may run, None for no limit.
+        """
+        self.max_visits = max_visits
+        self.max_seconds = None if max_micros is None else max_micros / 1e6
+        self.visits = 0             # users reached by latest search, payer not counted.
+        self.exhausted = None       # level latest search ran out of budget at, None if it completed.
+        self.exhausted_count = 0
+        self.latencies = array('d')
+
+    def degree(self, graph, root_user, target_user, since=None, max_depth=4):
+        """
+        This function finds degree of connection as PaymentGraph.degree does, within budget.
+        :param graph: PaymentGraph searched.
+        :param root_user: user making payment.
+        :param target_user: user receiving payment.
+        :param since: oldest trusted timestamp, None to follow every edge.
+        :param max_depth: depth of search.
+
+        :return:
+            degree of connection, or None if users are not connected within max_depth or budget was exhausted
+            (self.exhausted tells which).
+        """
+        started = time.perf_counter()
+        self.exhausted = None
+        if root_user == target_user:
+            self.visits = 0
+            self.latencies.append(time.perf_counter() - started)
+            return 0
+        max_visits = self.max_visits
+        deadline = None if self.max_seconds is None else started + self.max_seconds
+        visited = {root_user}
+        frontier = [root_user]
+        found = None
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for user in frontier:
+                if (max_visits is not None and len(visited) > max_visits) or \
+                        (deadline is not None and time.perf_counter() > deadline):
+                    self.exhausted = depth
+                    break
+                connections = graph.neighbours(user, since)
+                if target_user in connections:
+                    found = depth
+                    break
+                if depth < max_depth:
+                    for connected in connections:
+                        if connected not in visited:
+                            visited.add(connected)
+                            next_frontier.append(connected)
+            if found is not None or self.exhausted is not None or not next_frontier:
+                break
+            frontier = next_frontier
+        self.visits = len(visited) - 1
+        if self.exhausted is not None:
+            self.exhausted_count += 1
+        self.latencies.append(time.perf_counter() - started)
+        return found
+
+    def summary(self):
+        """
+        This function returns a line of budget statistics and search latencies.
+        """
+        searches = len(self.latencies)
+        if not searches:
+            return "search budget: no searches"
+        latencies = sorted(self.latencies)
+        p99 = latencies[min(searches - 1, int(searches * 0.99))]
+        return "search budget: %d of %d searches exhausted budget (%.2f%%), latency p50 %.0fus, p99 %.0fus, " \
+               "worst %.0fus" % (self.exhausted_count, searches, 100.0 * self.exhausted_count / searches,
+                                 latencies[searches // 2] * 1e6, p99 * 1e6, latencies[-1] * 1e6)
+
+
+def recheck_worker(connection, graph, max_depth):
+    """
+    This function runs in re-check process: it searches payments it is sent without budget and sends back their
+    degrees, until it is sent None.
+    :param connection: end of pipe connected to stream stage.
+    :param graph: payment graph as stream stage started.
+    :param max_depth: depth of search.
+    """
+    while True:
+        request = connection.recv()
+        if request is None:
+            connection.send(None)
+            connection.close()
+            return
+        sequence, user1, user2, since = request
+        connection.send((sequence, graph.degree(user1, user2, since, max_depth)))
+
+
+class Rechecker:
+    """
+    Rechecker hands payments whose search exhausted its budget to a re-check process and collects their degrees.
+    """
+    def __init__(self, graph, max_depth):
+        """
+        initializes objects of class and starts re-check process.
+        :param graph: payment graph, copied into re-check process.
+        :param max_depth: depth of search.
+        """
+        # imported here: only runs with re-checks start a process.
+        from multiprocessing import Pipe, Process
+        self.connection, child = Pipe()
+        self.process = Process(target=recheck_worker, args=(child, graph, max_depth), daemon=True)
+        self.process.start()
+        child.close()
+        self.degrees = {}       # sequence of payment: degree found by re-check
+        self.pending = 0
+
+    def submit(self, sequence, payment, since):
+        """
+        This function hands payment to re-check process; degrees already found are collected first, so neither
+        side waits on a full pipe.
+        :param sequence: arrival sequence of payment.
+        :param payment: Payment record.
+        :param since: oldest trusted timestamp of its search.
+        """
+        self.collect()
+        self.connection.send((sequence, payment.user1, payment.user2, since))
+        self.pending += 1
+
+    def collect(self, wait=False):
+        """
+        This function collects degrees found by re-check process.
+        :param wait: if True, waits until every payment handed over has been re-checked.
+        """
+        while self.pending and (wait or self.connection.poll()):
+            sequence, degree = self.connection.recv()
+            self.degrees[sequence] = degree
+            self.pending -= 1
+
+    def close(self):
+        """
+        This function waits for every re-check and stops re-check process.
+
+        :return:
+            dictionary of arrival sequence of payment to degree of connection (None if not connected).
+        """
+        self.collect(wait=True)
+        self.connection.send(None)
+        self.connection.recv()
+        self.connection.close()
+        self.process.join()
+        return self.degrees
@@ -0,0 +1,253 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    SHARDED MODE: payment graph partitioned across worker processes.
+    -----------------------------------------------------------------
+    Users are hash partitioned across N shard processes. Each shard owns the connections of its users and nothing else.
+    A local coordinator (the AntiFraud process) talks to shards over pipes:
+
+        edges  - new half edges are buffered per shard and sent in batches.
+        expand - degree search runs level by level; the frontier of a level is split by owning shard, every shard
+                 expands its part in parallel and returns the connections, coordinator merges them into the next
+                 frontier. Search stops as soon as the receiving user is reached or depth 4 is exhausted.
+
+    Processes on one machine stand in for nodes; the messages are the same a networked deployment would exchange.
+"""
+
+from multiprocessing import Pipe, Process
+
+from antifraud import AntiFraud
+from paygraph import PaymentGraph
+
+EDGE_BATCH = 20000      # half edges buffered for a shard before they are sent.
+
+
+def shard_worker(connection, horizon):
+    """
+    This function runs in a shard process and serves requests of coordinator until it is asked to stop.
+    :param connection: end of pipe connected to coordinator.
+    :param horizon: trust horizon of payment graph, in seconds.
+    """
+    partition = PaymentGraph(horizon=horizon)
+    while True:
+        request = connection.recv()
+        command = request[0]
+        if command == 'edges':
+            # flat list: source, target, ts, source, target, ts, ...
+            edges = request[1]
+            for index in range(0, len(edges), 3):
+                partition.add_half_edge(edges[index], edges[index + 1], edges[index + 2])
+        elif command == 'expand':
+            _, frontier, since = request
+            reached = set()
+            for user in frontier:
+                reached.update(partition.neighbours(user, since))
+            connection.send(list(reached))
+        elif command == 'compact':
+            partition.compact(request[1])
+        elif command == 'stats':
+            connection.send((len(partition), sum(len(targets) for targets in partition.adjacency.values())))
+        elif command == 'stop':
+            connection.close()
+            return
+
+
+class ShardedGraph(PaymentGraph):
+    """
+    ShardedGraph is the coordinator side of a payment graph partitioned over shard processes.
+    It keeps horizon and compaction schedule of PaymentGraph, adjacency itself lives in the shards.
+    """
+    def __init__(self, shards, horizon=None, compaction_interval=None):
+        """
+        initializes objects of class and starts shard processes.
+        :param shards: number of shard processes.
+        :param horizon: seconds an edge stays trusted, None to trust forever.
+        :param compaction_interval: seconds of payment time between two compactions of every shard.
+        """
+        PaymentGraph.__init__(self, horizon=horizon, compaction_interval=compaction_interval)
+        self.shards = shards
+        self.connections = []
+        self.processes = []
+        self.pending = [[] for _ in range(shards)]      # half edges waiting to be sent to every shard.
+        for _ in range(shards):
+            coordinator_end, shard_end = Pipe()
+            process = Process(target=shard_worker, args=(shard_end, horizon), daemon=True)
+            process.start()
+            shard_end.close()
+            self.connections.append(coordinator_end)
+            self.processes.append(process)
+
+    def __len__(self):
+        return sum(users for users, _ in self.stats())
+
+    def __contains__(self, user):
+        return bool(self.neighbours(user))
+
+    def shard_of(self, user):
+        """
+        This function returns shard that owns user.
+        """
+        return hash(user) % self.shards
+
+    def edge_count(self):
+        return sum(half_edges for _, half_edges in self.stats()) // 2
+
+    def add_edge(self, user1, user2, ts):
+        """
+        This function queues an edge between user1 and user2: each half edge goes to shard owning its source user.
+        """
+        if user1 == user2:
+            return False
+        for source, target in ((user1, user2), (user2, user1)):
+            shard = self.shard_of(source)
+            pending = self.pending[shard]
+            pending += (source, target, ts)
+            if len(pending) >= 3 * EDGE_BATCH:
+                self.flush(shard)
+        return True
+
+    def flush(self, shard=None):
+        """
+        This function sends buffered half edges to one shard, or to every shard if shard is None.
+        """
+        for index in (range(self.shards) if shard is None else (shard,)):
+            if self.pending[index]:
+                self.connections[index].send(('edges', self.pending[index]))
+                self.pending[index] = []
+
+    def neighbours(self, user, since=None):
+        """
+        This function returns connections of a single user, answered by shard owning the user.
+        """
+        return self.expand([user], since)
+
+    def expand(self, frontier, since=None):
+        """
+        This function returns users connected to any user of frontier. Frontier is split by owning shard and every
+        shard expands its part in parallel.
+        :param frontier: list of users to expand.
+        :param since: oldest trusted timestamp, None to follow every edge.
+
+        :return:
+            list of connected users, may contain duplicates across shards.
+        """
+        self.flush()
+        parts = [[] for _ in range(self.shards)]
+        for user in frontier:
+            parts[self.shard_of(user)].append(user)
+        asked = []
+        # send all requests first so shards work at the same time
+        for shard, part in enumerate(parts):
+            if part:
+                self.connections[shard].send(('expand', part, since))
+                asked.append(shard)
+        reached = []
+        for shard in asked:
+            reached += self.connections[shard].recv()
+        return reached
+
+    def degree(self, root_user, target_user, since=None, max_depth=4):
+        """
+        This function finds degree of connection between root_user and target_user by distributed breadth first
+        search expanding one level of the whole frontier at a time.
+        :param root_user: user making payment.
+        :param target_user: user receiving payment.
+        :param since: oldest trusted timestamp, None to follow every edge.
+        :param max_depth: depth of search.
+
+        :return:
+            degree of connection, or None if users are not connected within max_depth.
+        """
+        self.visits = 0
+        if root_user == target_user:
+            return 0
+        visited = {root_user}
+        frontier = [root_user]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for user in self.expand(frontier, since):
+                if user not in visited:
+                    if user == target_user:
+                        return depth
+                    visited.add(user)
+                    self.visits += 1
+                    next_frontier.append(user)
+            if not next_frontier:
+                return None
+            frontier = next_frontier
+        return None
+
+    def compact(self, now):
+        """
+        This function asks every shard to drop edges that are stale at time now.
+        """
+        self.last_compaction = now
+        self.flush()
+        for connection in self.connections:
+            connection.send(('compact', now))
+        return 0
+
+    def stats(self):
+        """
+        This function returns (users, half edges) held by every shard.
+        """
+        self.flush()
+        for connection in self.connections:
+            connection.send(('stats',))
+        return [connection.recv() for connection in self.connections]
+
+    def close(self):
+        """
+        This function stops shard processes.
+        """
+        for connection in self.connections:
+            connection.send(('stop',))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+
+class ShardedAntiFraud(AntiFraud):
+    """
+    ShardedAntiFraud classifies payments same as AntiFraud with payment graph partitioned over shard processes.
+    """
+    def __init__(self, shards, trust_horizon=None, **options):
+        """
+        initializes objects of class.
+        :param shards: number of shard processes.
+        :param trust_horizon: seconds a payment between two users keeps them connected, None to trust forever.
+        :param options: other options of AntiFraud.
+        """
+        if options.get('state_dir') is not None:
+            raise ValueError("sharded payment graph can not be recovered from a state directory")
+        if options.get('graph_store') is not None:
+            raise ValueError("sharded payment graph can not be read from a graph store")
+        if options.get('snapshot') is not None:
+            raise ValueError("sharded payment graph can not be saved to a snapshot")
+        if options.get('columnar'):
+            raise ValueError("sharded payment graph is built by shards, not as columnar arrays")
+        if options.get('paths') is not None:
+            raise ValueError("sharded payment graph does not keep paths of its searches")
+        if options.get('reorder') is not None:
+            raise ValueError("sharded payment graph can not be reordered")
+        if options.get('hub_degree') is not None:
+            raise ValueError("sharded payment graph has no hub index")
+        if options.get('search_budget') is not None or options.get('search_budget_us') is not None:
+            raise ValueError("sharded payment graph is searched in shards, without search budget")
+        if options.get('max_resident_users') is not None or options.get('memory_limit') is not None:
+            raise ValueError("sharded payment graph is held by shards, without memory governor")
+        self.graph = ShardedGraph(shards, horizon=trust_horizon)
+        AntiFraud.__init__(self, pay_graph=self.graph, **options)
+
+    def close(self):
+        """
+        This function stops shard processes of payment graph.
+        """
+        self.graph.close()
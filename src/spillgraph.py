@@ -0,0 +1,243 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    MEMORY GOVERNOR: payment graph holding only recently active users in memory.
+    -------------------------------------------------------------------------------
+    Every user ever seen keeps its connections in payment graph forever, so a long running process keeps growing.
+    SpillingGraph is a PaymentGraph with a ceiling on users resident in memory and/or on their estimated size:
+
+        1. users are kept in order of last activity: a payment adding one of their edges or a search expanding them
+           moves them to the end.
+        2. once a ceiling is passed, least recently active users are spilled until memory is below 90% of it: their
+           connections are appended to a spill file (marshal of {connected user: timestamp}) and dropped from memory,
+           only their offset in spill file is kept.
+        3. a search or payment touching a spilled user faults it back in from spill file.
+
+    Spill file is append only; once more of it is dead (users faulted back in) than live and it is larger than
+    SPILL_COMPACT_BYTES, it is rewritten with live users only. A pickled graph refers to its spill file by path.
+    Searches see exactly the connections an in-memory graph would, so every verdict is the same; only time of a search
+    touching spilled users changes.
+
+    Size of a resident user is estimated as USER_BYTES plus EDGE_BYTES per connection, the memory taken by the
+    dictionaries holding it in CPython; a ceiling in megabytes is a ceiling on that estimate.
+"""
+
+import marshal
+import os
+import tempfile
+from collections import OrderedDict
+
+from paygraph import PaymentGraph
+
+USER_BYTES = 250                    # connections dictionary, entry in adjacency and in activity order.
+EDGE_BYTES = 64                     # entry of connections dictionary and its timestamp.
+SPILL_COMPACT_BYTES = 64 << 20      # dead bytes of spill file before it is rewritten.
+LOW_WATERMARK = 0.9                 # spilling stops once memory is below this share of ceilings.
+
+
+class SpillingGraph(PaymentGraph):
+    """
+    SpillingGraph is a payment graph spilling connections of least recently active users to disk.
+    adjacency: connections of resident users, as in PaymentGraph.
+    spilled: dictionary of spilled user to (offset, size, connections, generation): its record in spill file and
+             compactions of graph before it was spilled.
+    """
+    def __init__(self, max_users=None, max_bytes=None, directory=None, horizon=None, compaction_interval=None):
+        """
+        initializes objects of class and creates spill file.
+        :param max_users: users resident in memory at most, None for no limit.
+        :param max_bytes: estimated bytes of resident users at most, None for no limit.
+        :param directory: directory of spill file, None for temporary directory of system.
+        :param horizon: seconds an edge stays trusted, None to trust forever.
+        :param compaction_interval: seconds of payment time between two compactions.
+        """
+        PaymentGraph.__init__(self, horizon=horizon, compaction_interval=compaction_interval)
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.activity = OrderedDict()       # resident users, least recently active first.
+        self.spilled = {}
+        self.resident_edges = 0             # half edges held by resident users.
+        descriptor, self.path = tempfile.mkstemp(prefix='spill-', suffix='.bin', dir=directory)
+        self.file = os.fdopen(descriptor, 'w+b')
+        self.live = self.dead = 0           # bytes of spill file holding spilled users, and dead records.
+        self.spills = self.faults = self.compactions = 0
+        self.compacted_since = None         # edges seen before this were dropped by latest compaction.
+        self.generation = 0                 # compactions of graph so far.
+
+    def __contains__(self, user):
+        return user in self.adjacency or user in self.spilled
+
+    def __len__(self):
+        return len(self.adjacency) + len(self.spilled)
+
+    def __getstate__(self):
+        """
+        This function pickles graph without its spill file, which stays on disk: only one of the copies may be used
+        afterwards, e.g. a tenant unloaded to a snapshot (see tenants.py) after release() of the original.
+        """
+        self.file.flush()
+        state = self.__dict__.copy()
+        del state['file']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.file = open(self.path, 'r+b')
+
+    def edge_count(self):
+        return (self.resident_edges + sum(record[2] for record in self.spilled.values())) // 2
+
+    def resident_bytes(self):
+        """
+        This function returns estimated bytes of resident users.
+        """
+        return len(self.adjacency) * USER_BYTES + self.resident_edges * EDGE_BYTES
+
+    def over(self, share=1.0):
+        """
+        This function checks if resident users exceed share of a ceiling.
+        """
+        return (self.max_users is not None and len(self.adjacency) > self.max_users * share) or \
+            (self.max_bytes is not None and self.resident_bytes() > self.max_bytes * share)
+
+    def enforce(self, keep):
+        """
+        This function spills least recently active users while memory is above a ceiling.
+        :param keep: user being used, never spilled.
+        """
+        if not self.over():
+            return
+        activity = self.activity
+        self.file.seek(0, os.SEEK_END)
+        while activity and self.over(LOW_WATERMARK):
+            user = next(iter(activity))
+            if user == keep:
+                activity.move_to_end(user)
+                if len(activity) == 1:
+                    break
+                continue
+            del activity[user]
+            connections = self.adjacency.pop(user, None)
+            if not connections:
+                continue
+            record = marshal.dumps(connections)
+            self.spilled[user] = (self.file.tell(), len(record), len(connections), self.generation)
+            self.file.write(record)
+            self.live += len(record)
+            self.resident_edges -= len(connections)
+            self.spills += 1
+
+    def fault(self, user):
+        """
+        This function reads connections of a spilled user back into memory.
+        """
+        offset, size, count, generation = self.spilled.pop(user)
+        self.file.flush()
+        connections = marshal.loads(os.pread(self.file.fileno(), size, offset))
+        self.live -= size
+        self.dead += size
+        self.faults += 1
+        if self.dead > max(self.live, SPILL_COMPACT_BYTES):
+            self.compact_spill()
+        if generation < self.generation:
+            # compactions since user was spilled dropped these edges from an in-memory graph
+            for target in [target for target, seen in connections.items() if seen < self.compacted_since]:
+                del connections[target]
+            if not connections:
+                return connections
+        self.adjacency[user] = connections
+        self.activity[user] = None
+        self.resident_edges += len(connections)
+        self.enforce(user)
+        return connections
+
+    def compact_spill(self):
+        """
+        This function rewrites spill file with records of spilled users only.
+        """
+        self.file.flush()
+        descriptor, path = tempfile.mkstemp(prefix='spill-', suffix='.bin', dir=os.path.dirname(self.path))
+        compacted = os.fdopen(descriptor, 'w+b')
+        for user, (offset, size, count, generation) in list(self.spilled.items()):
+            self.spilled[user] = (compacted.tell(), size, count, generation)
+            compacted.write(os.pread(self.file.fileno(), size, offset))
+        self.file.close()
+        os.remove(self.path)
+        self.file, self.path = compacted, path
+        self.dead = 0
+        self.compactions += 1
+
+    def add_half_edge(self, source, target, ts):
+        """
+        This function connects source to target, faulting source in first if it was spilled.
+        """
+        if source in self.spilled:
+            self.fault(source)
+        new = PaymentGraph.add_half_edge(self, source, target, ts)
+        if source in self.activity:
+            self.activity.move_to_end(source)
+        else:
+            self.activity[source] = None
+        if new:
+            self.resident_edges += 1
+            self.enforce(source)
+        return new
+
+    def neighbours(self, user, since=None):
+        """
+        This function returns users connected to user, faulting user in first if it was spilled.
+        """
+        connections = self.adjacency.get(user)
+        if connections is None:
+            if user not in self.spilled:
+                return ()
+            connections = self.fault(user)
+        else:
+            self.activity.move_to_end(user)
+        if since is None:
+            return connections
+        return [target for target, seen in connections.items() if seen >= since]
+
+    def compact(self, now):
+        """
+        This function drops stale edges of resident users; spilled users are compacted when they are faulted in,
+        and searches never traverse stale edges.
+        """
+        removed = PaymentGraph.compact(self, now)
+        self.compacted_since = self.live_since(now)
+        self.generation += 1
+        for user in [user for user in self.activity if user not in self.adjacency]:
+            del self.activity[user]
+        self.resident_edges = sum(len(connections) for connections in self.adjacency.values())
+        return removed
+
+    def relabel(self, order, new_ids):
+        raise ValueError("spilling payment graph can not be reordered")
+
+    def summary(self):
+        """
+        This function returns a line of resident and spilled sizes.
+        """
+        spilled_edges = sum(record[2] for record in self.spilled.values())
+        return "memory governor: %d users resident (~%.1f MB), %d spilled (%d connections, %.1f MB on disk), " \
+               "%d spills, %d faults" % (len(self.adjacency), self.resident_bytes() / 1e6, len(self.spilled),
+                                         spilled_edges, self.live / 1e6, self.spills, self.faults)
+
+    def release(self):
+        """
+        This function closes spill file, keeping it on disk for a pickled copy of graph.
+        """
+        self.file.close()
+
+    def close(self):
+        """
+        This function closes and removes spill file.
+        """
+        if not self.file.closed:
+            self.file.close()
+            os.remove(self.path)
@@ -0,0 +1,317 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    TENANT HOST: payment graphs and windows of many wallets served by one process.
+    ---------------------------------------------------------------------------------
+    A process per region or wallet product pays for its own interpreter and code, and holds its payment graph even
+    while its wallet is idle. TenantHost serves every tenant from one process:
+
+        1. a tenant is a directory of tenants directory holding its batch_payment.txt. Its state is a whole
+           AntiFraud: user table, payment graph, heat graph and 60 seconds window, payment limits.
+        2. stream file has the tenant key as first column ("tenant, time, id1, id2, amount, message"); every payment
+           is routed to its tenant and classified exactly as antifraud.py would classify the tenant's own stream.
+           Outputs of a tenant are output1-4.txt of its directory of output directory.
+        3. a tenant is loaded when its first payment arrives: batch stage is run, with the memory governor
+           (spillgraph.py) if the tenant has a memory budget.
+        4. once more tenants are loaded than allowed, or their estimated memory is above the ceiling of the host,
+           least recently used tenants are unloaded: their AntiFraud is pickled to a snapshot in spool directory and
+           dropped. Their next payment loads the snapshot instead of running batch stage again.
+
+    Estimated memory of a tenant is that of its payment graph (see spillgraph.py; index of spilled users included),
+    its user table and the payments in its window; it is taken when a tenant is loaded and every CHECK_INTERVAL
+    payments.
+
+    Usage: python src/tenants.py tenants_dir stream_payment.txt output_dir [--max-loaded N] [--host-memory MB]
+                                 [--tenant-memory MB] [--budget NAME=MB ...]
+"""
+
+import csv
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+
+from antifraud import AntiFraud
+from edgelog import read_snapshot
+from features import CORE_FEATURES, Feature, FeatureEngine
+from spillgraph import EDGE_BYTES, USER_BYTES
+
+NAME_BYTES = 120            # user id string, entry in list and dictionary of user table.
+SPILLED_BYTES = 150         # spilled user: entry of spill index and its (offset, size, connections).
+WINDOW_BYTES = 150          # payment in 60 seconds window: its pair, timestamp and heat graph edge.
+CHECK_INTERVAL = 4096       # payments routed between two estimates of memory of loaded tenants.
+OUTPUTS = ('output1.txt', 'output2.txt', 'output3.txt', 'output4.txt')
+
+
+class Tenant:
+    """
+    Tenant is one wallet hosted: its AntiFraud while loaded, its snapshot once unloaded.
+    """
+    def __init__(self, name, batchfile, output_dir, memory_budget=None):
+        """
+        initializes objects of class.
+        :param name: tenant key of its payments in stream.
+        :param batchfile: batch file of tenant.
+        :param output_dir: directory output1-4.txt of tenant are written to.
+        :param memory_budget: estimated megabytes of payment graph of tenant kept in memory, None for no limit.
+        """
+        self.name = name
+        self.batchfile = batchfile
+        self.output_dir = output_dir
+        self.memory_budget = memory_budget
+        self.anti_fraud = None      # AntiFraud of tenant while loaded.
+        self.snapshot = None        # snapshot file of tenant once it was unloaded.
+        self.sinks = None           # output1-4.txt while loaded.
+        self.engine = None          # FeatureEngine of output1-3 while loaded.
+        self.sequence = 0           # payments of tenant classified.
+        self.estimate = 0           # estimated bytes, as of latest estimate.
+
+
+class TenantHost:
+    """
+    TenantHost routes payments of a stream to tenants, keeping at most a number of tenants or of estimated megabytes
+    loaded.
+    """
+    def __init__(self, tenants_dir, output_dir, max_loaded=None, host_memory=None, tenant_memory=None, budgets=None,
+                 spool_dir=None, **options):
+        """
+        initializes objects of class and finds tenants.
+        :param tenants_dir: directory holding a directory per tenant, with its batch_payment.txt.
+        :param output_dir: directory outputs of every tenant are written to, a directory per tenant.
+        :param max_loaded: tenants loaded at most, None for no limit.
+        :param host_memory: estimated megabytes of loaded tenants at most, None for no limit.
+        :param tenant_memory: memory budget of every tenant in megabytes, None for no limit.
+        :param budgets: dictionary of tenant name to its memory budget, overriding tenant_memory.
+        :param spool_dir: directory snapshots and spill files are written in, None for temporary directory of
+                          system; a directory of its own is created in it and removed by close().
+        :param options: options of AntiFraud class shared by every tenant, e.g. trust_horizon, allowed_lateness.
+        """
+        for option in ('state_dir', 'graph_store', 'snapshot', 'recheck', 'hub_degree', 'overlap_io', 'paths',
+                       'trust_scores', 'features', 'reorder', 'max_resident_users', 'memory_limit', 'spill_dir'):
+            if options.get(option):
+                raise ValueError("tenant host can not be combined with option %s" % option)
+        budgets = budgets or {}
+        self.tenants = OrderedDict()
+        for name in sorted(os.listdir(tenants_dir)):
+            batchfile = os.path.join(tenants_dir, name, 'batch_payment.txt')
+            if os.path.isfile(batchfile):
+                self.tenants[name] = Tenant(name, batchfile, os.path.join(output_dir, name),
+                                            budgets.get(name, tenant_memory))
+        unknown = set(budgets) - set(self.tenants)
+        if unknown:
+            raise ValueError("memory budget of unknown tenants: %s" % ', '.join(sorted(unknown)))
+        self.max_loaded = max_loaded
+        self.max_bytes = None if host_memory is None else int(host_memory * 1e6)
+        self.options = options
+        self.spool = tempfile.mkdtemp(prefix='tenants-', dir=spool_dir)
+        self.loaded = OrderedDict()     # loaded tenants, least recently used first.
+        self.routed = self.unrouted = self.loads = self.unloads = self.peak_loaded = 0
+
+    def estimate(self, tenant):
+        """
+        This function estimates bytes held by a loaded tenant.
+        """
+        anti_fraud = tenant.anti_fraud
+        graph = anti_fraud.state()['graph']
+        if anti_fraud.spilling:
+            size = graph.resident_bytes() + len(graph.spilled) * SPILLED_BYTES
+        else:
+            size = len(graph) * USER_BYTES + 2 * graph.edge_count() * EDGE_BYTES
+        window = sum(len(pairs) for pairs in anti_fraud.added_features.payments_in_60sec.values()) // 2
+        tenant.estimate = size + len(anti_fraud.users) * NAME_BYTES + window * WINDOW_BYTES
+        return tenant.estimate
+
+    def load(self, tenant):
+        """
+        This function loads a tenant from its snapshot, or runs its batch stage the first time it is used, and opens
+        its outputs.
+        """
+        if tenant.snapshot is not None:
+            tenant.anti_fraud = read_snapshot(tenant.snapshot)
+            mode = 'a'
+        else:
+            memory = {}
+            if tenant.memory_budget is not None:
+                memory = {'memory_limit': tenant.memory_budget, 'spill_dir': self.spool}
+            tenant.anti_fraud = AntiFraud(**dict(self.options, **memory))
+            tenant.anti_fraud.batch_processing(tenant.batchfile)
+            if not os.path.isdir(tenant.output_dir):
+                os.makedirs(tenant.output_dir)
+            mode = 'w'
+        tenant.sinks = [open(os.path.join(tenant.output_dir, output), mode) for output in OUTPUTS]
+        tenant.engine = FeatureEngine([Feature(name, max_degree, sink) for (name, max_degree), sink in
+                                       zip(CORE_FEATURES, tenant.sinks[:3])])
+        self.loaded[tenant.name] = tenant
+        self.loads += 1
+        self.estimate(tenant)
+        self.enforce(tenant)
+        self.peak_loaded = max(self.peak_loaded, len(self.loaded))
+
+    def unload(self, tenant):
+        """
+        This function writes AntiFraud of a tenant to its snapshot and drops it from memory.
+        """
+        tenant.snapshot = os.path.join(self.spool, tenant.name + '.snapshot')
+        # snapshot only outlives the tenant while host runs: nothing to flush to disk
+        with open(tenant.snapshot, 'wb') as snapshot:
+            pickle.dump(tenant.anti_fraud, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        for sink in tenant.sinks:
+            sink.close()
+        if tenant.anti_fraud.spilling:
+            # spill file now belongs to the snapshot
+            tenant.anti_fraud.state()['graph'].release()
+        tenant.anti_fraud = tenant.sinks = tenant.engine = None
+        del self.loaded[tenant.name]
+        self.unloads += 1
+
+    def over(self):
+        return (self.max_loaded is not None and len(self.loaded) > self.max_loaded) or \
+            (self.max_bytes is not None and sum(tenant.estimate for tenant in self.loaded.values()) > self.max_bytes)
+
+    def enforce(self, keep):
+        """
+        This function unloads least recently used tenants while loaded tenants exceed a ceiling.
+        :param keep: tenant being used, never unloaded.
+        """
+        while self.over() and len(self.loaded) > 1:
+            tenant = next(iter(self.loaded.values()))
+            if tenant is keep:
+                self.loaded.move_to_end(tenant.name)
+                continue
+            self.unload(tenant)
+
+    def route(self, row):
+        """
+        This function classifies a payment of stream with its tenant and writes its verdicts to outputs of tenant.
+        :param row: record read from stream file, tenant key first.
+        """
+        tenant = self.tenants.get(row[0].strip())
+        if tenant is None:
+            self.unrouted += 1
+            return
+        if tenant.anti_fraud is None:
+            self.load(tenant)
+        else:
+            self.loaded.move_to_end(tenant.name)
+        anti_fraud = tenant.anti_fraud
+        try:
+            anti_fraud.parse_row(row[1:])
+        except (IndexError, ValueError):
+            return
+        anti_fraud.classify_payment(tenant.sequence)
+        tenant.sequence += 1
+        tenant.engine.write(anti_fraud.status)
+        if anti_fraud.window is None:
+            tenant.sinks[3].write(anti_fraud.report + "\n")
+        else:
+            anti_fraud.write_reports(tenant.sinks[3])
+        self.routed += 1
+        if self.routed % CHECK_INTERVAL == 0:
+            for loaded in self.loaded.values():
+                self.estimate(loaded)
+            self.enforce(tenant)
+
+    def stream_processing(self, streamfile):
+        """
+        This function routes every payment of stream file to its tenant.
+        """
+        with open(streamfile, 'r') as stream:
+            stream.readline()  # Column names in Stream File
+            for row in csv.reader(stream):
+                self.route(row)
+
+    def close(self):
+        """
+        This function ends stream of every tenant: payments still waiting in watermark windows are released, outputs
+        are closed, and snapshots and spill files are removed.
+        """
+        try:
+            for tenant in self.tenants.values():
+                if tenant.anti_fraud is None and tenant.snapshot is not None and \
+                        self.options.get('allowed_lateness') is not None:
+                    self.load(tenant)
+                anti_fraud = tenant.anti_fraud
+                if anti_fraud is None:
+                    continue
+                if anti_fraud.window is not None:
+                    anti_fraud.release_window(flush=True)
+                    anti_fraud.write_reports(tenant.sinks[3])
+                for sink in tenant.sinks:
+                    sink.close()
+                anti_fraud.close()
+                tenant.anti_fraud = tenant.sinks = tenant.engine = None
+                del self.loaded[tenant.name]
+        finally:
+            shutil.rmtree(self.spool, ignore_errors=True)
+
+    def summary(self):
+        """
+        This function returns a line of routing and loading statistics.
+        """
+        return "tenant host: %d tenants, %d payments routed, %d without tenant, %d loads, %d unloads, at most %d " \
+               "loaded" % (len(self.tenants), self.routed, self.unrouted, self.loads, self.unloads, self.peak_loaded)
+
+
+# ----------------------------------------------------
+#       Main method :
+# ----------------------------------------------------
+def main(tenants_dir, streamfile, output_dir, **options):
+    """
+    This function routes stream of payments of many tenants to their tenants and writes outputs of each.
+    :param options: options of TenantHost class.
+    """
+    host = TenantHost(tenants_dir, output_dir, **options)
+    try:
+        host.stream_processing(streamfile)
+    finally:
+        host.close()
+    sys.stderr.write(host.summary() + "\n")
+
+
+def cli(argv=None):
+    """
+    This function parses command line arguments and runs main.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Classify a stream of payments of many tenants in one process.")
+    parser.add_argument('tenants_dir', help="directory holding a directory with batch_payment.txt per tenant")
+    parser.add_argument('streamfile', help="stream of payments, tenant key as first column")
+    parser.add_argument('output_dir', help="directory outputs of every tenant are written to")
+    parser.add_argument('--max-loaded', type=int, metavar='N', help="keep at most N tenants loaded")
+    parser.add_argument('--host-memory', type=float, metavar='MB',
+                        help="keep at most an estimated MB megabytes of tenants loaded")
+    parser.add_argument('--tenant-memory', type=float, metavar='MB',
+                        help="memory budget of payment graph of every tenant, see --memory-limit of antifraud.py")
+    parser.add_argument('--budget', action='append', default=[], metavar='NAME=MB',
+                        help="memory budget of one tenant; may be repeated")
+    parser.add_argument('--spool-dir', metavar='DIR',
+                        help="directory of snapshots of unloaded tenants and spill files (default: temporary "
+                             "directory)")
+    parser.add_argument('--adaptive-limits', action='store_true', help="see antifraud.py")
+    parser.add_argument('--trust-horizon', type=float, metavar='DAYS', help="see antifraud.py")
+    parser.add_argument('--allowed-lateness', type=int, metavar='SECONDS', help="see antifraud.py")
+    parser.add_argument('--learn-stream', action='store_true', help="see antifraud.py")
+    parser.add_argument('--detect-rings', action='store_true', help="see antifraud.py")
+    parser.add_argument('--velocity-limit', type=float, metavar='AMOUNT', help="see antifraud.py")
+    args = parser.parse_args(argv)
+    budgets = {}
+    for budget in args.budget:
+        name, megabytes = budget.rsplit('=', 1)
+        budgets[name] = float(megabytes)
+    main(args.tenants_dir, args.streamfile, args.output_dir, max_loaded=args.max_loaded,
+         host_memory=args.host_memory, tenant_memory=args.tenant_memory, budgets=budgets, spool_dir=args.spool_dir,
+         adaptive_limits=args.adaptive_limits,
+         trust_horizon=None if args.trust_horizon is None else int(args.trust_horizon * 86400),
+         allowed_lateness=args.allowed_lateness, learn_stream=args.learn_stream, detect_rings=args.detect_rings,
+         velocity_limit=args.velocity_limit)
+
+
+if __name__ == "__main__":
+    cli()
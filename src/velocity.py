@@ -0,0 +1,138 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    AMOUNT VELOCITY: amounts sent per user within the 60 seconds window.
+    ----------------------------------------------------------------------
+    Heat graph counts payments between users but not their amounts. AmountVelocity follows the same window and keeps,
+    for every user that sent a payment in it:
+
+        total   - amount sent, in cents so that adding and removing payments never drifts.
+        count   - payments sent.
+        highest - monotonic deque of (timestamp, amount): timestamps increasing, amounts decreasing. Its first entry is
+                  the largest payment in window; an entry is dropped as soon as a later payment is at least as large,
+                  as it can never be the largest again.
+        lowest  - same with amounts negated, its first entry is the smallest payment in window.
+
+    A payment entering the window is appended at the back of both deques after popping the entries it makes useless,
+    a timestamp leaving the window pops from the front: O(1) amortised per payment, window is never scanned.
+    A payment arriving out of order (still inside the window) is inserted by timestamp from the back.
+"""
+
+from collections import deque
+
+
+def push(entries, ts, value):
+    """
+    This function adds (ts, value) to a monotonic deque of decreasing values.
+    :param entries: deque of (timestamp, value), timestamps increasing and values decreasing.
+    :param ts: timestamp of payment.
+    :param value: value of payment.
+    """
+    if not entries or ts >= entries[-1][0]:
+        while entries and entries[-1][1] <= value:
+            entries.pop()
+        entries.append((ts, value))
+        return
+    # out of order: entries after ts that are at least as large make payment useless
+    index = len(entries)
+    while index and entries[index - 1][0] > ts:
+        index -= 1
+        if entries[index][1] >= value:
+            return
+    entries.insert(index, (ts, value))
+    while index and entries[index - 1][1] <= value:
+        del entries[index - 1]
+        index -= 1
+
+
+class UserWindow:
+    """
+    UserWindow is the amount velocity of one user.
+    """
+    __slots__ = ('total', 'count', 'highest', 'lowest')
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        self.highest = deque()
+        self.lowest = deque()
+
+
+class AmountVelocity:
+    """
+    AmountVelocity keeps running sums, maxima and minima of amounts sent per user within the heat window.
+    """
+    def __init__(self, limit):
+        """
+        initializes objects of class.
+        :param limit: amount a user may send within the window before payments are reported.
+        """
+        self.limit = int(round(limit * 100))
+        self.users = {}             # dictionary of user to UserWindow.
+        self.payments = {}          # dictionary of timestamp to flat pairs of (user, cents) sent at that time.
+        self.flagged = 0            # payments reported above velocity limit.
+
+    def payment_added(self, ts, user, amount):
+        """
+        This function adds a payment entering the window.
+        :param ts: timestamp of payment.
+        :param user: user making payment.
+        :param amount: amount of payment.
+        """
+        cents = int(round(amount * 100))
+        window = self.users.get(user)
+        if window is None:
+            window = self.users[user] = UserWindow()
+        window.total += cents
+        window.count += 1
+        push(window.highest, ts, cents)
+        push(window.lowest, ts, -cents)
+        if ts in self.payments:
+            self.payments[ts] += (user, cents)
+        else:
+            self.payments[ts] = [user, cents]
+
+    def expire(self, ts):
+        """
+        This function removes payments of a timestamp leaving the window.
+        :param ts: timestamp leaving window.
+        """
+        payments = self.payments.pop(ts, ())
+        for index in range(0, len(payments), 2):
+            user = payments[index]
+            window = self.users[user]
+            window.count -= 1
+            if window.count == 0:
+                del self.users[user]
+                continue
+            window.total -= payments[index + 1]
+            # deques run empty while other payments of user at ts are still counted
+            while window.highest and window.highest[0][0] <= ts:
+                window.highest.popleft()
+            while window.lowest and window.lowest[0][0] <= ts:
+                window.lowest.popleft()
+
+    def window(self, user):
+        """
+        This function returns amount velocity of user.
+        :param user: user making payment.
+
+        :return:
+            (amount sent, payments sent, largest payment, smallest payment) within window, None if user sent none.
+        """
+        window = self.users.get(user)
+        if window is None:
+            return None
+        return window.total / 100.0, window.count, window.highest[0][1] / 100.0, -window.lowest[0][1] / 100.0
+
+    def exceeds(self, user):
+        """
+        This function checks if amount sent by user within window is above velocity limit.
+        """
+        window = self.users.get(user)
+        return window is not None and window.total > self.limit
@@ -0,0 +1,179 @@
+"""
+    Author: Dhananjay Mehta (mehta.dhananjay28@gmail.com)
+    Version: v1.0
+
+    -----------------------------------------------------------
+    INSIGHT DATA ENGINEERING CODING CHALLENGE: DIGITAL WALLET
+    -----------------------------------------------------------
+
+    WATERMARK WINDOW: out-of-order safe feeding of the payment heat graph.
+    ----------------------------------------------------------------------
+    Payments are buffered in buckets of one second until watermark passes them. Every producer feeding the window
+    has a watermark of its own, trailing the latest payment time it has seen by allowed lateness, and the window
+    releases up to the lowest of them:
+
+        watermark of producer = latest payment time of producer - allowed lateness
+        watermark of window   = min(watermark of every producer still feeding it)
+
+    Buckets below watermark of window are released in order of time, then of producer, then of item (arrival
+    sequence), and applied in bulk to the heat graph. Heat graph therefore always sees payments in order of time and
+    its state does not depend on the order payments arrived in, as long as they were not later than allowed lateness.
+
+    A payment arriving below watermark of its own producer is late: it is not added to the heat graph and is counted
+    in late. Whether a payment is late depends only on the payments its producer ingested before it, never on how
+    producer threads interleave, so several producers give the same heat graph state on every run. Every producer
+    buffers in buckets of its own under a lock of its own, so producers do not wait for each other: ingest() may be
+    called from one thread per producer, release() is called by the single consumer of the window.
+"""
+
+import heapq
+import threading
+
+
+class ProducerBuffer:
+    """
+    ProducerBuffer holds buckets of payments ingested by one producer of a watermark window.
+    """
+    def __init__(self):
+        """
+        initializes objects of class.
+        """
+        self.buckets = {}               # dictionary of buffered items with timestamp(ts) as key.
+        self.bucket_times = []          # heap of timestamps of buffered buckets.
+        self.max_timestamp = None       # timestamp of latest payment ingested.
+        self.finished = False           # producer will ingest no more payments.
+        self.late = 0                   # payments that arrived below watermark of producer.
+        self.lock = threading.Lock()
+
+
+class WatermarkWindow:
+    """
+    WatermarkWindow buffers payments per second and releases them once allowed lateness has passed.
+    """
+    def __init__(self, allowed_lateness=5, producers=1):
+        """
+        initializes objects of class.
+        :param allowed_lateness: seconds a payment may arrive after a later payment and still be applied in order.
+        :param producers: number of producers feeding window, numbered from 0.
+        """
+        self.allowed_lateness = allowed_lateness
+        self.producers = [ProducerBuffer() for _ in range(producers)]
+        self.watermark = None           # every bucket below watermark has been released.
+        self.released = 0               # payments released in order.
+        self.lock = threading.Lock()    # held by consumer while it releases.
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        state['producers'] = [dict(buffer.__dict__, lock=None) for buffer in self.producers]
+        return state
+
+    def __setstate__(self, state):
+        producers = []
+        for fields in state.pop('producers'):
+            buffer = ProducerBuffer()
+            buffer.__dict__.update(fields, lock=threading.Lock())
+            producers.append(buffer)
+        self.__dict__.update(state, producers=producers, lock=threading.Lock())
+
+    @property
+    def late(self):
+        """
+        payments that arrived below watermark of their producer.
+        """
+        return sum(buffer.late for buffer in self.producers)
+
+    @property
+    def max_timestamp(self):
+        """
+        timestamp of latest payment ingested by any producer, None before the first one.
+        """
+        return max((buffer.max_timestamp for buffer in self.producers if buffer.max_timestamp is not None),
+                   default=None)
+
+    def ingest(self, payment, item, producer=0):
+        """
+        This function buffers a payment until watermark passes its time. Safe to call from one thread per producer.
+        :param payment: Payment record.
+        :param item: value released with payment, e.g. (arrival sequence, payment, status); buckets release items
+                     in order of item, so it should start with arrival sequence.
+        :param producer: number of producer ingesting payment.
+
+        :return:
+            False if payment is late and will never be released, True otherwise.
+        """
+        ts = payment.timestamp
+        buffer = self.producers[producer]
+        with buffer.lock:
+            if buffer.max_timestamp is not None and ts < buffer.max_timestamp - self.allowed_lateness or \
+                    self.watermark is not None and ts < self.watermark:
+                buffer.late += 1
+                return False
+            bucket = buffer.buckets.get(ts)
+            if bucket is None:
+                buffer.buckets[ts] = [item]
+                heapq.heappush(buffer.bucket_times, ts)
+            else:
+                bucket.append(item)
+            if buffer.max_timestamp is None or ts > buffer.max_timestamp:
+                buffer.max_timestamp = ts
+        return True
+
+    def finish(self, producer=0):
+        """
+        This function marks a producer as done, so its watermark no longer holds the window back.
+        """
+        buffer = self.producers[producer]
+        with buffer.lock:
+            buffer.finished = True
+
+    def release(self, flush=False):
+        """
+        This function releases buckets below watermark of window.
+        :param flush: if True, release every buffered bucket (end of stream).
+
+        :return:
+            list of released items, in order of time, then of producer and then of item.
+        """
+        with self.lock:
+            watermark = self.window_watermark(flush)
+            if watermark is None:
+                return []
+            buckets = []
+            for number, buffer in enumerate(self.producers):
+                with buffer.lock:
+                    while buffer.bucket_times and buffer.bucket_times[0] < watermark:
+                        ts = heapq.heappop(buffer.bucket_times)
+                        buckets.append((ts, number, buffer.buckets.pop(ts)))
+            buckets.sort(key=lambda bucket: bucket[:2])
+            released = []
+            for _, _, bucket in buckets:
+                bucket.sort()
+                released += bucket
+            if self.watermark is None or watermark > self.watermark:
+                self.watermark = watermark
+            self.released += len(released)
+        return released
+
+    def window_watermark(self, flush):
+        """
+        This function computes watermark of window: lowest watermark of producers still feeding it.
+
+        :return:
+            watermark, None if nothing can be released yet.
+        """
+        latest = self.max_timestamp
+        if latest is None:
+            return None
+        if flush:
+            return latest + 1
+        watermarks = []
+        for buffer in self.producers:
+            if buffer.finished:
+                continue
+            if buffer.max_timestamp is None:
+                # producer has not ingested anything yet: any payment it ingests may still be the earliest
+                return None
+            watermarks.append(buffer.max_timestamp - self.allowed_lateness)
+        # every producer finished: everything buffered can go
+        return min(watermarks) if watermarks else latest + 1